@@ -0,0 +1,130 @@
+# Item model for the co-author table
+
+from PyQt5 import QtCore
+from PyQt5.QtCore import Qt
+
+from NameIndex import NameIndex
+
+
+class CoauthorModel(QtCore.QAbstractTableModel):
+
+
+    # Data roles
+    AuthorIdRole = Qt.UserRole
+
+
+    HEADERS = ['Name', 'Publications']
+
+
+    def __init__(self, coauthors=None, parent=None):
+        """
+        Constructor.
+
+        :param coauthors: List of (id, name, npapers) rows, as returned by
+                          'Author.getCoauthors()'.
+        """
+        super().__init__(parent)
+        self.setCoauthors(coauthors or [])
+
+
+    def setCoauthors(self, coauthors):
+        """
+        Replace the co-authors shown by the model.
+        """
+        self.beginResetModel()
+        self.coauthors = coauthors
+        self.nameIndex = NameIndex([c.name for c in coauthors])
+        # Indices of the co-authors in the current sort order, and of the
+        # co-authors matching the filter (None if there is no filter)
+        self.order = list(range(len(coauthors)))
+        self.matches = None
+        self.rows = self.order
+        self.endResetModel()
+
+
+    def setFilter(self, text, fuzzy=True):
+        """
+        Only show the co-authors whose names match the given string (or
+        all co-authors, if the string is empty).
+        """
+        self.beginResetModel()
+        self.matches = self.nameIndex.match(text, fuzzy=fuzzy)
+        self._updateRows()
+        self.endResetModel()
+
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        """
+        Sort the co-authors by the given column.
+        """
+        if column == 0:
+            # Names are sorted ignoring case and diacritics
+            keys = self.nameIndex.names
+        else:
+            # Number of papers (indexing is faster than attribute access)
+            keys = [c[2] for c in self.coauthors]
+
+        self.layoutAboutToBeChanged.emit()
+
+        # Co-authors referred to by persistent indices (e.g. the selection)
+        indices = self.persistentIndexList()
+        selected = [self.rows[i.row()] for i in indices]
+
+        self.order.sort(key=keys.__getitem__, reverse=(order == Qt.DescendingOrder))
+        self._updateRows()
+
+        if indices:
+            rows = {c: r for r, c in enumerate(self.rows)}
+            self.changePersistentIndexList(indices, [self.index(rows[c], i.column()) for c, i in zip(selected, indices)])
+
+        self.layoutChanged.emit()
+
+
+    def _updateRows(self):
+        """
+        Update the list of shown co-authors from the sort order and the
+        filter matches.
+        """
+        if self.matches is None:
+            self.rows = self.order
+        else:
+            self.rows = [i for i in self.order if i in self.matches]
+
+
+    def coauthor(self, index):
+        """
+        Returns the co-author shown at the given index.
+        """
+        return self.coauthors[self.rows[index.row()]]
+
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+
+        c = self.coauthor(index)
+        if role == Qt.DisplayRole:
+            return c.name if index.column() == 0 else c.npapers
+        elif role == self.AuthorIdRole:
+            return c.id
+        elif role == Qt.TextAlignmentRole and index.column() == 1:
+            return int(Qt.AlignRight | Qt.AlignVCenter)
+
+        return None
+
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.HEADERS[section]
+
+        return super().headerData(section, orientation, role)
+
+
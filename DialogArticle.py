@@ -3,9 +3,9 @@ from PyQt5 import QtWidgets
 from PyQt5.QtWidgets import QMessageBox
 from ui import Article_design
 from datetime import date, datetime
-import traceback
 
 from db import Article, Setting
+import FetchWorker
 
 
 class DialogArticle(QtWidgets.QDialog):
@@ -44,7 +44,8 @@ class DialogArticle(QtWidgets.QDialog):
 
     def commit(self, origarticle):
         """
-        Commit the article to the database.
+        Commit the article to the database. Returns a description of
+        the change made (see 'Article.save()').
         """
         data = dict(
             doi=self.ui.tbDOI.text(),
@@ -62,32 +63,47 @@ class DialogArticle(QtWidgets.QDialog):
         )
 
         if origarticle:
-            Article.save(id=origarticle.id, **data)
+            return Article.save(id=origarticle.id, **data)
         else:
-            Article.save(**data)
-
-        return True
+            return Article.save(**data)
 
 
     def fromDOI(self):
         """
-        Load an article from its DOI.
+        Load an article from its DOI. The article is fetched in the
+        background, and loaded into the dialog by 'fetched()'.
         """
-        if self.ui.tbDOI.text():
-            try:
-                if 'arxiv.org' in self.ui.tbDOI.text():
-                    a = Article.fromArXiv(self.ui.tbDOI.text())
-                else:
-                    a = Article.fromDOI(self.ui.tbDOI.text())
-            except Exception as ex:
-                QMessageBox.critical(self, 'Error importing article', f'{ex}\n\n{"".join(traceback.format_exception(ex))}')
-                return
+        doi = self.ui.tbDOI.text()
+        if doi:
+            timeout = FetchWorker.getTimeout()
+            if 'arxiv.org' in doi:
+                fetch = lambda : Article.fromArXiv(doi, timeout=timeout)
+            else:
+                fetch = lambda : Article.fromDOI(doi, timeout=timeout)
+
+            FetchWorker.start(
+                self, 'Fetching article...', fetch,
+                lambda doi : Article.exists(doi=doi),
+                self.fetched, self.fetchFailed
+            )
+
 
-            self.load(a)
+    def fetched(self, article, exists):
+        """
+        Load an article fetched in the background.
+        """
+        self.load(article)
 
-            # Check if this article already exists in the database
-            if Article.exists(doi=a.doi):
-                QMessageBox.warning(self, 'Duplicate article', 'This article already exists in the database.')
+        # Check if this article already exists in the database
+        if exists:
+            QMessageBox.warning(self, 'Duplicate article', 'This article already exists in the database.')
+
+
+    def fetchFailed(self, message, tb):
+        """
+        Fetching an article in the background failed.
+        """
+        QMessageBox.critical(self, 'Error importing article', f'{message}\n\n{tb}')
 
 
     def getDate(self):
@@ -0,0 +1,185 @@
+
+import os
+from PyQt5 import QtWidgets, QtCore
+from PyQt5.QtWidgets import QMessageBox
+from ui import DialogBulkImport_design
+
+from db import config
+from db.bulkimport import BulkImport, parseIds
+import FetchWorker
+
+
+class BulkImportSignals(QtCore.QObject):
+
+
+    # Emitted with the number of fetched ids, the total number of ids to
+    # fetch, the id just fetched and an error message (empty on success)
+    progress = QtCore.pyqtSignal(int, int, str, str)
+
+    # Emitted when all ids have been fetched (or the import was cancelled)
+    finished = QtCore.pyqtSignal()
+
+
+class BulkImportWorker(QtCore.QRunnable):
+
+
+    def __init__(self, bulkimport):
+        """
+        Constructor.
+        """
+        super().__init__()
+
+        self.bulkimport = bulkimport
+        self.signals = BulkImportSignals()
+        self.cancelled = False
+
+
+    def cancel(self):
+        """
+        Stop fetching. Requests in progress are completed.
+        """
+        self.cancelled = True
+
+
+    def run(self):
+        """
+        Fetch the metadata of all pending ids.
+        """
+        def progress(ndone, ntotal, id, error):
+            self.signals.progress.emit(ndone, ntotal, id, error or '')
+
+        try:
+            self.bulkimport.fetch(progress=progress, cancelled=lambda : self.cancelled)
+        finally:
+            self.signals.finished.emit()
+
+
+class DialogBulkImport(QtWidgets.QDialog):
+
+
+    def __init__(self, parent=None):
+        """
+        Constructor.
+        """
+        super().__init__(parent=parent)
+
+        self.ui = DialogBulkImport_design.Ui_DialogBulkImport()
+        self.ui.setupUi(self)
+
+        self.statefile = f'{config.database().filename}.import'
+        self.worker = None
+        self.inserted = []
+
+        if os.path.exists(self.statefile):
+            self.ui.lblStatus.setText('An interrupted import will be resumed.')
+
+        self.bindEvents()
+
+
+    def bindEvents(self):
+        """
+        Bind control events.
+        """
+        self.ui.btnImport.clicked.connect(self.startImport)
+        self.ui.btnCancel.clicked.connect(self.cancelImport)
+
+
+    def startImport(self):
+        """
+        Start importing the listed articles.
+        """
+        ids = parseIds(self.ui.tbIds.toPlainText())
+        if not ids and not os.path.exists(self.statefile):
+            return
+
+        self.bulkimport = BulkImport(ids, statefile=self.statefile, timeout=FetchWorker.getTimeout())
+        nexisting = self.bulkimport.skipExisting()
+        npending = len(self.bulkimport.pending())
+
+        self.ui.tbLog.clear()
+        self.ui.lblStatus.setText(f'{len(self.bulkimport.ids)} ids, {nexisting} already in the database. Fetching {npending} articles...')
+        self.ui.progressBar.setMaximum(max(npending, 1))
+        self.ui.progressBar.setValue(0)
+        self.ui.tbIds.setEnabled(False)
+        self.ui.btnImport.setEnabled(False)
+        self.ui.btnCancel.setEnabled(True)
+        self.ui.buttonBox.setEnabled(False)
+
+        self.worker = BulkImportWorker(self.bulkimport)
+        self.worker.signals.progress.connect(self.importProgress)
+        self.worker.signals.finished.connect(self.importFinished)
+        QtCore.QThreadPool.globalInstance().start(self.worker)
+
+
+    def cancelImport(self):
+        """
+        Cancel the import in progress.
+        """
+        if self.worker is not None:
+            self.worker.cancel()
+            self.ui.btnCancel.setEnabled(False)
+            self.ui.lblStatus.setText('Cancelling...')
+
+
+    def importProgress(self, ndone, ntotal, id, error):
+        """
+        An article was fetched.
+        """
+        self.ui.progressBar.setValue(ndone)
+        if error:
+            self.ui.tbLog.appendPlainText(f'{id}: FAILED: {error}')
+        else:
+            self.ui.tbLog.appendPlainText(id)
+
+
+    def importFinished(self):
+        """
+        All articles have been fetched. Insert them into the database,
+        unless the import was cancelled.
+        """
+        cancelled = self.worker.cancelled
+        self.worker = None
+
+        self.ui.tbIds.setEnabled(True)
+        self.ui.btnImport.setEnabled(True)
+        self.ui.btnCancel.setEnabled(False)
+        self.ui.buttonBox.setEnabled(True)
+
+        if cancelled:
+            self.ui.lblStatus.setText('Import cancelled. Click \'Import\' to resume it.')
+            return
+
+        try:
+            inserted = self.bulkimport.commit()
+        except Exception as ex:
+            QMessageBox.critical(self, 'Error importing articles', f'{ex}')
+            return
+
+        self.inserted += inserted
+
+        if self.bulkimport.finish():
+            self.ui.lblStatus.setText(f'Imported {len(inserted)} articles.')
+        else:
+            nfailed = len(self.bulkimport.errors)
+            self.ui.lblStatus.setText(f'Imported {len(inserted)} articles. {nfailed} ids could not be imported; click \'Import\' to retry them.')
+
+
+    def reject(self):
+        """
+        Close the dialog, unless an import is in progress.
+        """
+        if self.worker is None:
+            super().reject()
+
+
+    @staticmethod
+    def exe(parent=None):
+        """
+        Execute this dialog. Returns the IDs of the imported articles.
+        """
+        d = DialogBulkImport(parent)
+        d.exec()
+
+        return d.inserted
+
+
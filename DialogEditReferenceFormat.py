@@ -4,11 +4,19 @@ from PyQt5.QtWidgets import QMessageBox
 from ui import EditReferenceFormat_design
 
 from db import ReferenceFormat
+import ReferenceFormatter
 
 
 class DialogEditReferenceFormat(QtWidgets.QDialog):
     
 
+    # Kinds of reference formats: (kind, description, default format)
+    KINDS = [
+        (ReferenceFormat.KIND_CODE, 'Python code', ReferenceFormat.DEFAULT),
+        (ReferenceFormat.KIND_TEMPLATE, 'Template', ReferenceFormat.DEFAULT_TEMPLATE)
+    ]
+
+
     def __init__(self, name, parent=None):
         """
         Constructor.
@@ -18,10 +26,14 @@ class DialogEditReferenceFormat(QtWidgets.QDialog):
         self.ui = EditReferenceFormat_design.Ui_EditReferenceFormat()
         self.ui.setupUi(self)
 
+        for kind, desc, _ in self.KINDS:
+            self.ui.cbKind.addItem(desc, kind)
+
         if name != 'New':
             self.referenceFormat = ReferenceFormat.get(name=name)
             self.ui.tbName.setText(name)
             self.ui.tbCode.setPlainText(self.referenceFormat.code)
+            self.ui.cbKind.setCurrentIndex(self.ui.cbKind.findData(self.referenceFormat.kind or ReferenceFormat.KIND_CODE))
         else:
             self.referenceFormat = None
             self.ui.tbCode.setPlainText(ReferenceFormat.DEFAULT)
@@ -34,6 +46,17 @@ class DialogEditReferenceFormat(QtWidgets.QDialog):
         Bind controls to events.
         """
         self.ui.buttonBox.accepted.connect(self.validateAndAccept)
+        self.ui.cbKind.currentIndexChanged.connect(self.kindChanged)
+
+
+    def kindChanged(self, index):
+        """
+        The kind of reference format was changed. Unmodified default
+        formats are replaced by the default of the new kind.
+        """
+        defaults = [d for _, _, d in self.KINDS]
+        if self.ui.tbCode.toPlainText() in defaults:
+            self.ui.tbCode.setPlainText(self.KINDS[index][2])
 
 
     def commit(self):
@@ -42,7 +65,8 @@ class DialogEditReferenceFormat(QtWidgets.QDialog):
         """
         vals = {
             'name': self.ui.tbName.text(),
-            'code': self.ui.tbCode.toPlainText()
+            'code': self.ui.tbCode.toPlainText(),
+            'kind': self.ui.cbKind.currentData()
         }
 
         if self.referenceFormat is not None:
@@ -57,10 +81,17 @@ class DialogEditReferenceFormat(QtWidgets.QDialog):
         """
         Validate input and accept if correct.
         """
-        if self.ui.tbName.text().strip() not in ['', 'New']:
-            self.accept()
-        else:
+        if self.ui.tbName.text().strip() in ['', 'New']:
             QMessageBox.critical(self, 'Invalid name', 'The specified name is not allowed.')
+            return
+
+        try:
+            ReferenceFormatter.compileFormat(self.ui.tbCode.toPlainText(), self.ui.cbKind.currentData())
+        except Exception as ex:
+            QMessageBox.critical(self, 'Invalid reference format', f'The reference format could not be compiled.\n\n{ex}')
+            return
+
+        self.accept()
 
 
     @staticmethod
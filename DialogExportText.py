@@ -1,12 +1,13 @@
 
-from PyQt5 import QtGui, QtWidgets
-from PyQt5.QtCore import Qt
-from PyQt5.QtWidgets import QMessageBox
+from PyQt5 import QtWidgets
+from PyQt5.QtWidgets import QDialogButtonBox, QFileDialog, QMessageBox
 from ui import DialogExportText_design
 
-from db import Article, ReferenceFormat
+from db import Article, config, ReferenceFormat
 
 from DialogEditReferenceFormat import DialogEditReferenceFormat
+from PublicationTreeModel import PublicationTreeModel
+import Exporter
 import ReferenceFormatter
 
 
@@ -22,7 +23,7 @@ class DialogExportText(QtWidgets.QDialog):
         self.ui = DialogExportText_design.Ui_DialogExportText()
         self.ui.setupUi(self)
 
-        self.treeViewModel = QtGui.QStandardItemModel()
+        self.treeViewModel = PublicationTreeModel(presentations=False, checkable=True)
         self.ui.tvPublications.setModel(self.treeViewModel)
 
         self.reloadReferenceFormats()
@@ -42,6 +43,7 @@ class DialogExportText(QtWidgets.QDialog):
         self.ui.cbAbbrJournal.stateChanged.connect(self.formatReferences)
         self.ui.cbPeriodInAuthors.stateChanged.connect(self.formatReferences)
         self.ui.cbReferenceFormat.currentTextChanged.connect(self.formatReferences)
+        self.ui.buttonBox.button(QDialogButtonBox.Save).clicked.connect(self.save)
 
 
     def editReferenceFormat(self):
@@ -64,20 +66,17 @@ class DialogExportText(QtWidgets.QDialog):
         rf = ReferenceFormat.get(name=self.ui.cbReferenceFormat.currentText())
         articles = self.getSelectedArticles()
 
-        code = ReferenceFormat.DEFAULT
+        code, kind = ReferenceFormat.DEFAULT, ReferenceFormat.KIND_CODE
         if rf is not None:
-            code = rf.code
+            code, kind = rf.code, rf.kind
 
-        fmt = ''
         try:
-            for article in articles:
-                if fmt: fmt += '\n'
-                fmt += ReferenceFormatter.format(
-                    code, article,
-                    maxauthors=self.ui.sbMaxAuthors.value(),
-                    abbrjournal=self.ui.cbAbbrJournal.isChecked(),
-                    includeperiods=self.ui.cbPeriodInAuthors.isChecked()
-                )
+            fmt = '\n'.join(ReferenceFormatter.format_many(
+                code, articles, kind=kind,
+                maxauthors=self.ui.sbMaxAuthors.value(),
+                abbrjournal=self.ui.cbAbbrJournal.isChecked(),
+                includeperiods=self.ui.cbPeriodInAuthors.isChecked()
+            ))
         except Exception as ex:
             msg = f'Exception occurred while formatting references.\n\n{ex}'
             QMessageBox.critical(self, 'Formatting error', msg)
@@ -86,54 +85,59 @@ class DialogExportText(QtWidgets.QDialog):
         self.ui.tbReferences.setPlainText(fmt)
 
 
+    def save(self):
+        """
+        Save the selected references to a file, as text (using the
+        selected reference format) or in a bibliography format.
+        """
+        filename, selected = QFileDialog.getSaveFileName(
+            parent=self, caption="Save references",
+            filter=Exporter.fileFilter(['text', 'bibtex', 'ris', 'csl-json'])
+        )
+
+        if not filename:
+            return
+
+        rf = ReferenceFormat.get(name=self.ui.cbReferenceFormat.currentText())
+
+        try:
+            with config.database().profiler.action('Save references'):
+                Exporter.export(
+                    filename, Exporter.fileFormat(selected),
+                    articles=self.treeViewModel.checkedIds(), presentations=False,
+                    code=rf.code if rf is not None else None,
+                    kind=rf.kind if rf is not None else ReferenceFormat.KIND_CODE,
+                    maxauthors=self.ui.sbMaxAuthors.value(),
+                    abbrjournal=self.ui.cbAbbrJournal.isChecked(),
+                    includeperiods=self.ui.cbPeriodInAuthors.isChecked()
+                )
+        except Exception as ex:
+            QMessageBox.critical(self, 'Export error', f'Exception occurred while saving references.\n\n{ex}')
+
+
     def getSelectedArticles(self):
         """
         Get all selected articles.
         """
-        artid = []
-        def recurse(parent):
-            for i in range(parent.rowCount()):
-                child = parent.child(i)
-                gchildren = child.rowCount()
-                if gchildren > 0:
-                    recurse(child)
-                elif child.checkState() == Qt.Checked:
-                    artid.append(child.data())
-
-        recurse(self.treeViewModel.invisibleRootItem())
-        return [Article.get(id=i) for i in artid]
+        with config.database().reading():
+            return Article.getMany(self.treeViewModel.checkedIds())
 
 
     def loadPublications(self):
         """
         Load the publications view.
         """
-        Article.loadPublicationsToTreeview(self.treeViewModel, checkable=True)
+        self.treeViewModel.reload()
 
 
     def treeViewItemClicked(self, modelIndex):
         """
-        An item is clicked in the treeview.
+        An item is clicked in the treeview. Check states are propagated
+        to the children of the item by the tree model.
         """
-        self.itemChecked(modelIndex)
         self.formatReferences()
 
 
-    def itemChecked(self, modelIndex):
-        """
-        An item is checked.
-        """
-        item = self.treeViewModel.itemFromIndex(modelIndex)
-
-        if item.rowCount() == 0:
-            return
-
-        for i in range(item.rowCount()):
-            child = item.child(i)
-            child.setCheckState(item.checkState())
-            self.itemChecked(child.index())
-
-
     def reloadReferenceFormats(self):
         self.ui.cbReferenceFormat.clear()
         rfs = ReferenceFormat.getAll()
@@ -149,7 +153,8 @@ class DialogExportText(QtWidgets.QDialog):
         """
         Export the article list.
         """
-        d = DialogExportText()
-        return d.exec()
+        with config.database().profiler.action('Export to text'):
+            d = DialogExportText()
+            return d.exec()
 
 
@@ -1,18 +1,21 @@
 
 from PyQt5 import QtWidgets, QtCore
-from PyQt5.QtWidgets import QMessageBox, QTableWidgetItem
+from PyQt5.QtWidgets import QTableWidgetItem
 from ui import DialogPapers_design
 
-from db import Article
+from db import Article, config
 from DialogArticle import DialogArticle
 
 
 class DialogPapers(QtWidgets.QDialog):
     
 
-    def __init__(self, title, papers, parent=None):
+    def __init__(self, title, ids, parent=None):
         """
         Constructor.
+
+        :param title: Title of the dialog.
+        :param ids:   IDs of the articles to list.
         """
         super().__init__(parent=parent)
 
@@ -29,7 +32,7 @@ class DialogPapers(QtWidgets.QDialog):
         header.resizeSection(2, 120)
         header.setSectionResizeMode(1, QtWidgets.QHeaderView.Stretch)
 
-        self.addPapers(papers)
+        self.addPapers(ids)
         self.bindEvents()
 
 
@@ -40,37 +43,41 @@ class DialogPapers(QtWidgets.QDialog):
         self.ui.tblPapers.cellDoubleClicked.connect(self.showPaper)
 
 
-    def addPapers(self, papers):
+    def addPapers(self, ids):
         """
-        Add the list of papers to the table.
+        Add the papers with the given IDs to the table. Only the columns
+        shown in the table are loaded.
         """
-        pprs = sorted(papers, key=lambda p : p.date, reverse=True)
+        with config.database().reading():
+            pprs = Article.getPaperRows(ids)
+
         self.ui.tblPapers.setRowCount(len(pprs))
         for i in range(len(pprs)):
             p = pprs[i]
-            
-            nauthors = len(p.authors.split(','))
 
             year = QTableWidgetItem(f'{p.date.year:d}')
-            year.setData(QtCore.Qt.UserRole, p)
+            year.setData(QtCore.Qt.UserRole, p.id)
             self.ui.tblPapers.setItem(i, 0, year)
             self.ui.tblPapers.setItem(i, 1, QTableWidgetItem(f'{p.title}'))
-            self.ui.tblPapers.setItem(i, 2, QTableWidgetItem(f'{nauthors}'))
+            self.ui.tblPapers.setItem(i, 2, QTableWidgetItem(f'{p.nauthors}'))
 
 
     def showPaper(self, row, col):
         """
         Show details about the selected paper.
         """
-        paper = self.ui.tblPapers.item(row, 0).data(QtCore.Qt.UserRole)
+        id = self.ui.tblPapers.item(row, 0).data(QtCore.Qt.UserRole)
+        with config.database().reading():
+            paper = Article.get(id)
+
         DialogArticle.exe(paper)
 
 
     @staticmethod
-    def exe(title, papers, parent=None):
+    def exe(title, ids, parent=None):
         """
         Execute this dialog.
         """
-        return DialogPapers(title, papers, parent).exec()
+        return DialogPapers(title, ids, parent).exec()
 
 
@@ -1,11 +1,11 @@
 from datetime import date, datetime
-import traceback
 
 from PyQt5 import QtWidgets
 from PyQt5.QtWidgets import QMessageBox
 
 from db import Presentation
 from ui import Presentation_design
+import FetchWorker
 
 
 class DialogPresentation(QtWidgets.QDialog):
@@ -44,7 +44,8 @@ class DialogPresentation(QtWidgets.QDialog):
 
     def commit(self, origpresentation):
         """
-        Commit the presentation to the database.
+        Commit the presentation to the database. Returns a description
+        of the change made (see 'Presentation.save()').
         """
         data = dict(
             doi=self.ui.tbDOI.text(),
@@ -60,29 +61,43 @@ class DialogPresentation(QtWidgets.QDialog):
         )
 
         if origpresentation:
-            Presentation.save(id=origpresentation.id, **data)
+            return Presentation.save(id=origpresentation.id, **data)
         else:
-            Presentation.save(**data)
-
-        return True
+            return Presentation.save(**data)
 
 
     def fromDOI(self):
         """
-        Load a presentation from its DOI.
+        Load a presentation from its DOI. The presentation is fetched in
+        the background, and loaded into the dialog by 'fetched()'.
         """
-        if self.ui.tbDOI.text():
-            try:
-                presentation = Presentation.fromDOI(self.ui.tbDOI.text())
-            except Exception as ex:
-                QMessageBox.critical(self, 'Error importing presentation', f'{ex}\n\n{"".join(traceback.format_exception(ex))}')
-                return
+        doi = self.ui.tbDOI.text()
+        if doi:
+            timeout = FetchWorker.getTimeout()
+            FetchWorker.start(
+                self, 'Fetching presentation...',
+                lambda : Presentation.fromDOI(doi, timeout=timeout),
+                lambda doi : bool(doi) and Presentation.exists(doi=doi),
+                self.fetched, self.fetchFailed
+            )
 
-            self.load(presentation)
 
-            # Check if this presentation already exists in the database
-            if presentation.doi and Presentation.exists(doi=presentation.doi):
-                QMessageBox.warning(self, 'Duplicate presentation', 'This presentation already exists in the database.')
+    def fetched(self, presentation, exists):
+        """
+        Load a presentation fetched in the background.
+        """
+        self.load(presentation)
+
+        # Check if this presentation already exists in the database
+        if exists:
+            QMessageBox.warning(self, 'Duplicate presentation', 'This presentation already exists in the database.')
+
+
+    def fetchFailed(self, message, tb):
+        """
+        Fetching a presentation in the background failed.
+        """
+        QMessageBox.critical(self, 'Error importing presentation', f'{message}\n\n{tb}')
 
 
     def getDate(self):
@@ -0,0 +1,55 @@
+
+from PyQt5 import QtGui, QtWidgets
+from ui import DialogQueryProfile_design
+
+
+class DialogQueryProfile(QtWidgets.QDialog):
+
+
+    def __init__(self, profiler, parent=None):
+        """
+        Constructor.
+        """
+        super().__init__(parent=parent)
+
+        self.ui = DialogQueryProfile_design.Ui_DialogQueryProfile()
+        self.ui.setupUi(self)
+
+        self.profiler = profiler
+        self.ui.tbProfile.setFont(QtGui.QFontDatabase.systemFont(QtGui.QFontDatabase.FixedFont))
+
+        self.refresh()
+        self.bindEvents()
+
+
+    def bindEvents(self):
+        """
+        Bind events.
+        """
+        self.ui.btnRefresh.clicked.connect(self.refresh)
+        self.ui.btnReset.clicked.connect(self.reset)
+
+
+    def refresh(self):
+        """
+        Show the current profile summary.
+        """
+        self.ui.tbProfile.setPlainText(self.profiler.summary())
+
+
+    def reset(self):
+        """
+        Discard the recorded profiles.
+        """
+        self.profiler.reset()
+        self.refresh()
+
+
+    @staticmethod
+    def exe(profiler, parent=None):
+        """
+        Execute this dialog.
+        """
+        return DialogQueryProfile(profiler, parent).exec()
+
+
@@ -2,7 +2,7 @@
 from PyQt5 import QtWidgets
 from ui import Settings_design
 
-from db import Setting
+from db import Article, Setting
 
 
 class DialogSettings(QtWidgets.QDialog):
@@ -19,7 +19,8 @@ class DialogSettings(QtWidgets.QDialog):
 
         self.SETTINGS = {
             'name': self.ui.tbName,
-            'scholar': self.ui.tbScholar
+            'scholar': self.ui.tbScholar,
+            'timeout': self.ui.tbTimeout
         }
 
         self.load()
@@ -29,9 +30,14 @@ class DialogSettings(QtWidgets.QDialog):
         """
         Commit the settings made.
         """
+        oldname = Article.getAuthorName()
+
         for name, ctrl in self.SETTINGS.items():
             Setting.saveByName(name, ctrl.text())
 
+        if self.ui.tbName.text() != oldname:
+            Article.updateAuthorPositions()
+
         return True
 
 
@@ -1,15 +1,20 @@
 
 from PyQt5 import QtWidgets, QtCore
-from PyQt5.QtWidgets import QMessageBox, QTableWidgetItem
+from PyQt5.QtCore import Qt
 from ui import DialogTopCoauthors_design
 
-from db import Article, Setting
+from db import Author, config, Setting
+from CoauthorModel import CoauthorModel
 from DialogPapers import DialogPapers
 
 
 class DialogTopCoauthors(QtWidgets.QDialog):
     
 
+    # Delay (in milliseconds) after the last key press before filtering
+    FILTER_DELAY = 100
+
+
     def __init__(self, parent=None):
         """
         Constructor.
@@ -19,10 +24,21 @@ class DialogTopCoauthors(QtWidgets.QDialog):
         self.ui = DialogTopCoauthors_design.Ui_DialogTopCoauthors()
         self.ui.setupUi(self)
 
-        self.ui.tblAuthors.setHorizontalHeaderLabels(['Name', 'Publications'])
+        # The model filters and sorts the co-authors itself, as a
+        # QSortFilterProxyModel calls back into Python for every row when
+        # filtering, and for every comparison when sorting
+        self.model = CoauthorModel(parent=self)
+        self.ui.tblAuthors.setModel(self.model)
+
         header = self.ui.tblAuthors.horizontalHeader()
         header.resizeSection(1, 100)
         header.setSectionResizeMode(0, QtWidgets.QHeaderView.Stretch)
+        header.setSortIndicator(1, Qt.DescendingOrder)
+        self.ui.tblAuthors.setSortingEnabled(True)
+
+        self.filterTimer = QtCore.QTimer(self)
+        self.filterTimer.setSingleShot(True)
+        self.filterTimer.setInterval(self.FILTER_DELAY)
 
         self.processAuthors()
         self.bindEvents()
@@ -32,68 +48,36 @@ class DialogTopCoauthors(QtWidgets.QDialog):
         """
         Bind events.
         """
-        self.ui.tbFilter.textChanged.connect(self.filterAuthors)
-        self.ui.tblAuthors.cellDoubleClicked.connect(self.showPapers)
+        self.ui.tbFilter.textChanged.connect(self.filterTimer.start)
+        self.filterTimer.timeout.connect(self.filterAuthors)
+        self.ui.tblAuthors.doubleClicked.connect(self.showPapers)
 
 
-    def filterAuthors(self, text):
+    def filterAuthors(self):
         """
-        Filter authors based on search.
+        Filter authors based on search. Names are matched ignoring case
+        and diacritics, and similar names are also shown.
         """
-        txtl = text.lower()
-        for i in range(self.ui.tblAuthors.rowCount()):
-            hide = True
-            q = self.ui.tblAuthors.item(i, 0)
-            if txtl in q.text().lower():
-                hide = False
-
-            self.ui.tblAuthors.setRowHidden(i, hide)
+        self.model.setFilter(self.ui.tbFilter.text())
 
 
-    def showPapers(self, row, col):
+    def showPapers(self, index):
         """
         Show the papers for the selected author.
         """
-        name = self.ui.tblAuthors.item(row, 0).text()
-        papers = self.ui.tblAuthors.item(row, 1).data(QtCore.Qt.UserRole)
-        DialogPapers.exe(f'Joint papers with {name}', papers, self)
+        coauthor = self.model.coauthor(index)
+        with config.database().reading():
+            ids = Author.getArticleIds(coauthor.id)
+
+        DialogPapers.exe(f'Joint papers with {coauthor.name}', ids, self)
 
 
     def processAuthors(self):
         """
         Process authors and produce statistics.
         """
-        articles = Article.getall()
-        authors = []
-        authorp = []
-        authora = {}
         name = Setting.get('name').value
-
-        for article in articles:
-            auths = article.authors.split(',')
-
-            for a in auths:
-                s = a.strip()
-                if s == name:
-                    # Skip self
-                    continue
-                elif s not in authors:
-                    authors.append(s)
-                    authorp.append(1)
-                    authora[s] = [article]
-                else:
-                    authorp[authors.index(s)] += 1
-                    authora[s].append(article)
-
-        authorp, authors = zip(*sorted(zip(authorp, authors)))
-
-        self.ui.tblAuthors.setRowCount(len(authors))
-        for i in range(len(authors)):
-            papers = QTableWidgetItem(f'{authorp[-1-i]}')
-            papers.setData(QtCore.Qt.UserRole, authora[authors[-1-i]])
-
-            self.ui.tblAuthors.setItem(i, 0, QTableWidgetItem(f'{authors[-1-i]}'))
-            self.ui.tblAuthors.setItem(i, 1, papers)
+        self.model.setCoauthors(Author.getCoauthors(exclude=name))
 
 
     @staticmethod
@@ -101,6 +85,7 @@ class DialogTopCoauthors(QtWidgets.QDialog):
         """
         Execute this dialog.
         """
-        return DialogTopCoauthors().exec()
+        with config.database().profiler.action('Top co-authors'):
+            return DialogTopCoauthors().exec()
 
 
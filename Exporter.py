@@ -0,0 +1,173 @@
+# Streaming export of publications to bibliography files
+#
+# Publications are read from the database as lightweight rows, in chunks
+# of CHUNK_SIZE rows ('yield_per'), and each entry is written to the file
+# as soon as it has been formatted. Only the current chunk and the cite
+# key index (one counter per first author and year, see
+# 'db.formats.CiteKeys') are kept in memory, so the memory used does not
+# grow with the number of exported publications.
+#
+# Entries can be written in any of the formats of 'db.formats', or as
+# text using a reference format (see 'ReferenceFormatter').
+
+from sqlalchemy import select
+
+from db import Article, config, formats, fulltext, Presentation, ReferenceFormat, Setting
+import ReferenceFormatter
+
+
+# Number of rows to fetch from the database at a time
+CHUNK_SIZE = 500
+
+
+# Export file types: (format, description, file extension)
+FILE_TYPES = [
+    ('bibtex', 'BibTeX', 'bib'),
+    ('ris', 'RIS', 'ris'),
+    ('csl-json', 'CSL-JSON', 'json'),
+    ('text', 'Text', 'txt')
+]
+
+
+def fileFilter(names):
+    """
+    Returns a file dialog filter string for the export formats with the
+    given names.
+    """
+    return ';;'.join([f'{desc} (*.{ext})' for name in names for fmt, desc, ext in FILE_TYPES if fmt == name])
+
+
+def fileFormat(selected):
+    """
+    Returns the export format corresponding to the selected file dialog
+    filter.
+    """
+    for fmt, desc, ext in FILE_TYPES:
+        if selected.startswith(f'{desc} ('):
+            return fmt
+
+    raise Exception(f"Unrecognized export file type: '{selected}'.")
+
+
+def query(cls, search=None):
+    """
+    Returns a statement selecting the publications of the given class (as
+    rows), newest first. If given, only publications matching the search
+    string are selected.
+    """
+    stmt = select(*cls.__table__.columns)
+    if search is not None:
+        stmt = stmt.where(cls.id.in_(fulltext.matching(cls.__tablename__, search)))
+
+    return stmt.order_by(cls.date.desc())
+
+
+def stream(cls, ids=None, search=None, chunksize=CHUNK_SIZE):
+    """
+    Generate the publications of the given class as rows, fetching them
+    from the database in chunks of 'chunksize' rows. If 'ids' is given,
+    the publications with those IDs are generated in the given order.
+    Otherwise, all publications (matching 'search', if given) are
+    generated, newest first.
+
+    The rows are read using the current session, so the generator must be
+    iterated within a read session opened by the caller (see 'export()').
+    It does not open a session itself, as the session would then stay on
+    the session stack whenever the generator is suspended.
+    """
+    db = config.database()
+
+    if ids is None:
+        yield from db.exe(query(cls, search).execution_options(yield_per=chunksize))
+        return
+
+    for c in range(0, len(ids), chunksize):
+        chunk = ids[c:c+chunksize]
+        rows = {r.id: r for r in db.exe(query(cls).where(cls.id.in_(chunk)))}
+        for i in chunk:
+            if i in rows:
+                yield rows[i]
+
+
+class TextWriter:
+    """
+    Writes articles to a file as text, formatted with a reference format,
+    one reference per line.
+    """
+
+
+    def __init__(self, f, code, maxauthors=100, abbrjournal=False, includeperiods=False, kind=ReferenceFormat.KIND_CODE):
+        """
+        Constructor.
+
+        :param f:    File to write the references to.
+        :param code: Code (or template) of the reference format.
+        :param kind: Kind of reference format ('ReferenceFormat.KIND_*').
+        """
+        self.f = f
+        self.func = ReferenceFormatter.compileFormat(code, kind)
+        self.firstauthor = Setting.get('name').value
+        self.options = dict(maxauthors=maxauthors, abbrjournal=abbrjournal, includeperiods=includeperiods)
+
+
+    def write(self, article):
+        """
+        Write the reference of the given article.
+        """
+        variables = ReferenceFormatter.getVariables(article, self.firstauthor, **self.options)
+        self.f.write(self.func(**variables) + '\n')
+
+
+    def close(self):
+        pass
+
+
+def export(filename, format, articles=True, presentations=True, search=None, code=None, kind=ReferenceFormat.KIND_CODE, **options):
+    """
+    Export publications to the named file. Returns the number of exported
+    publications.
+
+    :param format:        Name of the output format (see FILE_TYPES).
+    :param articles:      Export articles. If a list, the IDs of the
+                          articles to export, in order.
+    :param presentations: Export presentations. If a list, the IDs of the
+                          presentations to export, in order. Presentations
+                          are not exported as text, since the reference
+                          formats only apply to articles.
+    :param search:        Only export publications matching this string.
+    :param code:          Code of the reference format used for text export
+                          (defaults to 'ReferenceFormat.DEFAULT').
+    :param kind:          Kind of the reference format
+                          ('ReferenceFormat.KIND_*').
+    :param options:       Options passed to the reference formatter.
+    """
+    if format == 'text':
+        presentations = False
+
+    sources = []
+    for cls, selection in [(Article, articles), (Presentation, presentations)]:
+        if selection is True:
+            sources.append(stream(cls, search=search))
+        elif selection:
+            sources.append(stream(cls, ids=list(selection)))
+
+    n = 0
+    with config.database().reading(), open(filename, 'w', encoding='utf-8') as f:
+        if format == 'text':
+            if code is None:
+                code, kind = ReferenceFormat.DEFAULT, ReferenceFormat.KIND_CODE
+
+            writer = TextWriter(f, code, kind=kind, **options)
+        else:
+            writer = formats.Writer(f, format)
+
+        for source in sources:
+            for pub in source:
+                writer.write(pub)
+                n += 1
+
+        writer.close()
+
+    return n
+
+
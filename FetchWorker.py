@@ -0,0 +1,116 @@
+# Background fetching of publication metadata
+#
+# Requests to doi.org and arXiv may take a long time to complete, and so
+# are run on a worker thread of the global QThreadPool rather than on the
+# GUI thread. A modal progress dialog is shown while the request is
+# running, from which the request can be cancelled.
+
+
+from PyQt5 import QtCore, QtWidgets
+import traceback
+
+from db import config, refhelp, Setting
+
+
+def getTimeout():
+    """
+    Returns the network timeout (in seconds) configured in the user
+    settings.
+    """
+    s = Setting.get('timeout')
+
+    try:
+        return float(s.value)
+    except (AttributeError, ValueError):
+        return refhelp.TIMEOUT
+
+
+class FetchSignals(QtCore.QObject):
+
+
+    # Emitted with the fetched publication and a flag indicating whether
+    # a publication with the same DOI already exists in the database
+    fetched = QtCore.pyqtSignal(object, bool)
+
+    # Emitted with an error message and traceback if the fetch fails
+    failed = QtCore.pyqtSignal(str, str)
+
+
+class FetchWorker(QtCore.QRunnable):
+
+
+    def __init__(self, fetch, exists):
+        """
+        Constructor.
+
+        :param fetch:  Function taking no arguments which fetches and
+                       returns the publication.
+        :param exists: Function taking a DOI which checks whether the
+                       publication already exists in the database.
+        """
+        super().__init__()
+
+        self.fetch = fetch
+        self.exists = exists
+        self.signals = FetchSignals()
+        self.cancelled = False
+
+
+    def cancel(self):
+        """
+        Cancel the fetch. The request itself can not be interrupted, but
+        its result is discarded and no signal is emitted.
+        """
+        self.cancelled = True
+
+
+    def run(self):
+        """
+        Fetch the publication and check whether it already exists in the
+        database.
+        """
+        try:
+            publication = self.fetch()
+            if self.cancelled:
+                return
+
+            with config.database().reading():
+                exists = self.exists(publication.doi)
+        except Exception as ex:
+            if not self.cancelled:
+                self.signals.failed.emit(str(ex), ''.join(traceback.format_exception(ex)))
+            return
+
+        if not self.cancelled:
+            self.signals.fetched.emit(publication, exists)
+
+
+def start(parent, label, fetch, exists, fetched, failed):
+    """
+    Start fetching a publication in the background, showing a progress
+    dialog until the fetch completes or is cancelled. The 'fetched' and
+    'failed' slots are connected to the corresponding signals of the
+    worker, which is returned.
+    """
+    worker = FetchWorker(fetch, exists)
+
+    progress = QtWidgets.QProgressDialog(label, 'Cancel', 0, 0, parent)
+    progress.setWindowTitle('Please wait')
+    progress.setWindowModality(QtCore.Qt.WindowModal)
+    progress.setMinimumDuration(0)
+    progress.canceled.connect(worker.cancel)
+
+    progress.canceled.connect(progress.deleteLater)
+    for signal in [worker.signals.fetched, worker.signals.failed]:
+        signal.connect(progress.reset)
+        signal.connect(progress.deleteLater)
+
+    worker.signals.fetched.connect(fetched)
+    worker.signals.failed.connect(failed)
+
+    progress.show()
+    QtCore.QThreadPool.globalInstance().start(worker)
+
+    return worker
+
+
@@ -1,26 +1,37 @@
 #!/usr/bin/env python3
 
 import argparse
-from PyQt5 import QtGui, QtWidgets
-from PyQt5.QtGui import QStandardItem
+from PyQt5 import QtCore, QtGui, QtWidgets
 from PyQt5.QtWidgets import QFileDialog, QMessageBox
 from ui import MainWindow_design
 from pathlib import Path
 import sys
 
-from db import Article, config, Database, Presentation, Setting
+from db import Article, config, Database, Presentation, refhelp, Setting
+from db.httpcache import HTTPCache
 
+import Exporter
 import getref
 from DialogArticle import DialogArticle
+from DialogBulkImport import DialogBulkImport
 from DialogExportText import DialogExportText
 from DialogPresentation import DialogPresentation
+from DialogQueryProfile import DialogQueryProfile
 from DialogSettings import DialogSettings
 from DialogTopCoauthors import DialogTopCoauthors
+from PublicationTreeModel import PublicationTreeModel
 
 
 class MainWindow(QtWidgets.QMainWindow):
     
 
+    # Delay (in milliseconds) after the last key press before searching
+    SEARCH_DELAY = 150
+
+    # Maximum number of search results for which the tree is expanded
+    SEARCH_EXPAND = 200
+
+
     def __init__(self):
         """
         Constructor.
@@ -41,20 +52,35 @@ class MainWindow(QtWidgets.QMainWindow):
         self.ui.actionExportBibtex.setIcon(QtGui.QIcon(f'{root}/icons/disconnect.png'))
         self.ui.btnExport.setMenu(self.ui.exportMenu)
 
-        self.treeViewModel = QtGui.QStandardItemModel()
+        self.treeViewModel = PublicationTreeModel()
         self.ui.tvPublications.setModel(self.treeViewModel)
 
+        # The tree is filtered once the user pauses typing
+        self.searchTimer = QtCore.QTimer(self)
+        self.searchTimer.setSingleShot(True)
+        self.searchTimer.setInterval(self.SEARCH_DELAY)
+
         self.ui.lblTitle.setText('')
         self.ui.lblAuthors.setText('')
 
         # Open/create database
         args = self.parseArgs()
+
+        if not args.no_cache:
+            refhelp.setCache(HTTPCache(offline=args.offline))
+            self.ui.actionWorkOffline.setChecked(args.offline)
+        else:
+            self.ui.actionWorkOffline.setEnabled(False)
+
+        self.profileSQL = args.profile_sql or args.slow_query_log is not None
+        self.slowQueryLog = args.slow_query_log
+
         if args.new:
             fname = self.newDatabase()
             if fname is None:
                 raise Exception('No publications database specified. Exiting.')
         elif args.publications is not None:
-            self.loadPublications(args.publications)
+            self.loadPublications(args.publications, profile=args.profile)
         else:
             filename, _ = QFileDialog.getOpenFileName(
                 parent=self, caption="Open publications database",
@@ -64,7 +90,9 @@ class MainWindow(QtWidgets.QMainWindow):
             if not filename:
                 raise Exception('No publications database specified. Exiting.')
             else:
-                self.loadPublications(filename)
+                self.loadPublications(filename, profile=args.profile)
+
+        self.ui.actionProfileQueries.setChecked(self.profileSQL)
 
         self.bindEvents()
 
@@ -74,15 +102,23 @@ class MainWindow(QtWidgets.QMainWindow):
         Bind control events.
         """
         self.ui.actionExit.triggered.connect(self.exit)
-        self.ui.actionSettings.triggered.connect(DialogSettings.set)
+        self.ui.actionSettings.triggered.connect(self.editSettings)
+        self.ui.actionFromDOIList.triggered.connect(self.importDOIList)
+        self.ui.actionWorkOffline.toggled.connect(self.setOffline)
         self.ui.actionExportText.triggered.connect(DialogExportText.export)
+        self.ui.actionExportBibtex.triggered.connect(self.exportLibrary)
         self.ui.actionTopCoauthors.triggered.connect(DialogTopCoauthors.exe)
+        self.ui.actionProfileQueries.toggled.connect(self.setProfiling)
+        self.ui.actionQueryProfile.triggered.connect(self.showQueryProfile)
 
         self.ui.btnAddArticle.clicked.connect(self.addEditArticle)
         self.ui.btnAddPresentation.clicked.connect(self.addEditPresentation)
         self.ui.tvPublications.clicked.connect(self.articleSelected)
         self.ui.tvPublications.doubleClicked.connect(self.articleDoubleClicked)
         self.ui.btnBibTeX.clicked.connect(self.exportBibTeX)
+        self.ui.tbSearch.textChanged.connect(self.searchTimer.start)
+        self.ui.tbSearch.returnPressed.connect(self.selectBestMatch)
+        self.searchTimer.timeout.connect(self.searchPublications)
 
 
     def parseArgs(self):
@@ -90,6 +126,11 @@ class MainWindow(QtWidgets.QMainWindow):
 
         parser.add_argument('publications', help="File containing publication database.", nargs='?', default=None)
         parser.add_argument('-n', '--new', help="Create a new publication database.", action='store_true')
+        parser.add_argument('-p', '--profile', help="Database connection profile to use.", choices=Database.PROFILES.keys(), default='interactive')
+        parser.add_argument('--offline', help="Only fetch publication details from the local cache.", action='store_true')
+        parser.add_argument('--no-cache', help="Do not cache fetched publication details.", action='store_true')
+        parser.add_argument('--profile-sql', help="Profile the SQL statements issued by each user action.", action='store_true')
+        parser.add_argument('--slow-query-log', help="Profile SQL statements, and log slow statements with their query plans to the given file.", default=None)
 
         return parser.parse_args()
 
@@ -102,13 +143,16 @@ class MainWindow(QtWidgets.QMainWindow):
         self.close()
 
 
-    def loadPublications(self, filename):
+    def loadPublications(self, filename, profile='interactive'):
         """
         Load the publications database.
         """
         self.filename = filename
-        self.db = Database(filename)
+        self.db = Database(filename, profile=profile)
         config.init(self.db)
+
+        if self.profileSQL:
+            self.db.profiler.enable(slowlog=self.slowQueryLog)
         
         self.reloadPublications()
 
@@ -117,21 +161,112 @@ class MainWindow(QtWidgets.QMainWindow):
         """
         Reload the publications view.
         """
-        self.treeViewModel.clear()
+        with self.db.profiler.action('Reload publications'), self.db.reading():
+            self.treeViewModel.reload()
+
+            self.stats = Article.getStatistics()
+            self.pstats = Presentation.getStatistics()
+        self.updateStatistics()
+
+
+    def searchPublications(self):
+        """
+        Filter the publications view by the search string.
+        """
+        self.searchTimer.stop()
+
+        with self.db.profiler.action('Search'), self.db.reading():
+            self.treeViewModel.setSearch(self.ui.tbSearch.text())
+
+            if self.treeViewModel.search is not None:
+                nmatches = sum([c.count() for c in self.treeViewModel.categories])
+                if nmatches <= self.SEARCH_EXPAND:
+                    self.ui.tvPublications.expandAll()
+
+
+    def selectBestMatch(self):
+        """
+        Select the publication best matching the search string.
+        """
+        self.searchPublications()
+
+        s = self.treeViewModel.search
+        if s is None:
+            return
+
+        with self.db.profiler.action('Search'), self.db.reading():
+            idx = QtCore.QModelIndex()
+            for itemtype, cls in [('article', Article), ('presentation', Presentation)]:
+                ids = cls.search(s, limit=1)
+                if ids:
+                    idx = self.treeViewModel.findPublication(itemtype, ids[0])
+                    break
+
+        if idx.isValid():
+            self.ui.tvPublications.setCurrentIndex(idx)
+            self.ui.tvPublications.scrollTo(idx)
+            self.articleSelected(idx)
+
+
+    def updateStatistics(self):
+        """
+        Update the statistics labels.
+        """
+        stats, pstats = self.stats, self.pstats
 
-        stats = Article.loadPublicationsToTreeview(self.treeViewModel)
         self.ui.lblTotalPublications.setText(f"{stats['published']+stats['npublished']}")
         self.ui.lblFirstAuthor.setText(f"{stats['nfirst']}")
         self.ui.lblNRTotalPublications.setText(f"{stats['npeerreviewed']}")
         self.ui.lblNRFirstAuthor.setText(f"{stats['nfirst_nr']}")
         self.ui.lblInProgress.setText(f"{stats['npublished']}")
 
-        pstats = Presentation.loadPresentationsToTreeview(self.treeViewModel)
         self.ui.lblPosters.setText(f"{pstats['poster']}")
         self.ui.lblOral.setText(f"{pstats['oral']}")
         self.ui.lblInvited.setText(f"{pstats['invited']}")
 
 
+    def articleChanged(self, change):
+        """
+        Update the publications view after an article has been saved.
+        """
+        self.treeViewModel.applyChange('article', change)
+
+        def adjust(status, first, delta):
+            cat = Article.STATUS_CATEGORY[status]
+            self.stats[cat] += delta
+            if first:
+                self.stats['nfirst_nr' if cat == 'npeerreviewed' else 'nfirst'] += delta
+
+        if not change['inserted']:
+            adjust(change['oldstatus'], change['oldfirst'], -1)
+        adjust(change['newstatus'], change['newfirst'], +1)
+
+        self.updateStatistics()
+
+
+    def presentationChanged(self, change):
+        """
+        Update the publications view after a presentation has been saved.
+        """
+        self.treeViewModel.applyChange('presentation', change)
+
+        if not change['inserted']:
+            self.pstats[Presentation.TYPE_CATEGORY[change['oldtype']]] -= 1
+        self.pstats[Presentation.TYPE_CATEGORY[change['newtype']]] += 1
+
+        self.updateStatistics()
+
+
+    def editSettings(self):
+        """
+        Edit the user settings.
+        """
+        with self.db.profiler.action('Settings dialog'):
+            if DialogSettings.set():
+                self.stats = Article.getStatistics()
+                self.updateStatistics()
+
+
     def newDatabase(self):
         """
         Create a new publications database.
@@ -147,7 +282,7 @@ class MainWindow(QtWidgets.QMainWindow):
         self.loadPublications(filename)
 
         # Get user settings
-        DialogSettings.set()
+        self.editSettings()
 
         return filename
 
@@ -156,44 +291,74 @@ class MainWindow(QtWidgets.QMainWindow):
         """
         Add/edit an article.
         """
-        article = None
-        if id is not None:
-            article = Article.get(id=id)
+        with self.db.profiler.action('Article dialog'):
+            article = None
+            if id is not None:
+                with self.db.reading():
+                    article = Article.get(id=id)
 
-        if DialogArticle.exe(article):
-            self.reloadPublications()
+            change = DialogArticle.exe(article)
+            if change:
+                self.articleChanged(change)
 
 
     def addEditPresentation(self, id=None):
         """
         Add/edit a presentation.
         """
-        presentation = None
-        if id is not None:
-            presentation = Presentation.get(id=id)
+        with self.db.profiler.action('Presentation dialog'):
+            presentation = None
+            if id is not None:
+                with self.db.reading():
+                    presentation = Presentation.get(id=id)
 
-        if DialogPresentation.exe(presentation):
-            self.reloadPublications()
+            change = DialogPresentation.exe(presentation)
+            if change:
+                self.presentationChanged(change)
 
 
-    def getItemType(self, item):
+    def importDOIList(self):
         """
-        Determine the publication type represented by a tree view item.
+        Import articles from a list of DOIs and arXiv ids.
         """
-        rootitem = item
-        while rootitem.parent() is not None:
-            rootitem = rootitem.parent()
+        with self.db.profiler.action('Bulk import'):
+            if DialogBulkImport.exe(self):
+                self.reloadPublications()
 
-        if rootitem.text() in ['Published', 'In preparation', 'Non-peer reviewed']:
-            return 'article'
-        elif rootitem.text().startswith(('Published (', 'In preparation (', 'Non-peer reviewed (')):
-            return 'article'
-        elif rootitem.text() in ['Oral presentations', 'Poster presentations', 'Invited presentations']:
-            return 'presentation'
-        elif rootitem.text().startswith(('Oral presentations (', 'Poster presentations (', 'Invited presentations (')):
-            return 'presentation'
 
-        return None
+    def setOffline(self, offline):
+        """
+        Enable/disable offline mode, in which publication details are
+        only fetched from the local cache.
+        """
+        if refhelp.CACHE is not None:
+            refhelp.CACHE.offline = offline
+
+
+    def setProfiling(self, enabled):
+        """
+        Enable/disable profiling of the SQL statements issued by each
+        user action.
+        """
+        self.profileSQL = enabled
+        if enabled:
+            self.db.profiler.enable()
+        else:
+            self.db.profiler.disable()
+
+
+    def showQueryProfile(self):
+        """
+        Show the SQL query profile.
+        """
+        DialogQueryProfile.exe(self.db.profiler, self)
+
+
+    def getItemType(self, modelIndex):
+        """
+        Determine the publication type represented by a tree view item.
+        """
+        return self.treeViewModel.itemType(modelIndex)
 
 
     def clearDetails(self):
@@ -213,16 +378,18 @@ class MainWindow(QtWidgets.QMainWindow):
         """
         Signal triggered when an item in the tree view is clicked.
         """
-        item = self.treeViewModel.itemFromIndex(modelIndex)
+        itemid = self.treeViewModel.itemId(modelIndex)
 
-        if item.data() is None:
+        if itemid is None:
             self.clearDetails()
             self.ui.btnBibTeX.setEnabled(False)
             return
 
-        itemtype = self.getItemType(item)
+        itemtype = self.getItemType(modelIndex)
         if itemtype == 'presentation':
-            p = Presentation.get(item.data())
+            with self.db.profiler.action('Select presentation'), self.db.reading():
+                p = Presentation.get(itemid)
+
             if p is None:
                 self.clearDetails()
                 self.ui.btnBibTeX.setEnabled(False)
@@ -252,7 +419,9 @@ class MainWindow(QtWidgets.QMainWindow):
 
             self.ui.btnBibTeX.setEnabled(False)
         else:
-            a = Article.get(item.data())
+            with self.db.profiler.action('Select article'), self.db.reading():
+                a = Article.get(itemid)
+
             if a is None:
                 self.clearDetails()
                 self.ui.btnBibTeX.setEnabled(False)
@@ -287,13 +456,13 @@ class MainWindow(QtWidgets.QMainWindow):
         """
         Signal triggered when an item in the tree view is double clicked.
         """
-        item = self.treeViewModel.itemFromIndex(modelIndex)
+        itemid = self.treeViewModel.itemId(modelIndex)
 
-        if item.data() is not None:
-            if self.getItemType(item) == 'presentation':
-                self.addEditPresentation(item.data())
+        if itemid is not None:
+            if self.getItemType(modelIndex) == 'presentation':
+                self.addEditPresentation(itemid)
             else:
-                self.addEditArticle(item.data())
+                self.addEditArticle(itemid)
 
 
     def exportBibTeX(self):
@@ -301,16 +470,39 @@ class MainWindow(QtWidgets.QMainWindow):
         The "export BibTeX" button was clicked.
         """
         modelIndex = self.ui.tvPublications.selectedIndexes()[0]
-        item = self.treeViewModel.itemFromIndex(modelIndex)
+        itemid = self.treeViewModel.itemId(modelIndex)
+
+        if itemid is not None:
+            if self.getItemType(modelIndex) == 'article':
+                with self.db.profiler.action('Copy BibTeX'), self.db.reading():
+                    article = Article.get(itemid)
 
-        if item.data() is not None:
-            if self.getItemType(item) == 'article':
-                article = Article.get(item.data())
                 cb = QtWidgets.QApplication.clipboard()
                 cb.clear(mode=cb.Clipboard)
                 cb.setText(getref.formatBibTeX(article), mode=cb.Clipboard)
 
 
+    def exportLibrary(self):
+        """
+        Export the publications shown in the tree view (i.e. all
+        publications, or those matching the search string) to a
+        bibliography file.
+        """
+        filename, selected = QFileDialog.getSaveFileName(
+            parent=self, caption="Export publications",
+            filter=Exporter.fileFilter(['bibtex', 'ris', 'csl-json'])
+        )
+
+        if not filename:
+            return
+
+        try:
+            with self.db.profiler.action('Export library'):
+                Exporter.export(filename, Exporter.fileFormat(selected), search=self.treeViewModel.search)
+        except Exception as ex:
+            QMessageBox.critical(self, 'Export error', f'Exception occurred while exporting publications.\n\n{ex}')
+
+
 if __name__ == '__main__':
     app = QtWidgets.QApplication(sys.argv)
     window = MainWindow()
@@ -0,0 +1,120 @@
+# Index for filtering lists of names as the user types
+#
+# Names are normalized once (case- and diacritic-folded, with punctuation
+# removed), and the trigrams of every word are indexed. A query matches
+# a name if the normalized query is a substring of the normalized name,
+# or, for fuzzy matching, if every word of the query either occurs in the
+# name or shares most of its trigrams with the name (so that misspelled
+# names are still found).
+
+import unicodedata
+import re
+
+
+def normalize(s):
+    """
+    Normalize a name for matching: diacritics are removed, the name is
+    case-folded, and everything except letters and digits is turned into
+    single spaces.
+    """
+    s = unicodedata.normalize('NFKD', s)
+    s = ''.join([c for c in s if not unicodedata.combining(c)])
+    return ' '.join(re.findall(r'\w+', s.casefold()))
+
+
+def trigrams(s):
+    """
+    Returns the set of trigrams of the words of the given (normalized)
+    string. Words are padded, so that the beginning and end of a word
+    form trigrams of their own.
+    """
+    grams = set()
+    for w in s.split():
+        w = f'  {w} '
+        for i in range(len(w)-2):
+            grams.add(w[i:i+3])
+
+    return grams
+
+
+class NameIndex:
+
+
+    # Minimum fraction of the trigrams of the query which must occur in a
+    # name for a fuzzy match
+    THRESHOLD = 0.6
+
+    # Minimum query length for fuzzy matching
+    MINFUZZY = 4
+
+
+    def __init__(self, names):
+        """
+        Constructor.
+
+        :param names: List of names to index. Matches are returned as
+                      indices into this list.
+        """
+        self.names = [normalize(n) for n in names]
+        self.index = {}
+        for i, name in enumerate(self.names):
+            for g in trigrams(name):
+                self.index.setdefault(g, []).append(i)
+
+
+    def __len__(self):
+        return len(self.names)
+
+
+    def similar(self, i, word, grams):
+        """
+        Check if the given query word (with the given trigrams) occurs in,
+        or is similar to a word of, the name with index 'i'.
+        """
+        if word in self.names[i]:
+            return True
+        elif len(word) < self.MINFUZZY:
+            return False
+        else:
+            return len(grams & trigrams(self.names[i])) >= self.THRESHOLD * len(grams)
+
+
+    def match(self, query, fuzzy=True):
+        """
+        Returns the set of indices of the names matching the given query,
+        or None if the query is empty (i.e. all names match).
+        """
+        q = normalize(query)
+        if not q:
+            return None
+
+        # Substring matches. All (unpadded) trigrams of the query occur in
+        # the names containing it, so only those need to be checked.
+        inner = [g for g in trigrams(q) if ' ' not in g]
+        if inner:
+            candidates = min([self.index.get(g, []) for g in inner], key=len)
+        else:
+            candidates = range(len(self.names))
+
+        matches = set([i for i in candidates if q in self.names[i]])
+
+        # Fuzzy matches. Candidates are the names which are similar to the
+        # first sufficiently long word of the query.
+        words = {w: trigrams(w) for w in q.split()}
+        long = [w for w in words if len(w) >= self.MINFUZZY]
+        if fuzzy and long:
+            grams = words[long[0]]
+            counts = {}
+            for g in grams:
+                for i in self.index.get(g, []):
+                    counts[i] = counts.get(i, 0) + 1
+
+            n = self.THRESHOLD * len(grams)
+            matches.update([
+                i for i, c in counts.items()
+                if c >= n and all([self.similar(i, w, g) for w, g in words.items()])
+            ])
+
+        return matches
+
+
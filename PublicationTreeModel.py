@@ -0,0 +1,678 @@
+# Lazily populated item model for the publication tree views
+
+from array import array
+from pathlib import Path
+from PyQt5 import QtCore, QtGui
+from PyQt5.QtCore import Qt
+
+from db import Article, config, Presentation
+
+
+class CategoryNode:
+    """
+    A top-level node in the publication tree.
+    """
+    __slots__ = ('itemtype', 'category', 'name', 'codes', 'icon', 'leaficon', 'row', 'years', 'check')
+
+    def __init__(self, itemtype, category, name, codes, leaficon, row):
+        self.itemtype = itemtype
+        self.category = category
+        self.name = name
+        self.codes = codes
+        self.icon = 'category'
+        self.leaficon = leaficon
+        self.row = row
+        self.years = []
+        self.check = Qt.Unchecked
+
+
+    def count(self):
+        return sum([y.count for y in self.years])
+
+
+class YearNode:
+    """
+    A year node in the publication tree. The children of a year node
+    are only loaded from the database once the node is expanded, and are
+    stored in compact arrays.
+    """
+    __slots__ = ('parent', 'year', 'count', 'row', 'loaded', 'ids', 'codes', 'dates', 'labels', 'check')
+
+    def __init__(self, parent, year, count, row):
+        self.parent = parent
+        self.year = year
+        self.count = count
+        self.row = row
+        self.loaded = False
+        self.ids = array('q')
+        self.codes = array('b')
+        self.dates = array('l')
+        self.labels = []
+        self.check = Qt.Unchecked
+
+
+class PublicationTreeModel(QtCore.QAbstractItemModel):
+
+
+    # Data roles
+    ItemIdRole = Qt.UserRole + 1
+    ItemTypeRole = Qt.UserRole + 2
+
+
+    ARTICLE_CATEGORIES = [
+        ('npublished', 'In preparation', [Article.STATUS_ACCEPTED, Article.STATUS_SUBMITTED], 'article-red'),
+        ('published', 'Published', [Article.STATUS_PUBLISHED], 'article-green'),
+        ('npeerreviewed', 'Non-peer reviewed', [Article.STATUS_NON_REVIEWED], 'article-green')
+    ]
+    PRESENTATION_CATEGORIES = [
+        ('oral', 'Oral presentations', [Presentation.TYPE_ORAL], 'oral'),
+        ('poster', 'Poster presentations', [Presentation.TYPE_POSTER], 'poster'),
+        ('invited', 'Invited presentations', [Presentation.TYPE_INVITED], 'invited')
+    ]
+
+
+    def __init__(self, articles=True, presentations=True, checkable=False, parent=None):
+        """
+        Constructor.
+        """
+        super().__init__(parent)
+
+        self.articles = articles
+        self.presentations = presentations
+        self.checkable = checkable
+
+        self.icons = PublicationTreeModel.getIcons()
+
+        self.categories = []
+        # Checked publications, mapped to their sort key in the tree
+        self.selection = {}
+        # If set, only publications matching this search string are shown
+        self.search = None
+
+
+    @staticmethod
+    def getIcons():
+        """
+        Returns the icons of the nodes of the tree, by name.
+        """
+        root = Path(__file__).parent.absolute()
+        names = [
+            'year', 'category', 'article-blue', 'article-green',
+            'article-red', 'oral', 'poster', 'invited'
+        ]
+
+        return {n: QtGui.QIcon(f'{root}/icons/{n}.png') for n in names}
+
+
+    def reload(self):
+        """
+        Reload the category and year nodes from the database. Individual
+        publications are loaded when their year node is expanded.
+        """
+        self.beginResetModel()
+
+        self.categories = []
+        self.selection = {}
+        if self.articles:
+            self._addCategories('article', self.ARTICLE_CATEGORIES, Article.getTreeCounts(search=self.search))
+        if self.presentations:
+            self._addCategories('presentation', self.PRESENTATION_CATEGORIES, Presentation.getTreeCounts(search=self.search))
+
+        self.endResetModel()
+
+
+    def setSearch(self, s):
+        """
+        Only show the publications matching the given search string (or
+        all publications, if the string is empty or None).
+        """
+        s = s.strip() if s else None
+        if s == self.search:
+            return
+
+        self.search = s or None
+        self.reload()
+
+
+    def _addCategories(self, itemtype, categories, counts):
+        """
+        Add the given categories to the tree, with year nodes taken from
+        the given list of (code, year, count) aggregates.
+        """
+        for category, name, codes, leaficon in categories:
+            c = CategoryNode(itemtype, category, name, codes, leaficon, len(self.categories))
+
+            years = {}
+            for code, year, count in counts:
+                if code in codes:
+                    years[int(year)] = years.get(int(year), 0) + count
+
+            for year in sorted(years.keys(), reverse=True):
+                c.years.append(YearNode(c, year, years[year], len(c.years)))
+
+            self.categories.append(c)
+
+
+    def _loadYear(self, node):
+        """
+        Load the publications of the given year node from the database.
+        """
+        if node.parent.itemtype == 'article':
+            rows = Article.getTreeRows(statuses=node.parent.codes, year=node.year, search=self.search)
+        else:
+            rows = Presentation.getTreeRows(types=node.parent.codes, year=node.year, search=self.search)
+
+        self._setYearRows(node, rows)
+
+
+    def _loadCategory(self, cat):
+        """
+        Load the publications of all year nodes of the given category
+        which have not yet been loaded, using a single query for the
+        entire category.
+        """
+        if all([y.loaded for y in cat.years]):
+            return
+
+        if cat.itemtype == 'article':
+            rows = Article.getTreeRows(statuses=cat.codes, search=self.search)
+        else:
+            rows = Presentation.getTreeRows(types=cat.codes, search=self.search)
+
+        # The rows are ordered by date, and so by year
+        years = {}
+        for r in rows:
+            years.setdefault(r.date.year, []).append(r)
+
+        for y in cat.years:
+            if not y.loaded:
+                self._setYearRows(y, years.get(y.year, []))
+
+
+    def _setYearRows(self, node, rows):
+        """
+        Set the children of the given (not yet loaded) year node from the
+        given publication tree rows.
+        """
+        ids = array('q')
+        codes = array('b')
+        dates = array('l')
+        labels = []
+        for r in rows:
+            ids.append(r[0])
+            codes.append(r[1])
+            dates.append(r.date.toordinal())
+            labels.append(self._label(r))
+
+        if len(ids) > 0:
+            self.beginInsertRows(self.createIndex(node.row, 0, node.parent), 0, len(ids)-1)
+
+        node.ids, node.codes, node.dates, node.labels = ids, codes, dates, labels
+        node.loaded = True
+
+        if node.check == Qt.Checked:
+            for i in range(len(ids)):
+                self._select(node, i, True)
+
+        if len(ids) > 0:
+            self.endInsertRows()
+
+
+    def _loadPublication(self, itemtype, id):
+        """
+        Load the tree view data for a single publication.
+        """
+        if itemtype == 'article':
+            return Article.getTreeRows(ids=[id])[0]
+        else:
+            return Presentation.getTreeRows(ids=[id])[0]
+
+
+    def findPublication(self, itemtype, id):
+        """
+        Returns the index of the publication with the given ID, loading
+        its year node if necessary. Returns an invalid index if the
+        publication is not in the tree.
+        """
+        r = Article.getTreeRows(ids=[id], search=self.search) if itemtype == 'article' else Presentation.getTreeRows(ids=[id], search=self.search)
+        if not r:
+            return QtCore.QModelIndex()
+
+        cat = self._findCategory(itemtype, r[0][1])
+        if cat is None:
+            return QtCore.QModelIndex()
+
+        for y in cat.years:
+            if y.year == r[0].date.year:
+                yidx = self.createIndex(y.row, 0, cat)
+                self.fetchMore(yidx)
+
+                if id in y.ids:
+                    return self.index(y.ids.index(id), 0, yidx)
+
+        return QtCore.QModelIndex()
+
+
+    def _label(self, row):
+        """
+        Returns the label to show for the given publication tree row.
+        """
+        surname = row.firstauthor.split(' ')[-1]
+        return f'{surname} ({row.date.year}): {row.title}'
+
+
+    def _findCategory(self, itemtype, code):
+        """
+        Returns the category node containing publications of the given
+        type and status/type code.
+        """
+        for c in self.categories:
+            if c.itemtype == itemtype and code in c.codes:
+                return c
+
+        return None
+
+
+    def applyChange(self, itemtype, change):
+        """
+        Update the tree after a publication has been saved, given the
+        change description returned by 'Article.save()' or
+        'Presentation.save()'. Only the affected nodes are modified, so
+        that the expansion state of the tree is retained.
+        """
+        if self.search is not None:
+            # The change may affect whether the publication matches the
+            # search, so the (filtered) tree is reloaded
+            self.reload()
+            return
+
+        key = 'status' if itemtype == 'article' else 'type'
+        newcat = self._findCategory(itemtype, change['new'+key])
+        if newcat is None:
+            return
+
+        oldnode = None
+        if not change['inserted']:
+            oldcat = self._findCategory(itemtype, change['old'+key])
+            if oldcat is not None:
+                for y in oldcat.years:
+                    if y.year == change['oldyear']:
+                        oldnode = y
+                        break
+
+        if oldnode is not None and oldnode.parent is newcat and oldnode.year == change['newyear']:
+            self._updatePublication(oldnode, change['id'])
+            return
+
+        if oldnode is not None:
+            self._removePublication(oldnode, change['id'])
+
+        self._insertPublication(newcat, change['newyear'], change['id'])
+
+
+    def _insertPosition(self, node, date, skip=None):
+        """
+        Returns the row at which a publication with the given date should
+        be inserted into the given year node, ignoring the row 'skip'.
+        """
+        pos = 0
+        for i in range(len(node.dates)):
+            if i != skip and node.dates[i] >= date:
+                pos += 1
+
+        return pos
+
+
+    def _insertPublication(self, cat, year, id):
+        """
+        Insert the publication with the given ID into the given category.
+        """
+        catidx = self.createIndex(cat.row, 0, self)
+
+        node = None
+        for y in cat.years:
+            if y.year == year:
+                node = y
+                break
+
+        if node is None:
+            row = len([y for y in cat.years if y.year > year])
+
+            self.beginInsertRows(catidx, row, row)
+            node = YearNode(cat, year, 0, row)
+            # The year node is empty, so all of its children are loaded
+            node.loaded = True
+            cat.years.insert(row, node)
+            for i in range(row+1, len(cat.years)):
+                cat.years[i].row = i
+            self.endInsertRows()
+
+        yidx = self.createIndex(node.row, 0, cat)
+        node.count += 1
+
+        if node.loaded:
+            r = self._loadPublication(cat.itemtype, id)
+            pos = self._insertPosition(node, r.date.toordinal())
+
+            self.beginInsertRows(yidx, pos, pos)
+            node.ids.insert(pos, r[0])
+            node.codes.insert(pos, r[1])
+            node.dates.insert(pos, r.date.toordinal())
+            node.labels.insert(pos, self._label(r))
+            self.endInsertRows()
+
+        self.dataChanged.emit(yidx, yidx, [Qt.DisplayRole])
+        self.dataChanged.emit(catidx, catidx, [Qt.DisplayRole])
+
+
+    def _removePublication(self, node, id):
+        """
+        Remove the publication with the given ID from the given year node.
+        The year node is removed if it becomes empty.
+        """
+        cat = node.parent
+        catidx = self.createIndex(cat.row, 0, self)
+        yidx = self.createIndex(node.row, 0, cat)
+
+        if node.loaded and id in node.ids:
+            row = node.ids.index(id)
+
+            self.beginRemoveRows(yidx, row, row)
+            del node.ids[row]
+            del node.codes[row]
+            del node.dates[row]
+            del node.labels[row]
+            self.endRemoveRows()
+
+        self.selection.pop(id, None)
+        node.count -= 1
+
+        if node.count <= 0:
+            self.beginRemoveRows(catidx, node.row, node.row)
+            del cat.years[node.row]
+            for i in range(node.row, len(cat.years)):
+                cat.years[i].row = i
+            self.endRemoveRows()
+        else:
+            self.dataChanged.emit(yidx, yidx, [Qt.DisplayRole])
+
+        self.dataChanged.emit(catidx, catidx, [Qt.DisplayRole])
+
+
+    def _updatePublication(self, node, id):
+        """
+        Relabel the publication with the given ID in the given year node,
+        moving it if its date has changed.
+        """
+        if not node.loaded or id not in node.ids:
+            return
+
+        cat = node.parent
+        yidx = self.createIndex(node.row, 0, cat)
+
+        r = self._loadPublication(cat.itemtype, id)
+        row = node.ids.index(id)
+        pos = self._insertPosition(node, r.date.toordinal(), skip=row)
+
+        if pos != row:
+            self.beginMoveRows(yidx, row, row, yidx, pos if pos < row else pos+1)
+
+        del node.ids[row]
+        del node.codes[row]
+        del node.dates[row]
+        del node.labels[row]
+
+        node.ids.insert(pos, r[0])
+        node.codes.insert(pos, r[1])
+        node.dates.insert(pos, r.date.toordinal())
+        node.labels.insert(pos, self._label(r))
+
+        if pos != row:
+            self.endMoveRows()
+
+        idx = self.index(pos, 0, yidx)
+        self.dataChanged.emit(idx, idx)
+
+
+    def node(self, index):
+        """
+        Returns the node corresponding to the given index. Publications
+        do not have nodes of their own, and so the year node containing
+        the publication is returned for them.
+        """
+        parent = index.internalPointer()
+        if parent is self:
+            return self.categories[index.row()]
+        elif isinstance(parent, CategoryNode):
+            return parent.years[index.row()]
+        else:
+            return parent
+
+
+    def isPublication(self, index):
+        """
+        Returns true if the given index refers to a publication.
+        """
+        return index.isValid() and isinstance(index.internalPointer(), YearNode)
+
+
+    def itemId(self, index):
+        """
+        Returns the database ID of the publication at the given index, or
+        None if the index does not refer to a publication.
+        """
+        if not self.isPublication(index):
+            return None
+
+        return index.internalPointer().ids[index.row()]
+
+
+    def itemType(self, index):
+        """
+        Returns the type of publication ('article' or 'presentation')
+        represented by the given index.
+        """
+        if not index.isValid():
+            return None
+
+        node = self.node(index)
+        if isinstance(node, YearNode):
+            return node.parent.itemtype
+        else:
+            return node.itemtype
+
+
+    def checkedIds(self):
+        """
+        Returns the IDs of all checked publications, in tree order.
+        """
+        return sorted(self.selection, key=self.selection.get)
+
+
+    def _select(self, node, row, checked):
+        """
+        Add or remove the publication in the given row of the given year
+        node to/from the set of checked publications.
+        """
+        if checked:
+            self.selection[node.ids[row]] = (node.parent.row, -node.dates[row], row)
+        else:
+            self.selection.pop(node.ids[row], None)
+
+
+    def index(self, row, column, parent=QtCore.QModelIndex()):
+        if not self.hasIndex(row, column, parent):
+            return QtCore.QModelIndex()
+
+        if not parent.isValid():
+            return self.createIndex(row, column, self)
+        else:
+            return self.createIndex(row, column, self.node(parent))
+
+
+    def parent(self, index):
+        if not index.isValid():
+            return QtCore.QModelIndex()
+
+        parent = index.internalPointer()
+        if parent is self:
+            return QtCore.QModelIndex()
+        elif isinstance(parent, CategoryNode):
+            return self.createIndex(parent.row, 0, self)
+        else:
+            return self.createIndex(parent.row, 0, parent.parent)
+
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if not parent.isValid():
+            return len(self.categories)
+        elif parent.column() > 0:
+            return 0
+
+        node = self.node(parent)
+        if isinstance(node, CategoryNode):
+            return len(node.years)
+        elif self.isPublication(parent):
+            return 0
+        else:
+            return len(node.ids)
+
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 1
+
+
+    def hasChildren(self, parent=QtCore.QModelIndex()):
+        if not parent.isValid():
+            return len(self.categories) > 0
+
+        node = self.node(parent)
+        if isinstance(node, CategoryNode):
+            return len(node.years) > 0
+        elif self.isPublication(parent):
+            return False
+        else:
+            return node.count > 0
+
+
+    def canFetchMore(self, parent):
+        if not parent.isValid() or self.isPublication(parent):
+            return False
+
+        # Category nodes are populated with year nodes on reload, and only
+        # the publications of the year nodes are loaded on demand
+        node = self.node(parent)
+        return isinstance(node, YearNode) and not node.loaded
+
+
+    def fetchMore(self, parent):
+        """
+        Load the publications of a year node, when it is expanded.
+        """
+        if not self.canFetchMore(parent):
+            return
+
+        with config.database().profiler.action('Expand year'):
+            self._loadYear(self.node(parent))
+
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.NoItemFlags
+
+        f = Qt.ItemIsEnabled | Qt.ItemIsSelectable
+        if self.checkable:
+            f |= Qt.ItemIsUserCheckable
+
+        return f
+
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+
+        node = self.node(index)
+        if isinstance(node, CategoryNode):
+            if role == Qt.DisplayRole:
+                return f'{node.name} ({node.count()})'
+            elif role == Qt.DecorationRole:
+                return self.icons[node.icon]
+            elif role == Qt.CheckStateRole and self.checkable:
+                return node.check
+            elif role == self.ItemTypeRole:
+                return node.itemtype
+        elif not self.isPublication(index):
+            # Year
+            if role == Qt.DisplayRole:
+                return f'{node.year} ({node.count})'
+            elif role == Qt.DecorationRole:
+                return self.icons['year']
+            elif role == Qt.CheckStateRole and self.checkable:
+                return node.check
+            elif role == self.ItemTypeRole:
+                return node.parent.itemtype
+        else:
+            # Publication
+            row = index.row()
+            if role == Qt.DisplayRole:
+                return node.labels[row]
+            elif role == Qt.DecorationRole:
+                return self.icons[node.parent.leaficon]
+            elif role == Qt.CheckStateRole and self.checkable:
+                return Qt.Checked if node.ids[row] in self.selection else Qt.Unchecked
+            elif role == self.ItemIdRole:
+                return node.ids[row]
+            elif role == self.ItemTypeRole:
+                return node.parent.itemtype
+
+        return None
+
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if not index.isValid() or role != Qt.CheckStateRole or not self.checkable:
+            return False
+
+        check = Qt.Checked if value == Qt.Checked else Qt.Unchecked
+        node = self.node(index)
+
+        if isinstance(node, CategoryNode):
+            node.check = check
+            if check == Qt.Checked:
+                # All publications of the category are selected, so they
+                # are loaded with a single query rather than year by year
+                with config.database().profiler.action('Check category'):
+                    self._loadCategory(node)
+
+            for y in node.years:
+                self._setYearChecked(y, check)
+
+            if node.years:
+                self.dataChanged.emit(self.index(0, 0, index), self.index(len(node.years)-1, 0, index), [Qt.CheckStateRole])
+        elif not self.isPublication(index):
+            self._setYearChecked(node, check)
+        else:
+            self._select(node, index.row(), check == Qt.Checked)
+
+        self.dataChanged.emit(index, index, [Qt.CheckStateRole])
+
+        return True
+
+
+    def _setYearChecked(self, node, check):
+        """
+        Set the check state of the given year node and all its children.
+        Children which have not yet been loaded are loaded if checked.
+        """
+        node.check = check
+        yidx = self.createIndex(node.row, 0, node.parent)
+
+        if not node.loaded:
+            if check == Qt.Checked:
+                self.fetchMore(yidx)
+        elif len(node.ids) > 0:
+            for i in range(len(node.ids)):
+                self._select(node, i, check == Qt.Checked)
+
+            self.dataChanged.emit(self.index(0, 0, yidx), self.index(len(node.ids)-1, 0, yidx), [Qt.CheckStateRole])
+
+
@@ -1,6 +1,9 @@
 # Helper class for formatting references
 
-from db import Setting
+import hashlib
+from collections import OrderedDict
+from db import ReferenceFormat, Setting
+import ReferenceTemplate
 
 
 ABBREVIATIONS = {
@@ -13,11 +16,68 @@ ABBREVIATIONS = {
 }
 
 
-def format(s, article, maxauthors=100, abbrjournal=False, includeperiods=False):
+# Variables made available to reference format code
+VARIABLES = [
+    'doi', 'title', 'url', 'pinboard', 'volume', 'issue', 'pages', 'date',
+    'year', 'nauthors', 'authors', 'firstauthor', 'journal'
+]
+
+# Maximum number of compiled reference formats to keep
+CACHE_SIZE = 32
+_compiled = OrderedDict()
+
+
+def compileFormat(s, kind=ReferenceFormat.KIND_CODE):
     """
-    Format the given article using the given code string.
+    Compile the given code string (or template, if 'kind' is
+    'ReferenceFormat.KIND_TEMPLATE') into a function taking the reference
+    format variables as keyword arguments. Compiled functions are cached
+    by the hash of the code, evicting the least recently used format
+    when more than CACHE_SIZE formats have been compiled.
+    """
+    key = (kind, hashlib.sha1(s.encode('utf-8')).hexdigest())
+
+    if key in _compiled:
+        _compiled.move_to_end(key)
+        return _compiled[key]
+
+    if kind == ReferenceFormat.KIND_TEMPLATE:
+        func = ReferenceTemplate.compileTemplate(s, VARIABLES)
+    else:
+        func = compileCode(s)
+
+    _compiled[key] = func
+    if len(_compiled) > CACHE_SIZE:
+        _compiled.popitem(last=False)
+
+    return func
+
+
+def compileCode(s):
     """
-    glbls = dict(
+    Compile the given code string into a function, by executing it as the
+    body of a function of the reference format variables.
+    """
+    code = f"def _refform_wrapfunc({', '.join(VARIABLES)}):\n"
+
+    lines = s.split('\n')
+    l = ''
+    for line in lines:
+        l += f'    {line}\n'
+
+    code += l
+
+    glbls = {}
+    exec(code, glbls)
+
+    return glbls['_refform_wrapfunc']
+
+
+def getVariables(article, firstauthor, maxauthors=100, abbrjournal=False, includeperiods=False):
+    """
+    Returns the reference format variables for the given article.
+    """
+    variables = dict(
         doi=article.doi,
         title=article.title,
         url=article.url,
@@ -26,49 +86,64 @@ def format(s, article, maxauthors=100, abbrjournal=False, includeperiods=False):
         issue=article.issue,
         pages=article.pages,
         date=article.date,
-        year=article.date.year,
-        retval=None
+        year=article.date.year
     )
 
     if maxauthors:
         authors = article.authors.split(', ')
-        glbls['nauthors'] = len(authors)
+        variables['nauthors'] = len(authors)
         if len(authors) > maxauthors:
             authorstr = ', '.join(authors[:maxauthors]) + ' et al'
         else:
             authorstr = article.authors
     else:
         authorstr = article.authors
-        glbls['nauthors'] = len(article.authors.split(','))
+        variables['nauthors'] = len(article.authors.split(','))
 
-    firstauthor = Setting.get('name').value
     if not includeperiods:
         authorstr = authorstr.replace('. ', ' ').replace('.', ' ')
         firstauthor = firstauthor.replace('. ', ' ').replace('.', ' ')
 
-    glbls['authors'] = authorstr
-    glbls['firstauthor'] = firstauthor
+    variables['authors'] = authorstr
+    variables['firstauthor'] = firstauthor
 
     if abbrjournal:
         if article.journal in ABBREVIATIONS:
-            glbls['journal'] = ABBREVIATIONS[article.journal]
+            variables['journal'] = ABBREVIATIONS[article.journal]
         else:
-            glbls['journal'] = article.journal
+            variables['journal'] = article.journal
     else:
-        glbls['journal'] = article.journal
+        variables['journal'] = article.journal
 
-    code = "def _refform_wrapfunc():\n"
+    return variables
 
-    lines = s.split('\n')
-    l = ''
-    for line in lines:
-        l += f'    {line}\n'
 
-    code += l
-    code += 'retval = _refform_wrapfunc()'
+def format(s, article, maxauthors=100, abbrjournal=False, includeperiods=False, kind=ReferenceFormat.KIND_CODE):
+    """
+    Format the given article using the given code string (or template).
+    """
+    func = compileFormat(s, kind)
+    firstauthor = Setting.get('name').value
 
-    exec(code, glbls)
+    return func(**getVariables(
+        article, firstauthor, maxauthors=maxauthors,
+        abbrjournal=abbrjournal, includeperiods=includeperiods
+    ))
+
+
+def format_many(s, articles, maxauthors=100, abbrjournal=False, includeperiods=False, kind=ReferenceFormat.KIND_CODE):
+    """
+    Format the given articles using the given code string (or template).
+    The code is compiled and the user settings are read once, and the
+    formatted references are yielded one at a time.
+    """
+    func = compileFormat(s, kind)
+    firstauthor = Setting.get('name').value
 
-    return glbls['retval']
+    for article in articles:
+        yield func(**getVariables(
+            article, firstauthor, maxauthors=maxauthors,
+            abbrjournal=abbrjournal, includeperiods=includeperiods
+        ))
 
 
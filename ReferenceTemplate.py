@@ -0,0 +1,344 @@
+# Declarative reference templates
+#
+# As an alternative to Python code, reference formats can be written as
+# templates, which are parsed once and compiled into plain Python
+# closures (without 'exec'), and so are both fast and safe to share.
+#
+# Syntax:
+#
+#   {title}                     Value of a reference format variable
+#                               (see 'ReferenceFormatter.VARIABLES').
+#   {journal|abbr}              Value passed through filters:
+#                                 abbr       Abbreviated journal name
+#                                 max:N      At most N authors, followed
+#                                            by 'et al'
+#                                 upper, lower, title, sentence
+#                                            Change the case
+#                                 date:FMT   Format a date (strftime)
+#                                 default:S  Use S if the value is empty
+#   {if pages}...{end}          Conditionals. A condition is a variable,
+#   {if nauthors > 3}...        optionally negated with 'not', or compared
+#   {else}...{end}              ('==', '!=', '<', '<=', '>', '>=') to a
+#                               number or a quoted string. Values compared
+#                               with a number are converted to numbers
+#                               (so that e.g. '{if volume > 40}' works,
+#                               although volumes are stored as text), and
+#                               such a comparison is false if the value is
+#                               empty or not a number. Values compared with
+#                               a string are compared as text.
+#   {{ and }}                   Literal braces.
+#
+# Empty (None) values are written as empty strings.
+#
+# Example:
+#
+#   {if nauthors > 3}{firstauthor} et al{else}{authors}{end}, {journal|abbr}
+#   {volume}{if pages}, {pages}{end} ({year})
+
+import itertools
+import operator
+import re
+
+
+# Comparison operators of conditions
+OPERATORS = {
+    '==': operator.eq, '!=': operator.ne,
+    '<': operator.lt, '<=': operator.le,
+    '>': operator.gt, '>=': operator.ge
+}
+
+NUMBER = re.compile(r'\s*-?\d+(\.\d+)?\s*$')
+
+CONDITION = re.compile(r'''(not\s+)?(\w+)(?:\s*(==|!=|<=|>=|<|>)\s*(-?\d+(?:\.\d+)?|'[^']*'|"[^"]*"))?$''')
+
+
+def toNumber(value):
+    """
+    Convert a variable value to a number, if possible. Returns None for
+    empty and non-numeric values.
+    """
+    if isinstance(value, (int, float)):
+        return value
+    elif isinstance(value, str) and NUMBER.match(value):
+        return float(value) if '.' in value else int(value)
+    else:
+        return None
+
+
+def maxAuthors(n):
+    """
+    Filter limiting an author list to 'n' authors.
+    """
+    n = int(n)
+    def f(s):
+        authors = s.split(', ')
+        if len(authors) > n:
+            return ', '.join(authors[:n]) + ' et al'
+        else:
+            return s
+
+    return f
+
+
+def abbreviate():
+    """
+    Filter abbreviating journal names.
+    """
+    from ReferenceFormatter import ABBREVIATIONS
+    return lambda s : ABBREVIATIONS.get(s, s)
+
+
+# Filters: functions taking the filter arguments (as strings) and
+# returning a function converting one text value
+FILTERS = {
+    'abbr': abbreviate,
+    'max': maxAuthors,
+    'upper': lambda : str.upper,
+    'lower': lambda : str.lower,
+    'title': lambda : str.title,
+    'sentence': lambda : (lambda s : s[:1].upper() + s[1:]),
+    'default': lambda d : (lambda s : s or d),
+}
+
+
+def tokenize(s):
+    """
+    Split a template into literal text and tags. Generates tuples
+    '(kind, value, position)', where 'kind' is either 'text' or 'tag'.
+    """
+    i = 0
+    buf = ''
+    while i < len(s):
+        if s.startswith('{{', i) or s.startswith('}}', i):
+            buf += s[i]
+            i += 2
+        elif s[i] == '{':
+            j = s.find('}', i)
+            if j < 0:
+                raise Exception(f"Unterminated '{{' at position {i}.")
+
+            if buf:
+                yield 'text', buf, i
+                buf = ''
+
+            yield 'tag', s[i+1:j].strip(), i
+            i = j+1
+        elif s[i] == '}':
+            raise Exception(f"Unmatched '}}' at position {i}. Write '}}}}' for a literal brace.")
+        else:
+            buf += s[i]
+            i += 1
+
+    if buf:
+        yield 'text', buf, i
+
+
+def parse(s, variables):
+    """
+    Parse a template into a list of nodes:
+
+      ('text', string)
+      ('field', name, date format, [filter functions])
+      ('if', condition function, [nodes], [else nodes])
+
+    Raises an exception if the template is invalid, or refers to
+    variables other than the given ones.
+    """
+    # Stack of (node list, open 'if' node, position)
+    root = []
+    stack = [(root, None, 0)]
+
+    for kind, value, pos in tokenize(s):
+        nodes = stack[-1][0]
+
+        if kind == 'text':
+            nodes.append(('text', value))
+        elif value.startswith('if ') or value == 'if':
+            node = ('if', parseCondition(value[2:].strip(), variables, pos), [], [])
+            nodes.append(node)
+            stack.append((node[2], node, pos))
+        elif value == 'else':
+            if stack[-1][1] is None or nodes is stack[-1][1][3]:
+                raise Exception(f"Unexpected '{{else}}' at position {pos}.")
+
+            node = stack.pop()[1]
+            stack.append((node[3], node, pos))
+        elif value == 'end':
+            if stack[-1][1] is None:
+                raise Exception(f"Unexpected '{{end}}' at position {pos}.")
+
+            stack.pop()
+        else:
+            nodes.append(parseField(value, variables, pos))
+
+    if len(stack) > 1:
+        raise Exception(f"Missing '{{end}}' for the '{{if}}' at position {stack[-1][2]}.")
+
+    return root
+
+
+def parseCondition(s, variables, pos):
+    """
+    Parse the condition of an '{if}' tag into a function of the template
+    variables.
+    """
+    m = CONDITION.match(s)
+    if not m:
+        raise Exception(f"Invalid condition '{s}' at position {pos}.")
+
+    negate, name, op, value = m.groups()
+    if name not in variables:
+        raise Exception(f"Unknown variable '{name}' at position {pos}.")
+
+    if op is None:
+        cond = lambda v : bool(v[name])
+    else:
+        compare = OPERATORS[op]
+
+        if value[0] in '\'"':
+            value = value[1:-1]
+            cond = lambda v : compare('' if v[name] is None else str(v[name]), value)
+        else:
+            value = float(value) if '.' in value else int(value)
+            def cond(v):
+                x = toNumber(v[name])
+                return x is not None and compare(x, value)
+
+    if negate:
+        return lambda v : not cond(v)
+    else:
+        return cond
+
+
+def parseField(s, variables, pos):
+    """
+    Parse a placeholder ('name|filter|filter:arg').
+    """
+    name, *filters = [f.strip() for f in s.split('|')]
+    if name not in variables:
+        raise Exception(f"Unknown variable '{name}' at position {pos}.")
+
+    # Dates are formatted before they are converted to text, so 'date'
+    # must be the first filter
+    datefmt = None
+    if filters and filters[0].split(':', 1)[0] == 'date':
+        datefmt = filters.pop(0)[5:] or '%Y-%m-%d'
+
+    funcs = []
+    for f in filters:
+        fname, *args = f.split(':', 1)
+        if fname not in FILTERS:
+            raise Exception(f"Unknown filter '{fname}' at position {pos}.")
+
+        try:
+            funcs.append(FILTERS[fname](*args))
+        except (TypeError, ValueError):
+            raise Exception(f"Invalid arguments to filter '{fname}' at position {pos}.")
+
+    return ('field', name, datefmt, funcs)
+
+
+def compileNodes(nodes, keys, plain):
+    """
+    Compile a list of nodes into a function taking the dict of template
+    variables, and returning the formatted text.
+
+    Literal text and plain placeholders are compiled into a '%' format
+    string, which is applied to the values of the placeholders (fetched
+    with a single 'operator.itemgetter()'), and only the values of the
+    other nodes are computed by closures. These values are stored in the
+    dict of variables under unique keys taken from 'keys', so that they
+    are fetched along with the placeholders. The names of the plain
+    placeholders are added to the set 'plain', and their values must be
+    replaced by empty strings if they are None before the function is
+    called.
+    """
+    fmt = ''
+    names = []
+    computed = []
+    for node in nodes:
+        if node[0] == 'text':
+            fmt += node[1].replace('%', '%%')
+        elif node[0] == 'field' and node[2] is None and not node[3]:
+            fmt += '%s'
+            names.append(node[1])
+            plain.add(node[1])
+        else:
+            key = f'_{next(keys)}'
+            fmt += '%s'
+            names.append(key)
+            computed.append((key, compileNode(node, keys, plain)))
+
+    if not names:
+        t = fmt % ()
+        return lambda v : t
+    elif fmt == '%s' and computed:
+        return computed[0][1]
+
+    get = operator.itemgetter(*names)
+    if len(names) == 1:
+        get1 = get
+        get = lambda v : (get1(v),)
+
+    if not computed:
+        return lambda v : fmt % get(v)
+
+    def render(v):
+        for key, f in computed:
+            v[key] = f(v)
+        return fmt % get(v)
+
+    return render
+
+
+def compileNode(node, keys, plain):
+    """
+    Compile a conditional, or a placeholder with filters (see
+    'compileNodes()').
+    """
+    if node[0] == 'if':
+        _, cond, then, otherwise = node
+        fthen, fotherwise = compileNodes(then, keys, plain), compileNodes(otherwise, keys, plain)
+        return lambda v : fthen(v) if cond(v) else fotherwise(v)
+    else:
+        _, name, datefmt, filters = node
+
+        if datefmt is not None:
+            get = lambda v : '' if v[name] is None else v[name].strftime(datefmt)
+        else:
+            get = lambda v : '' if v[name] is None else str(v[name])
+
+        if not filters:
+            return get
+        elif len(filters) == 1:
+            filt = filters[0]
+            return lambda v : filt(get(v))
+
+        def f(v):
+            s = get(v)
+            for filt in filters:
+                s = filt(s)
+            return s
+
+        return f
+
+
+def compileTemplate(s, variables):
+    """
+    Compile the given template into a function taking the template
+    variables as keyword arguments.
+    """
+    plain = set()
+    render = compileNodes(parse(s, variables), itertools.count(), plain)
+    plain = tuple(plain)
+
+    def f(**v):
+        for name in plain:
+            if v[name] is None:
+                v[name] = ''
+
+        return render(v)
+
+    return f
+
+
@@ -0,0 +1,157 @@
+# Shared helpers for the benchmark scripts
+
+import os
+import random
+import sys
+import time
+
+from datetime import date
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent.absolute()
+sys.path.insert(0, str(ROOT))
+
+from sqlalchemy.sql.expression import insert
+
+from db import Article, Authorship, config, Database, Presentation, Setting
+
+
+SURNAMES = [
+    'Hoppe', 'Smith', 'Ekmark', 'Embreus', 'Fülöp', 'Pusztai', 'Svensson',
+    'Papp', 'Olasz', 'Wijkamp', 'Vallhagen', 'Decker', 'Reux', 'Paz-Soldan'
+]
+
+# Syllables from which further surnames are generated, so that large
+# collaboration papers have (mostly) distinct authors
+PREFIXES = ['Ber', 'Kal', 'Mon', 'Sve', 'Ek', 'Holm', 'Lind', 'Str', 'Ander', 'Nils', 'Mar', 'Tor']
+SUFFIXES = ['son', 'berg', 'ström', 'man', 'ez', 'ov', 'ini', 'sen', 'ard']
+
+
+def randomAuthors(n, rnd):
+    """
+    Generate a random author list with 'n' authors.
+    """
+    authors = []
+    for _ in range(n):
+        initials = f'{chr(ord("A")+rnd.randrange(26))}.'
+        if rnd.random() < 0.3:
+            initials += f' {chr(ord("A")+rnd.randrange(26))}.'
+
+        if rnd.random() < 0.5:
+            surname = rnd.choice(SURNAMES)
+        else:
+            surname = rnd.choice(PREFIXES) + rnd.choice(SUFFIXES)
+
+        authors.append(f'{initials} {surname}')
+
+    return ', '.join(authors)
+
+
+def randomAuthorCount(rnd, maxauthors=3000, collaborations=0.05):
+    """
+    Draw the number of authors of a paper. Most papers have a handful of
+    authors, but a fraction 'collaborations' are collaboration papers
+    with hundreds of authors, a fifth of which have over a thousand.
+    """
+    r = rnd.random()
+    if r < collaborations / 5:
+        return rnd.randint(min(1000, maxauthors), maxauthors)
+    elif r < collaborations:
+        return rnd.randint(min(50, maxauthors), min(500, maxauthors))
+    else:
+        return min(maxauthors, max(1, int(rnd.lognormvariate(1.5, 0.6))))
+
+
+def randomDate(rnd, years=(2000, 2025)):
+    """
+    Draw a publication date. Recent years have more publications than
+    earlier years, as for a growing group.
+    """
+    y0, y1 = years
+    year = min(y1, y0 + int((y1 - y0 + 1) * rnd.random() ** 0.6))
+    return date(year, rnd.randint(1, 12), rnd.randint(1, 28))
+
+
+def createDatabase(filename, narticles=5000, npresentations=1000, maxauthors=3000, seed=1, collaborations=0.05, years=(2000, 2025)):
+    """
+    Create a synthetic publications database.
+
+    :param narticles:      Number of articles.
+    :param npresentations: Number of presentations.
+    :param maxauthors:     Maximum number of authors of an article.
+    :param seed:           Seed of the random number generator.
+    :param collaborations: Fraction of articles which are collaboration
+                           papers with many authors.
+    :param years:          First and last publication year.
+    """
+    if os.path.isfile(filename):
+        os.remove(filename)
+
+    rnd = random.Random(seed)
+    db = Database(filename)
+    config.init(db)
+
+    Setting.create('name', 'M. Hoppe')
+
+    articles = []
+    for i in range(narticles):
+        articles.append(dict(
+            status=rnd.choice([1, 1, 1, 2, 3, 4]),
+            doi=f'10.1000/synthetic.{i}',
+            url=f'https://doi.org/10.1000/synthetic.{i}',
+            pinboard='',
+            title=f'Synthetic article number {i}',
+            authors=randomAuthors(randomAuthorCount(rnd, maxauthors, collaborations), rnd),
+            journal='Nuclear Fusion',
+            volume=f'{rnd.randint(1, 70)}',
+            issue=f'{rnd.randint(1, 12)}',
+            pages=f'{rnd.randint(1, 9999)}',
+            date=randomDate(rnd, years),
+            keywords=''
+        ))
+        articles[-1]['year'] = articles[-1]['date'].year
+
+    presentations = []
+    for i in range(npresentations):
+        presentations.append(dict(
+            type=rnd.choice([1, 2, 3]),
+            doi='',
+            url='',
+            pinboard='',
+            title=f'Synthetic presentation number {i}',
+            authors=randomAuthors(rnd.randint(1, 12), rnd),
+            venue='Synthetic conference',
+            presentationid='',
+            date=randomDate(rnd, years),
+            keywords=''
+        ))
+        presentations[-1]['year'] = presentations[-1]['date'].year
+
+    if articles:
+        db.exe(insert(Article), articles)
+    if presentations:
+        db.exe(insert(Presentation), presentations)
+
+    Authorship.rebuild()
+    Article.updateAuthorPositions()
+    Article.updateAuthorCounts()
+
+    return db
+
+
+def timeit(f, repeat=5):
+    """
+    Return the best wall-clock time of 'repeat' calls to 'f'.
+    """
+    best = None
+    for _ in range(repeat):
+        tic = time.perf_counter()
+        f()
+        t = time.perf_counter() - tic
+
+        if best is None or t < best:
+            best = t
+
+    return best
+
+
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+#
+# Benchmark of the export of the whole library to a bibliography file,
+# comparing the streaming exporter with loading all articles first.
+#
+
+import argparse
+import gc
+import sys
+import tempfile
+import tracemalloc
+
+from common import createDatabase, timeit
+
+from db import Article, formats, ReferenceFormat
+import Exporter
+
+
+def parse_args():
+    parser = argparse.ArgumentParser('Export benchmark')
+
+    parser.add_argument('-a', '--articles', help="Numbers of articles in the synthetic databases.", type=int, nargs='+', default=[2000, 10000, 50000])
+    parser.add_argument('-f', '--format', help="Output format.", choices=[f for f, _, _ in Exporter.FILE_TYPES], default='bibtex')
+    parser.add_argument('-r', '--repeat', help="Number of repetitions.", type=int, default=3)
+
+    return parser.parse_args()
+
+
+def legacyExport(filename, format):
+    """
+    Export by loading all articles, and formatting the whole file in
+    memory before writing it.
+    """
+    articles = Article.getall()
+
+    if format == 'text':
+        import ReferenceFormatter
+        s = '\n'.join(ReferenceFormatter.format_many(ReferenceFormat.DEFAULT, articles))
+    else:
+        keys = formats.CiteKeys()
+        fmt, header, separator, footer = formats.FORMATS[format]
+        s = header + separator.join([fmt(a, keys.key(a)) for a in articles]) + footer
+
+    with open(filename, 'w', encoding='utf-8') as f:
+        f.write(s)
+
+
+def measure(db, f):
+    """
+    Returns the best time and the peak traced memory of 'f'.
+    """
+    def run():
+        db.cache.clear()
+        db.session.expunge_all()
+        gc.collect()
+        f()
+
+    t = timeit(run, repeat=1)
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return t, peak
+
+
+def main():
+    args = parse_args()
+
+    print(f'  {"articles":>8s} {"legacy":>22s} {"streaming":>22s}')
+    with tempfile.TemporaryDirectory() as d:
+        for n in args.articles:
+            db = createDatabase(f'{d}/export{n}.db', narticles=n, npresentations=0, maxauthors=200, collaborations=0.01)
+            out = f'{d}/export.out'
+
+            tl = min([measure(db, lambda : legacyExport(out, args.format)) for _ in range(args.repeat)])
+            ts = min([measure(db, lambda : Exporter.export(out, args.format, presentations=False)) for _ in range(args.repeat)])
+
+            print(f'  {n:8d} {tl[0]*1e3:8.0f} ms {tl[1]/1024**2:7.1f} MiB {ts[0]*1e3:8.0f} ms {ts[1]/1024**2:7.1f} MiB')
+
+            db.session.close()
+            db.engine.dispose()
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
+
+
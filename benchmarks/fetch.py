@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+#
+# Benchmark of fetching publication details, against a local stand-in
+# server with synthetic fixtures and injected latency.
+#
+
+import argparse
+import sys
+import tempfile
+
+from common import createDatabase, randomAuthors, timeit
+from standin import StandInServer
+import random
+
+from db import Article, refhelp
+from db.bulkimport import BulkImport, STATUS_EXISTS
+from db.httpcache import HTTPCache
+
+
+def parse_args():
+    parser = argparse.ArgumentParser('Fetch benchmark')
+
+    parser.add_argument('-n', '--dois', help="Number of DOIs to fetch.", type=int, default=100)
+    parser.add_argument('-x', '--arxiv', help="Number of arXiv ids to fetch.", type=int, default=100)
+    parser.add_argument('-l', '--latency', help="Latency (in seconds) of each response.", type=float, default=0.05)
+    parser.add_argument('-w', '--workers', help="Numbers of concurrent requests for the bulk import.", type=int, nargs='+', default=[1, 4, 16])
+
+    return parser.parse_args()
+
+
+def createFixtures(ndois, narxiv, latency, seed=1):
+    """
+    Create synthetic fixtures for the stand-in server.
+    """
+    rnd = random.Random(seed)
+    fixtures = {'latency': latency, 'doi': {}, 'arxiv': {}}
+
+    for i in range(ndois):
+        doi = f'10.1000/fetch.{i}'
+        fixtures['doi'][doi] = {
+            'body': {
+                'DOI': doi,
+                'title': f'Synthetic article number {i}',
+                'author': [{'given': a.rsplit(' ', 1)[0], 'family': a.rsplit(' ', 1)[1]} for a in randomAuthors(rnd.randint(1, 12), rnd).split(', ')],
+                'container-title': 'Nuclear Fusion',
+                'volume': f'{rnd.randint(1, 70)}',
+                'issue': f'{rnd.randint(1, 12)}',
+                'page': f'{rnd.randint(1, 9999)}',
+                'published-print': {'date-parts': [[rnd.randint(2000, 2025), rnd.randint(1, 12), rnd.randint(1, 28)]]}
+            },
+            'redirects': 1
+        }
+
+    for i in range(narxiv):
+        aid = f'2101.{i:05d}v1'
+        authors = ''.join([f'<author><name>{a}</name></author>' for a in randomAuthors(rnd.randint(1, 12), rnd).split(', ')])
+        fixtures['arxiv'][aid] = {
+            'body': f'<entry><id>http://arxiv.org/abs/{aid}</id><published>2021-01-{rnd.randint(1, 28):02d}T00:00:00Z</published><title>Synthetic preprint number {i}</title>{authors}</entry>'
+        }
+
+    return fixtures
+
+
+def main():
+    args = parse_args()
+
+    fixtures = createFixtures(args.dois, args.arxiv, args.latency)
+    dois = list(fixtures['doi'].keys())
+    arxiv = [i[:-2] for i in fixtures['arxiv'].keys()]
+
+    # No delay between arXiv queries against the stand-in
+    refhelp.ARXIV_DELAY = 0
+
+    with tempfile.TemporaryDirectory() as d, StandInServer(fixtures) as server:
+        db = createDatabase(f'{d}/fetch.db', narticles=0, npresentations=0)
+
+        print(f'{args.dois} DOIs, {args.arxiv} arXiv ids, {args.latency*1000:.0f} ms latency')
+
+        def sequential():
+            for doi in dois:
+                Article.fromDOI(doi)
+        t = timeit(sequential, repeat=1)
+        print(f'  {"DOIs, sequential":32s} {t:8.3f} s   {len(dois)/t:8.1f} /s')
+
+        for workers in args.workers:
+            imp = BulkImport(dois, workers=workers)
+            t = timeit(imp.fetch, repeat=1)
+            print(f'  {f"DOIs, bulk import ({workers} workers)":32s} {t:8.3f} s   {len(dois)/t:8.1f} /s')
+
+        def arxivSequential():
+            for aid in arxiv:
+                Article.fromArXiv(aid)
+        t = timeit(arxivSequential, repeat=1)
+        print(f'  {"arXiv, one query per id":32s} {t:8.3f} s   {len(arxiv)/t:8.1f} /s')
+
+        t = timeit(lambda : list(Article.fromArXivMany(arxiv)), repeat=1)
+        print(f'  {"arXiv, batched queries":32s} {t:8.3f} s   {len(arxiv)/t:8.1f} /s')
+
+        refhelp.setCache(HTTPCache(f'{d}/http.db'))
+        t = timeit(sequential, repeat=1)
+        print(f'  {"DOIs, cold response cache":32s} {t:8.3f} s   {len(dois)/t:8.1f} /s')
+        t = timeit(sequential, repeat=1)
+        print(f'  {"DOIs, warm response cache":32s} {t:8.3f} s   {len(dois)/t:8.1f} /s')
+
+        # The entries of batched arXiv queries are cached by id
+        t = timeit(lambda : list(Article.fromArXivMany(arxiv)), repeat=1)
+        print(f'  {"arXiv, cold response cache":32s} {t:8.3f} s   {len(arxiv)/t:8.1f} /s')
+        n = server.nrequests
+        t = timeit(arxivSequential, repeat=1)
+        assert server.nrequests == n, f'{server.nrequests-n} requests made for cached arXiv ids'
+        print(f'  {"arXiv, warm response cache":32s} {t:8.3f} s   {len(arxiv)/t:8.1f} /s')
+        refhelp.setCache(None)
+
+        # Articles which were already imported are not fetched again
+        BulkImport(dois + arxiv).run()
+        n = server.nrequests
+        imp = BulkImport(dois + arxiv)
+        t = timeit(imp.run, repeat=1)
+        assert server.nrequests == n, f'{server.nrequests-n} requests made when importing existing articles'
+        assert imp.summary()[STATUS_EXISTS] == len(dois) + len(arxiv)
+        print(f'  {"Repeated bulk import":32s} {t:8.3f} s   {len(dois)+len(arxiv)} ids skipped')
+
+        print(f'  {server.nrequests} requests served')
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
+
+
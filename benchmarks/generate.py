@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+#
+# Generate a synthetic publications database, for benchmarking and for
+# trying out the publication manager with a large library.
+#
+
+import argparse
+import sys
+
+from common import createDatabase
+
+from db import Article, Author
+
+
+def parse_args():
+    parser = argparse.ArgumentParser('Synthetic publications database generator')
+
+    parser.add_argument('output', help="Name of the database file to create (overwritten if it exists).")
+    parser.add_argument('-a', '--articles', help="Number of articles.", type=int, default=5000)
+    parser.add_argument('-p', '--presentations', help="Number of presentations.", type=int, default=1000)
+    parser.add_argument('-m', '--max-authors', help="Maximum number of authors of an article.", type=int, default=3000)
+    parser.add_argument('-c', '--collaborations', help="Fraction of articles which are collaboration papers with hundreds to thousands of authors.", type=float, default=0.05)
+    parser.add_argument('-y', '--years', help="First and last publication year.", type=int, nargs=2, default=[2000, 2025])
+    parser.add_argument('-s', '--seed', help="Seed of the random number generator.", type=int, default=1)
+
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    createDatabase(
+        args.output, narticles=args.articles, npresentations=args.presentations,
+        maxauthors=args.max_authors, seed=args.seed,
+        collaborations=args.collaborations, years=tuple(args.years)
+    )
+
+    counts = Article.getTreeCounts()
+    nauthors = [len(a.split(', ')) for a in [r.authors for r in Article.getall(rows=True)]]
+
+    print(f'Created {args.output}')
+    print(f'  {args.articles} articles, {args.presentations} presentations, {len(Author.getCoauthors())} distinct authors')
+    print(f'  Years {min([r.year for r in counts], default="-")}-{max([r.year for r in counts], default="-")}')
+    if nauthors:
+        print(f'  Authors per article: median {sorted(nauthors)[len(nauthors)//2]}, max {max(nauthors)}, {len([n for n in nauthors if n >= 1000])} articles with 1000+ authors')
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
+
+
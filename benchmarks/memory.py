@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+#
+# Benchmark of the memory usage across repeated reloads of all articles,
+# interleaved with saves, using the default session, short-lived
+# read-only sessions and lightweight rows. Also counts the statements
+# executed when accessing the loaded articles after a save.
+#
+
+import argparse
+import gc
+import sys
+import tempfile
+import tracemalloc
+
+from common import createDatabase
+from sqlalchemy import event
+
+from db import Article, config
+
+
+def parse_args():
+    parser = argparse.ArgumentParser('Session memory benchmark')
+
+    parser.add_argument('-a', '--articles', help="Number of articles in the synthetic database.", type=int, default=5000)
+    parser.add_argument('-r', '--reloads', help="Number of reloads.", type=int, default=20)
+
+    return parser.parse_args()
+
+
+def run(db, reloads, load):
+    """
+    Reload all articles the given number of times, saving one article
+    between reloads. Returns the traced memory after each reload, and
+    the total number of statements executed when accessing the titles
+    of the loaded articles after the saves.
+    """
+    db.session.expunge_all()
+    db.cache.clear()
+    gc.collect()
+
+    usage = []
+    articles = None
+    nreloads = 0
+
+    def count(*args):
+        nonlocal nreloads
+        nreloads += 1
+
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+
+    for i in range(reloads):
+        # Replace the previously loaded articles, as a view would
+        articles = load()
+
+        Article.save(id=articles[i % len(articles)].id, keywords=f'reload {i}')
+
+        event.listen(db.engine, 'before_cursor_execute', count)
+        for a in articles:
+            a.title
+        event.remove(db.engine, 'before_cursor_execute', count)
+
+        gc.collect()
+        usage.append(tracemalloc.get_traced_memory()[0] - base)
+
+    tracemalloc.stop()
+
+    return usage, nreloads
+
+
+def main():
+    args = parse_args()
+
+    with tempfile.TemporaryDirectory() as d:
+        db = createDatabase(f'{d}/memory.db', narticles=args.articles, npresentations=0)
+        config.init(db)
+
+        def reading():
+            with db.reading():
+                return Article.getall()
+
+        loaders = [
+            ('default session', lambda : Article.getall()),
+            ('reading()', reading),
+            ('rows', lambda : Article.getall(rows=True)),
+        ]
+
+        print(f'{args.articles} articles, {args.reloads} reloads (traced memory in MiB)')
+        print(f'  {"session":18s} {"first":>8s} {"last":>8s} {"max":>8s} {"reloads":>8s}')
+
+        for name, load in loaders:
+            usage, nreloads = run(db, args.reloads, load)
+            usage = [u / 1024**2 for u in usage]
+            print(f'  {name:18s} {usage[0]:8.2f} {usage[-1]:8.2f} {max(usage):8.2f} {nreloads:8d}')
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
+
+
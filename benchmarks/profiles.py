@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+#
+# Benchmark of the database connection profiles.
+#
+
+import argparse
+import shutil
+import sys
+import tempfile
+
+from datetime import date
+from common import createDatabase, timeit
+
+from db import Article, config, Database, Presentation
+
+
+def parse_args():
+    parser = argparse.ArgumentParser('Database connection profile benchmark')
+
+    parser.add_argument('-a', '--articles', help="Number of articles in the synthetic database.", type=int, default=5000)
+    parser.add_argument('-s', '--saves', help="Number of articles to save, one commit each.", type=int, default=200)
+    parser.add_argument('-r', '--repeat', help="Number of repetitions.", type=int, default=3)
+    parser.add_argument('-d', '--directory', help="Directory in which to create the database (e.g. on a network file system).", default=None)
+
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.directory) as d:
+        template = f'{d}/template.db'
+        db = createDatabase(template, narticles=args.articles, npresentations=args.articles//5)
+        db.session.close()
+        db.engine.dispose()
+
+        print(f'{args.articles} articles, {args.saves} committed saves')
+        print(f'  {"profile":12s} {"open":>10s} {"saves":>10s} {"read":>10s}')
+
+        for profile in Database.PROFILES.keys():
+            filename = f'{d}/{profile}.db'
+
+            def open_():
+                shutil.copy(template, filename)
+                db = Database(filename, profile=profile)
+                config.init(db)
+                return db
+
+            db = open_()
+            topen = timeit(lambda : Database(filename, profile=profile), repeat=args.repeat)
+
+            def saves():
+                for i in range(args.saves):
+                    Article.save(
+                        status=Article.STATUS_SUBMITTED, doi=f'10.1000/bench.{i}', url='',
+                        pinboard='', title=f'Benchmark article {i}', authors='M. Hoppe, A. Author',
+                        journal='Nuclear Fusion', volume='', issue='', pages='',
+                        date=date(2024, 1, 1), keywords=''
+                    )
+
+            def read():
+                db.cache.clear()
+                Article.getStatistics()
+                Presentation.getStatistics()
+                Article.getTreeRows()
+                db.session.expunge_all()
+                Article.getall()
+
+            if db.readonly:
+                tsave = None
+            else:
+                tsave = timeit(saves, repeat=1)
+
+            tread = timeit(read, repeat=args.repeat)
+
+            ssave = f'{tsave*1e3:8.1f} ms' if tsave is not None else f'{"n/a":>11s}'
+            print(f'  {profile:12s} {topen*1e3:8.1f} ms {ssave} {tread*1e3:8.1f} ms')
+
+            db.session.close()
+            db.engine.dispose()
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
+
+
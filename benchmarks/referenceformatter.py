@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+#
+# Benchmark of the reference formatter.
+#
+
+import argparse
+import sys
+import tempfile
+
+from common import createDatabase, timeit
+
+from db import Article, ReferenceFormat, Setting
+import ReferenceFormatter
+import ReferenceTemplate
+
+
+def legacyFormat(s, article, maxauthors=100, abbrjournal=False, includeperiods=False):
+    """
+    The original formatter, which reads the settings and compiles the
+    reference format code for every article.
+    """
+    glbls = ReferenceFormatter.getVariables(
+        article, Setting.get('name').value, maxauthors=maxauthors,
+        abbrjournal=abbrjournal, includeperiods=includeperiods
+    )
+
+    code = "def _refform_wrapfunc():\n"
+    for line in s.split('\n'):
+        code += f'    {line}\n'
+    code += 'retval = _refform_wrapfunc()'
+
+    exec(code, glbls)
+
+    return glbls['retval']
+
+
+FORMAT = """
+if nauthors > 3:
+    a = firstauthor + ' et al'
+else:
+    a = authors
+
+return f'{a}, "{title}", {journal} {volume}, {pages} ({year})'
+"""
+
+# The same reference format, as a template
+TEMPLATE = '{if nauthors > 3}{firstauthor} et al{else}{authors}{end}, "{title}", {journal} {volume}, {pages} ({year})'
+
+
+def parse_args():
+    parser = argparse.ArgumentParser('Reference formatter benchmark')
+
+    parser.add_argument('-a', '--articles', help="Number of articles to format.", type=int, default=2000)
+    parser.add_argument('-r', '--repeat', help="Number of repetitions.", type=int, default=5)
+
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    with tempfile.TemporaryDirectory() as d:
+        createDatabase(f'{d}/bench.db', narticles=args.articles, npresentations=0, maxauthors=200)
+        articles = Article.getall()
+
+        def legacy():
+            return [legacyFormat(FORMAT, a, abbrjournal=True) for a in articles]
+
+        def single():
+            return [ReferenceFormatter.format(FORMAT, a, abbrjournal=True) for a in articles]
+
+        def many():
+            return list(ReferenceFormatter.format_many(FORMAT, articles, abbrjournal=True))
+
+        def template():
+            return list(ReferenceFormatter.format_many(TEMPLATE, articles, abbrjournal=True, kind=ReferenceFormat.KIND_TEMPLATE))
+
+        def parsed():
+            return ReferenceTemplate.compileTemplate(TEMPLATE, ReferenceFormatter.VARIABLES)
+
+        assert legacy() == many() == template()
+
+        tl = timeit(legacy, repeat=args.repeat)
+        ts = timeit(single, repeat=args.repeat)
+        tm = timeit(many, repeat=args.repeat)
+        tt = timeit(template, repeat=args.repeat)
+
+        # Compilation, bypassing the cache
+        ReferenceFormatter._compiled.clear()
+        tcc = timeit(lambda : [ReferenceFormatter.compileCode(FORMAT) for i in range(100)], repeat=args.repeat) / 100
+        tct = timeit(lambda : [parsed() for i in range(100)], repeat=args.repeat) / 100
+
+    print(f'{len(articles)} articles')
+    print(f'  legacy exec per article:      {tl*1e3:8.1f} ms')
+    print(f'  format() with compiled cache: {ts*1e3:8.1f} ms  ({tl/ts:.1f}x)')
+    print(f'  format_many():                {tm*1e3:8.1f} ms  ({tl/tm:.1f}x)')
+    print(f'  format_many() with template:  {tt*1e3:8.1f} ms  ({tl/tt:.1f}x)')
+    print(f'Compiling the format')
+    print(f'  code (exec):                  {tcc*1e6:8.1f} us')
+    print(f'  template:                     {tct*1e6:8.1f} us')
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
+
+
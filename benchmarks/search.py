@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+#
+# Benchmark of the full-text search.
+#
+
+import argparse
+import random
+import sys
+import tempfile
+
+from common import createDatabase, timeit
+
+from sqlalchemy import or_, select, text
+from db import Article
+
+
+WORDS = [
+    'runaway', 'electron', 'electrons', 'avalanche', 'tokamak', 'disruption',
+    'disruptions', 'plasma', 'plasmas', 'kinetic', 'fluid', 'model', 'modelling',
+    'synchrotron', 'radiation', 'bremsstrahlung', 'collisional', 'transport',
+    'magnetic', 'perturbation', 'mitigation', 'shattered', 'pellet',
+    'injection', 'impurity', 'deuterium', 'neon', 'argon', 'ITER', 'JET',
+    'ASDEX', 'Upgrade', 'DIII-D', 'simulation', 'simulations', 'validation',
+    'quench', 'thermal', 'current', 'beam', 'termination', 'stability',
+    'instability', 'whistler', 'waves', 'Fokker-Planck', 'equation', 'solver'
+]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser('Full-text search benchmark')
+
+    parser.add_argument('-a', '--articles', help="Number of articles in the synthetic database.", type=int, default=100000)
+    parser.add_argument('-r', '--repeat', help="Number of repetitions.", type=int, default=10)
+    parser.add_argument('-q', '--queries', help="Search strings.", nargs='+', default=['ru', 'runaway elec', 'Hopp', 'shattered pellet neon', 'synthetic.4242', 'nonexistent'])
+
+    return parser.parse_args()
+
+
+def randomizeTitles(db, rnd):
+    """
+    Give the synthetic articles varied titles and keywords (the full-text
+    index is updated by the triggers).
+    """
+    ids = db.exe(select(Article.id)).scalars().all()
+    db.exe(text('UPDATE articles SET title=:title, keywords=:keywords WHERE id=:id'), [
+        dict(
+            id=i,
+            title=' '.join(rnd.choices(WORDS, k=rnd.randint(4, 10))).capitalize(),
+            keywords=', '.join(rnd.choices(WORDS, k=rnd.randint(0, 4)))
+        ) for i in ids
+    ], commit=True)
+
+
+def likeSearch(db, s):
+    """
+    Search by scanning the articles with LIKE, for comparison.
+    """
+    stmt = select(Article.id)
+    for w in s.split():
+        stmt = stmt.where(or_(
+            Article.title.like(f'%{w}%'), Article.authors.like(f'%{w}%'),
+            Article.journal.like(f'%{w}%'), Article.keywords.like(f'%{w}%'),
+            Article.doi.like(f'%{w}%')
+        ))
+
+    return db.exe(stmt).scalars().all()
+
+
+def main():
+    args = parse_args()
+
+    with tempfile.TemporaryDirectory() as d:
+        db = createDatabase(f'{d}/search.db', narticles=args.articles, npresentations=0, maxauthors=200, collaborations=0.01)
+        randomizeTitles(db, random.Random(1))
+
+        def run(f):
+            def g():
+                db.cache.clear()
+                return f()
+            return timeit(g, repeat=args.repeat)
+
+        print(f'{args.articles} articles')
+        print(f'  {"query":24s} {"matches":>8s} {"ranked (top 50)":>16s} {"tree counts":>12s} {"LIKE scan":>12s}')
+        for q in args.queries:
+            n = sum([r.npublications for r in Article.getTreeCounts(search=q)])
+
+            tr = run(lambda : Article.search(q, limit=50))
+            tc = run(lambda : Article.getTreeCounts(search=q))
+            tl = run(lambda : likeSearch(db, q))
+
+            print(f'  {q:24s} {n:8d} {tr*1e3:13.2f} ms {tc*1e3:9.2f} ms {tl*1e3:9.2f} ms')
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
+
+
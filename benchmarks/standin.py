@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+#
+# Local stand-in server for doi.org (Crossref) and the arXiv API, which
+# replays recorded responses so that the fetching code paths can be run
+# and benchmarked without internet access.
+#
+# Fixture format (JSON):
+#
+#   {
+#     "latency": 0.05,
+#     "doi": {
+#       "10.1103/physrevlett.1": {"body": {...CSL-JSON...}},
+#       "10.1103/slow": {"body": {...}, "latency": 2.0},
+#       "10.1103/moved": {"body": {...}, "redirects": 2},
+#       "10.1103/missing": {"status": 404}
+#     },
+#     "arxiv": {
+#       "2101.00001v2": {"body": "<entry>...</entry>"}
+#     }
+#   }
+#
+# 'latency' is the delay (in seconds) before each response, and can be
+# overridden per record. DOIs are resolved at '<url>/doi/<doi>', through
+# 'redirects' intermediate redirects (as doi.org redirects to Crossref).
+# The arXiv API is served at '<url>/arxiv/api/query', and assembles an
+# Atom feed from the recorded entries of the requested ids (unversioned
+# ids map to the latest recorded version). Successful responses carry an
+# ETag, and conditional requests are answered with '304 Not Modified'.
+#
+# With '--record', requests are forwarded to the real servers instead,
+# and the responses are added to the fixture file.
+#
+
+import argparse
+import hashlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+from pathlib import Path
+import re
+import sys
+import threading
+import time
+from urllib.parse import parse_qs, quote, unquote, urlparse
+
+import requests
+
+# Adds the repository root to the module path
+import common
+from db import refhelp
+
+
+ATOM_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n<feed xmlns="http://www.w3.org/2005/Atom" xmlns:arxiv="http://arxiv.org/schemas/atom">\n'
+ATOM_FOOTER = '</feed>\n'
+
+
+def parse_args():
+    parser = argparse.ArgumentParser('Stand-in server for doi.org and arXiv')
+
+    parser.add_argument('fixtures', help="Fixture file with the recorded responses.")
+    parser.add_argument('-p', '--port', help="Port to listen on.", type=int, default=8642)
+    parser.add_argument('-l', '--latency', help="Override the latency (in seconds) of all responses.", type=float, default=None)
+    parser.add_argument('-r', '--record', help="Forward requests to the real servers and record the responses.", action='store_true')
+
+    return parser.parse_args()
+
+
+class StandInServer:
+
+
+    def __init__(self, fixtures=None, port=0, latency=None, record=False):
+        """
+        Constructor.
+
+        :param fixtures: Fixture dictionary, or name of a fixture file.
+        :param port:     Port to listen on (0 selects a free port).
+        :param latency:  If given, overrides the latency of all responses.
+        :param record:   If True, forward requests to the real servers
+                         and record the responses in the fixtures.
+        """
+        self.filename = None
+        if fixtures is None:
+            fixtures = {}
+        elif not isinstance(fixtures, dict):
+            self.filename = fixtures
+            if Path(fixtures).exists():
+                with open(fixtures, 'r') as f:
+                    fixtures = json.load(f)
+            else:
+                fixtures = {}
+
+        self.fixtures = fixtures
+        self.fixtures.setdefault('latency', 0)
+        self.fixtures.setdefault('doi', {})
+        self.fixtures.setdefault('arxiv', {})
+        self.fixtures['doi'] = {k.lower(): v for k, v in self.fixtures['doi'].items()}
+
+        self.latency = latency
+        self.record = record
+        self.lock = threading.Lock()
+        self.nrequests = 0
+
+        handler = type('Handler', (StandInHandler,), {'standin': self})
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', port), handler)
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+
+    @property
+    def url(self):
+        """
+        Base URL of the server.
+        """
+        return f'http://127.0.0.1:{self.httpd.server_port}'
+
+
+    def start(self):
+        """
+        Start serving in a background thread.
+        """
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+
+    def stop(self):
+        """
+        Stop the server.
+        """
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+    def apply(self):
+        """
+        Point 'refhelp' at this server.
+        """
+        refhelp.setBaseURLs(doi=f'{self.url}/doi', arxiv=f'{self.url}/arxiv/api/query')
+
+
+    def __enter__(self):
+        self.start()
+        self.apply()
+        return self
+
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+    def save(self):
+        """
+        Save the fixtures to the fixture file.
+        """
+        if self.filename is not None:
+            with self.lock:
+                with open(self.filename, 'w') as f:
+                    json.dump(self.fixtures, f, indent=2, sort_keys=True)
+
+
+    def delay(self, record=None):
+        """
+        Wait for the latency of the given record.
+        """
+        if self.latency is not None:
+            latency = self.latency
+        elif record is not None and 'latency' in record:
+            latency = record['latency']
+        else:
+            latency = self.fixtures['latency']
+
+        if latency > 0:
+            time.sleep(latency)
+
+
+    def recordDOI(self, doi):
+        """
+        Fetch a DOI from doi.org and add it to the fixtures.
+        """
+        r = requests.get(
+            f'https://doi.org/{doi}',
+            headers={'Accept': 'application/vnd.citationstyles.csl+json'},
+            timeout=refhelp.TIMEOUT
+        )
+
+        if r.status_code == 200:
+            rec = {'body': r.json(), 'redirects': len(r.history)}
+        else:
+            rec = {'status': r.status_code}
+
+        with self.lock:
+            self.fixtures['doi'][doi.lower()] = rec
+        self.save()
+
+        return rec
+
+
+    def recordArXiv(self, ids):
+        """
+        Query the given ids from the arXiv API and add the returned
+        entries to the fixtures.
+        """
+        r = requests.get(
+            'https://export.arxiv.org/api/query',
+            params={'id_list': ','.join(ids), 'max_results': len(ids)},
+            timeout=refhelp.TIMEOUT
+        )
+
+        for entry in re.findall(r'<entry>.*?</entry>', r.text, re.DOTALL):
+            m = re.search(r'<id>https?://arxiv\.org/abs/(.+?)</id>', entry)
+            if m:
+                with self.lock:
+                    self.fixtures['arxiv'][m.group(1)] = {'body': entry}
+
+        self.save()
+
+
+    def findArXiv(self, arxiv_id):
+        """
+        Returns the recorded entry for the given arXiv id, or None.
+        """
+        entries = self.fixtures['arxiv']
+        if arxiv_id in entries:
+            return entries[arxiv_id]
+
+        # Latest recorded version of an unversioned id
+        versions = [(int(k[len(arxiv_id)+1:]), v) for k, v in entries.items() if re.fullmatch(re.escape(arxiv_id)+r'v[0-9]+', k)]
+        if versions:
+            return max(versions, key=lambda x : x[0])[1]
+
+        return None
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+
+
+    # Set on the subclass created for each server
+    standin = None
+
+
+    def log_message(self, format, *args):
+        pass
+
+
+    def respond(self, status, body=None, contenttype='text/plain', headers=None):
+        """
+        Send a response, honouring conditional requests.
+        """
+        if body is not None:
+            data = body.encode('utf-8')
+            etag = '"' + hashlib.sha1(data).hexdigest() + '"'
+
+            if status == 200 and self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.end_headers()
+                return
+        else:
+            data = b''
+            etag = None
+
+        self.send_response(status)
+        self.send_header('Content-Type', contenttype)
+        self.send_header('Content-Length', str(len(data)))
+        if etag is not None and status == 200:
+            self.send_header('ETag', etag)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+    def do_GET(self):
+        standin = self.standin
+        with standin.lock:
+            standin.nrequests += 1
+
+        url = urlparse(self.path)
+
+        m = re.match(r'/doi/(?:redirect/([0-9]+)/)?(.+)$', url.path)
+        if m:
+            return self.doi(unquote(m.group(2)), int(m.group(1) or 0))
+
+        if url.path == '/arxiv/api/query':
+            return self.arxiv(parse_qs(url.query))
+
+        standin.delay()
+        self.respond(404, 'Not found')
+
+
+    def doi(self, doi, hop):
+        """
+        Resolve a DOI.
+        """
+        standin = self.standin
+        rec = standin.fixtures['doi'].get(doi.lower())
+
+        if rec is None and standin.record:
+            rec = standin.recordDOI(doi)
+
+        standin.delay(rec)
+
+        if rec is None:
+            return self.respond(404, f'DOI not found: {doi}')
+
+        if hop < rec.get('redirects', 0):
+            return self.respond(302, headers={'Location': f'/doi/redirect/{hop+1}/{quote(doi)}'})
+
+        if 'body' in rec:
+            self.respond(rec.get('status', 200), json.dumps(rec['body']), 'application/vnd.citationstyles.csl+json')
+        else:
+            self.respond(rec.get('status', 500), 'Error')
+
+
+    def arxiv(self, query):
+        """
+        Answer an arXiv API query.
+        """
+        standin = self.standin
+        ids = [i for i in ','.join(query.get('id_list', [''])).split(',') if i]
+
+        if standin.record:
+            missing = [i for i in ids if standin.findArXiv(i) is None]
+            if missing:
+                standin.recordArXiv(missing)
+
+        records = [standin.findArXiv(i) for i in ids]
+        latencies = [r['latency'] for r in records if r is not None and 'latency' in r]
+        standin.delay({'latency': max(latencies)} if latencies else None)
+
+        for r in records:
+            if r is not None and r.get('status', 200) != 200:
+                return self.respond(r['status'], 'Error')
+
+        body = ATOM_HEADER + ''.join([r['body'] + '\n' for r in records if r is not None]) + ATOM_FOOTER
+        self.respond(200, body, 'application/atom+xml')
+
+
+def main():
+    args = parse_args()
+
+    server = StandInServer(args.fixtures, port=args.port, latency=args.latency, record=args.record)
+    print(f"Serving {len(server.fixtures['doi'])} DOIs and {len(server.fixtures['arxiv'])} arXiv entries at {server.url}")
+    print(f"  PUBLICATIONMANAGER_DOI_URL={server.url}/doi")
+    print(f"  PUBLICATIONMANAGER_ARXIV_URL={server.url}/arxiv/api/query")
+
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+    server.httpd.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
+
+
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+#
+# Benchmark of the startup time of the command-line tools and the main
+# window. Each program is started in a fresh interpreter, and the
+# libraries it imports are reported alongside the wall-clock time.
+#
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+from common import ROOT, createDatabase, timeit
+
+
+# Libraries which take a while to import, and should only be imported
+# when needed
+HEAVY = ['PyQt5.QtGui', 'sqlalchemy', 'feedparser', 'requests']
+
+
+# Programs to start. 'getref.py' only parses its arguments, and the main
+# window quits as soon as its event loop has started.
+PROGRAMS = {
+    'import db': """
+import db
+""",
+    'getref': """
+import runpy
+sys.argv = ['getref.py', '--help']
+try:
+    runpy.run_path('getref.py', run_name='__main__')
+except SystemExit:
+    pass
+""",
+    'mainwindow': """
+from PyQt5 import QtCore, QtWidgets
+app = QtWidgets.QApplication(sys.argv[:1])
+sys.argv = ['MainWindow.py', DATABASE]
+import MainWindow
+window = MainWindow.MainWindow()
+window.show()
+QtCore.QTimer.singleShot(0, app.quit)
+app.exec_()
+""",
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser('Startup time benchmark')
+
+    parser.add_argument('-a', '--articles', help="Number of articles in the synthetic database opened by the main window.", type=int, default=5000)
+    parser.add_argument('-r', '--repeat', help="Number of repetitions.", type=int, default=5)
+
+    return parser.parse_args()
+
+
+def run(code, database):
+    """
+    Run the given code in a new interpreter, and return the list of the
+    heavy libraries it imported.
+    """
+    script = (
+        f'import sys\nDATABASE = {database!r}\n' + code +
+        f'\nprint(",".join([m for m in {HEAVY!r} if m in sys.modules]))\n'
+    )
+
+    env = dict(os.environ)
+    env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+    p = subprocess.run([sys.executable, '-c', script], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    lines = p.stdout.strip().splitlines()
+    return lines[-1].split(',') if lines and lines[-1] else []
+
+
+def main():
+    args = parse_args()
+
+    with tempfile.TemporaryDirectory() as d:
+        database = f'{d}/startup.db'
+        db = createDatabase(database, narticles=args.articles, npresentations=args.articles//5)
+        db.session.close()
+        db.engine.dispose()
+
+        print(f'  {"program":12s} {"time":>10s}   imports')
+        for name, code in PROGRAMS.items():
+            imported = run(code, database)
+            t = timeit(lambda : run(code, database), repeat=args.repeat)
+
+            print(f'  {name:12s} {t*1e3:7.0f} ms   {", ".join(imported) or "-"}')
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
+
+
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+#
+# Benchmark suite for the data layer and the formatting hot paths.
+#
+# Every benchmark is run on a synthetic database (see 'generate.py'), and
+# its best wall-clock time and peak (Python) memory usage are reported.
+# The results are compared with a baseline recorded on the same machine,
+# and the suite fails if any benchmark is slower or uses more memory than
+# the baseline by more than the given tolerance. Baselines are
+# machine-specific, and so are not part of the repository: the first run
+# records the baseline, and '--save-baseline' records a new one (e.g.
+# before making changes).
+#
+
+import argparse
+import gc
+import json
+import os
+from pathlib import Path
+import sys
+import tempfile
+import time
+import tracemalloc
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from common import createDatabase
+
+from PyQt5 import QtWidgets
+from db import Article, Presentation
+from DialogTopCoauthors import DialogTopCoauthors
+from PublicationTreeModel import PublicationTreeModel
+import getref
+import ReferenceFormatter
+
+
+BASELINE = Path(__file__).parent / 'baseline.json'
+
+# Differences below these are considered noise, regardless of the
+# relative tolerances
+MIN_TIME = 2e-3
+MIN_MEMORY = 64*1024
+
+FORMAT = """
+if nauthors > 3:
+    a = firstauthor + ' et al'
+else:
+    a = authors
+
+return f'{a}, "{title}", {journal} {volume}, {pages} ({year})'
+"""
+
+
+def parse_args():
+    parser = argparse.ArgumentParser('Data layer benchmark suite')
+
+    parser.add_argument('-a', '--articles', help="Number of articles in the synthetic database.", type=int, default=5000)
+    parser.add_argument('-p', '--presentations', help="Number of presentations in the synthetic database.", type=int, default=1000)
+    parser.add_argument('-r', '--repeat', help="Number of repetitions.", type=int, default=5)
+    parser.add_argument('-k', '--benchmarks', help="Names of the benchmarks to run (default: all).", nargs='+', default=None)
+    parser.add_argument('-b', '--baseline', help="Baseline file.", default=str(BASELINE))
+    parser.add_argument('-s', '--save-baseline', help="Save the results as the new baseline.", action='store_true')
+    parser.add_argument('-t', '--tolerance', help="Allowed relative increase in time over the baseline.", type=float, default=0.25)
+    parser.add_argument('-m', '--memory-tolerance', help="Allowed relative increase in peak memory over the baseline.", type=float, default=0.10)
+
+    return parser.parse_args()
+
+
+def treeview():
+    """
+    Load the publication tree, and expand all years.
+    """
+    model = PublicationTreeModel()
+    model.reload()
+    for c in range(model.rowCount()):
+        cidx = model.index(c, 0)
+        for y in range(model.rowCount(cidx)):
+            model.fetchMore(model.index(y, 0, cidx))
+
+
+def statistics():
+    """
+    Compute the statistics shown in the main window.
+    """
+    Article.getStatistics()
+    Presentation.getStatistics()
+
+
+def coauthors():
+    """
+    Open the top co-authors dialog.
+    """
+    DialogTopCoauthors().deleteLater()
+
+
+def getmany(ids):
+    """
+    Load all articles by ID, as the export dialog does.
+    """
+    return lambda : Article.getMany(ids)
+
+
+def formatReferences(articles):
+    """
+    Format all articles with a reference format.
+    """
+    return lambda : list(ReferenceFormatter.format_many(FORMAT, articles))
+
+
+def formatBibTeX(articles):
+    """
+    Format all articles as BibTeX.
+    """
+    return lambda : [getref.formatBibTeX(a) for a in articles]
+
+
+def measure(db, f, repeat):
+    """
+    Measure the best time and the peak memory usage of 'f', starting each
+    run with empty query caches.
+    """
+    t = None
+    for _ in range(repeat):
+        db.cache.clear()
+        db.session.expunge_all()
+        gc.collect()
+
+        # As 'timeit', garbage collection is disabled while timing
+        gc.disable()
+        tic = time.perf_counter()
+        f()
+        toc = time.perf_counter()
+        gc.enable()
+
+        if t is None or toc-tic < t:
+            t = toc-tic
+
+    db.cache.clear()
+    db.session.expunge_all()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    f()
+    peak = tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+
+    return {'time': t, 'memory': peak}
+
+
+def compare(results, baseline, tolerance, memtolerance):
+    """
+    Compare the results with the baseline. Returns the list of
+    regressions.
+    """
+    regressions = []
+    for name, r in results.items():
+        if name not in baseline:
+            continue
+
+        b = baseline[name]
+        if r['time'] > b['time'] * (1 + tolerance) and r['time'] - b['time'] > MIN_TIME:
+            regressions.append(f"{name}: time {r['time']*1e3:.1f} ms > baseline {b['time']*1e3:.1f} ms (+{(r['time']/b['time']-1)*100:.0f}%)")
+        if r['memory'] > b['memory'] * (1 + memtolerance) and r['memory'] - b['memory'] > MIN_MEMORY:
+            regressions.append(f"{name}: memory {r['memory']/1024**2:.2f} MiB > baseline {b['memory']/1024**2:.2f} MiB (+{(r['memory']/b['memory']-1)*100:.0f}%)")
+
+    return regressions
+
+
+def main():
+    args = parse_args()
+    app = QtWidgets.QApplication(sys.argv)
+
+    parameters = {'articles': args.articles, 'presentations': args.presentations}
+
+    with tempfile.TemporaryDirectory() as d:
+        db = createDatabase(f'{d}/suite.db', narticles=args.articles, npresentations=args.presentations)
+
+        with db.reading():
+            articles = Article.getall()
+        ids = [a.id for a in articles]
+
+        benchmarks = {
+            'treeview': treeview,
+            'statistics': statistics,
+            'coauthors': coauthors,
+            'getmany': getmany(ids),
+            'format': formatReferences(articles),
+            'bibtex': formatBibTeX(articles),
+        }
+
+        names = args.benchmarks if args.benchmarks is not None else list(benchmarks.keys())
+        for name in names:
+            if name not in benchmarks:
+                print(f"Unrecognized benchmark: '{name}'. Available benchmarks: {', '.join(benchmarks.keys())}.")
+                return 2
+
+        print(f'{args.articles} articles, {args.presentations} presentations')
+        print(f'  {"benchmark":12s} {"time":>12s} {"memory":>12s}')
+
+        results = {}
+        for name in names:
+            results[name] = measure(db, benchmarks[name], args.repeat)
+            print(f'  {name:12s} {results[name]["time"]*1e3:9.1f} ms {results[name]["memory"]/1024**2:8.2f} MiB')
+
+    if args.save_baseline or not os.path.exists(args.baseline):
+        with open(args.baseline, 'w') as f:
+            json.dump({'parameters': parameters, 'results': results}, f, indent=2)
+
+        print(f'Saved baseline to {args.baseline}.')
+        return 0
+
+    with open(args.baseline, 'r') as f:
+        baseline = json.load(f)
+
+    if baseline['parameters'] != parameters:
+        print(f"The baseline was recorded with different parameters ({baseline['parameters']}).")
+        return 2
+
+    regressions = compare(results, baseline['results'], args.tolerance, args.memory_tolerance)
+    if regressions:
+        print('REGRESSIONS:')
+        for r in regressions:
+            print(f'  {r}')
+        return 1
+    else:
+        print('No regressions.')
+        return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
+
+
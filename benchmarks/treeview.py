@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+#
+# Benchmark of the loading of the publication tree view.
+#
+
+import argparse
+import os
+import sys
+import tempfile
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from common import createDatabase, timeit
+
+from PyQt5 import QtGui, QtWidgets
+from PyQt5.QtCore import Qt
+from db import Article, Presentation, Setting
+from PublicationTreeModel import PublicationTreeModel
+
+
+def legacyLoadPublications(treeViewModel):
+    """
+    The original tree loader: one query per category, fully hydrated
+    Article objects and per-row name formatting.
+    """
+    ICONS = PublicationTreeModel.getIcons()
+    def addItem(parent, name, icon, data=None):
+        itm = QtGui.QStandardItem(name)
+        itm.setIcon(ICONS[icon])
+        if data:
+            itm.setData(data)
+        parent.appendRow(itm)
+        return itm
+
+    published = Article.getPublished()
+    npublishd = Article.getNotPublished()
+    npeerrvwd = Article.getNonPeerReviewed()
+
+    root = treeViewModel.invisibleRootItem()
+    authorname = Setting.get('name').value
+
+    nfirst = 0
+    for cat, articles, icon in [
+        ('In preparation', npublishd, 'article-red'),
+        ('Published', published, 'article-green'),
+        ('Non-peer reviewed', npeerrvwd, 'article-green')
+    ]:
+        c = addItem(root, f'{cat} ({len(articles)})', 'category')
+        years = []
+        yr = None
+        for p in articles:
+            if p.date.year not in years:
+                yr = addItem(c, f'{p.date.year}', 'year')
+                years.append(p.date.year)
+
+            if p.isFirstAuthor(authorname):
+                nfirst += 1
+
+            addItem(yr, p.getName(), icon, p.id)
+
+    return nfirst
+
+
+def parse_args():
+    parser = argparse.ArgumentParser('Publication tree view benchmark')
+
+    parser.add_argument('-a', '--articles', help="Number of articles in the synthetic database.", type=int, default=5000)
+    parser.add_argument('-p', '--presentations', help="Number of presentations in the synthetic database.", type=int, default=1000)
+    parser.add_argument('-r', '--repeat', help="Number of repetitions.", type=int, default=5)
+
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    app = QtWidgets.QApplication(sys.argv)
+
+    with tempfile.TemporaryDirectory() as d:
+        db = createDatabase(f'{d}/bench.db', narticles=args.articles, npresentations=args.presentations)
+
+        def legacy():
+            db.cache.clear()
+            legacyLoadPublications(QtGui.QStandardItemModel())
+            db.session.expunge_all()
+
+        def lazy():
+            # Measure the queries, not the query cache
+            db.cache.clear()
+            model = PublicationTreeModel()
+            model.reload()
+            Article.getStatistics()
+            Presentation.getStatistics()
+            return model
+
+        def expanded():
+            model = lazy()
+            for c in range(model.rowCount()):
+                cidx = model.index(c, 0)
+                for y in range(model.rowCount(cidx)):
+                    model.fetchMore(model.index(y, 0, cidx))
+
+        def checked():
+            # Checking a category loads all of its year nodes at once
+            model = PublicationTreeModel(checkable=True)
+            db.cache.clear()
+            model.reload()
+            for c in range(model.rowCount()):
+                model.setData(model.index(c, 0), Qt.Checked, Qt.CheckStateRole)
+
+        tl = timeit(legacy, repeat=args.repeat)
+        tm = timeit(lazy, repeat=args.repeat)
+        te = timeit(expanded, repeat=args.repeat)
+        tc = timeit(checked, repeat=args.repeat)
+
+        # The IDs of the articles returned by the ORM finders are cached,
+        # and the articles still loaded in the session are reused
+        db.cache.clear()
+        published = Article.getPublished()
+        hits = db.cache.hits
+        db.profiler.enable()
+        with db.profiler.action('Cached finder'):
+            assert Article.getPublished() == published
+        assert db.cache.hits == hits + 1, 'Article.getPublished() was not taken from the query cache'
+        assert db.profiler.actions[-1]['nstatements'] == 0, 'Cached articles were loaded from the database again'
+        db.profiler.disable()
+
+    print(f'{args.articles} articles, {args.presentations} presentations')
+    print(f'  legacy loader (articles only):          {tl*1e3:8.1f} ms')
+    print(f'  lazy model, collapsed:                  {tm*1e3:8.1f} ms  ({tl/tm:.1f}x)')
+    print(f'  lazy model, fully expanded:             {te*1e3:8.1f} ms  ({tl/te:.1f}x)')
+    print(f'  lazy model, all categories checked:     {tc*1e3:8.1f} ms  ({tl/tc:.1f}x)')
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
+
+
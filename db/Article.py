@@ -1,17 +1,15 @@
 
-import re
-
-from datetime import datetime
-from sqlalchemy import Column, Date, Integer, String, or_
+from sqlalchemy import Column, Date, Index, Integer, String, bindparam, func, inspect, or_
+from sqlalchemy.orm.util import identity_key
 from . base import Base
+from . Authorship import Authorship
 from . Setting import Setting
 
-from PyQt5 import QtGui
-from pathlib import Path
-
 from sqlalchemy.sql.expression import insert, select, update
 from . import config
+from . cache import cached
 
+from . import fulltext
 from . import refhelp
 
 
@@ -19,6 +17,9 @@ class Article(Base):
     
 
     __tablename__ = 'articles'
+    __table_args__ = (
+        Index('ix_articles_status_year', 'status', 'year'),
+    )
 
 
     STATUS_PUBLISHED = 1
@@ -27,12 +28,33 @@ class Article(Base):
     STATUS_NON_REVIEWED = 4
 
 
+    # Maximum number of IDs to pass in a single 'IN' query
+    MAX_IN_IDS = 500
+
+
+    # Position of the user in the author list. Other positions are
+    # stored as the 1-based index into the author list.
+    POSITION_FIRST = 1
+    POSITION_SECOND = 2
+    POSITION_LAST = -1
+
+
+    # Tree view category of each status, in display order
+    CATEGORIES = ['npublished', 'published', 'npeerreviewed']
+    STATUS_CATEGORY = {
+        STATUS_ACCEPTED: 'npublished',
+        STATUS_SUBMITTED: 'npublished',
+        STATUS_PUBLISHED: 'published',
+        STATUS_NON_REVIEWED: 'npeerreviewed'
+    }
+
+
     # Article ID
     id = Column(Integer, primary_key=True)
     # Status
-    status = Column(Integer)
+    status = Column(Integer, index=True)
     # DOI
-    doi = Column(String)
+    doi = Column(String, index=True)
     # URL to article
     url = Column(String)
     # EUROfusion pinboard ID
@@ -41,6 +63,8 @@ class Article(Base):
     title = Column(String)
     # Authors
     authors = Column(String)
+    # Number of authors in the author list
+    nauthors = Column(Integer)
     # Journal
     journal = Column(String)
     # Volume
@@ -50,19 +74,99 @@ class Article(Base):
     # Pages
     pages = Column(String)
     # Date of publication
-    date = Column(Date)
+    date = Column(Date, index=True)
+    # Year of publication (same as 'date.year')
+    year = Column(Integer)
     # Keywords
     keywords = Column(String)
+    # Position of the user in the author list (None if not an author)
+    authorpos = Column(Integer, index=True)
 
 
     def isFirstAuthor(self, authorname):
         """
         Returns true if the user is first author of this article.
         """
-        authors = self.authors.split(', ')
-        a = authors[0].split(' ')
+        return Article.isAuthorName(self.getFirstAuthor(), authorname)
+
+
+    @staticmethod
+    def getAuthorName():
+        """
+        Returns the name of the user, as given in the settings.
+        """
+        s = Setting.get('name')
+        return s.value if s is not None else ''
+
+
+    @staticmethod
+    def getAuthorPosition(authors, authorname):
+        """
+        Returns the position of the author with the given name in the
+        given author list. The first author is at position POSITION_FIRST,
+        and the last author (of several) at POSITION_LAST. If the author
+        is not in the list, None is returned.
+        """
+        if not authors or not authorname:
+            return None
+
+        authors = authors.split(', ')
+        for i in range(len(authors)):
+            if authors[i].strip() and Article.isAuthorName(authors[i], authorname):
+                if i > 0 and i == len(authors)-1:
+                    return Article.POSITION_LAST
+                else:
+                    return i+1
+
+        return None
+
+
+    @staticmethod
+    def updateAuthorPositions():
+        """
+        Recompute the position of the user in the author list of all
+        articles. This should be done whenever the name of the user is
+        changed.
+        """
+        db = config.database()
+        authorname = Article.getAuthorName()
+
+        rows = db.exe(select(Article.id, Article.authors)).all()
+        values = [{'aid': id, 'authorpos': Article.getAuthorPosition(authors, authorname)} for id, authors in rows]
+
+        if values:
+            table = Article.__table__
+            db.exe(update(table).where(table.c.id==bindparam('aid')).values(authorpos=bindparam('authorpos')), values)
+
+        db.flush()
+
+
+    @staticmethod
+    def updateAuthorCounts():
+        """
+        Recompute the number of authors of all articles from the
+        authorship records.
+        """
+        db = config.database()
+
+        table = Article.__table__
+        nauthors = (
+            select(func.count(Authorship.position))
+            .where(Authorship.article_id==table.c.id)
+            .scalar_subquery()
+        )
+        db.exe(update(table).values(nauthors=nauthors))
 
-        for w in a:
+        db.flush()
+
+
+    @staticmethod
+    def isAuthorName(author, authorname):
+        """
+        Returns true if the given entry of an author list refers to
+        the author with the given name.
+        """
+        for w in author.split(' '):
             if w.strip().strip('.') not in authorname:
                 return False
 
@@ -94,331 +198,366 @@ class Article(Base):
         """
         Check if the article with the given DOI exists in the database.
         """
-        a = Article.getByDOI(doi)
+        a = Article.getByDOI(doi, rows=True)
         return (a is not None)
 
 
     @staticmethod
-    def get(id):
+    def existsArXiv(arxiv_id):
+        """
+        Check if an article with the given arXiv id exists in the database,
+        in any version.
+        """
+        return len(Article.getByArXiv(arxiv_id, rows=True)) > 0
+
+
+    @staticmethod
+    def _select(rows=False):
+        """
+        Returns a statement selecting articles. If 'rows' is True, the
+        columns are selected as lightweight, read-only rows which are not
+        attached to any session, rather than as ORM objects.
+        """
+        if rows:
+            return select(*Article.__table__.columns)
+        else:
+            return select(Article)
+
+
+    @staticmethod
+    def _execute(stmt, rows=False):
+        """
+        Execute a statement created with '_select()'.
+        """
+        db = config.database()
+        r = db.exe(stmt)
+
+        if rows:
+            return r
+        else:
+            return r.scalars()
+
+
+    @staticmethod
+    @cached('articles')
+    def get(id, rows=False):
         """
         Returns the article with the given ID.
         """
+        return Article._execute(Article._select(rows).where(Article.id==id).order_by(Article.date.desc()), rows).one_or_none()
+
+
+    @staticmethod
+    def getMany(ids, rows=False):
+        """
+        Returns the articles with the given IDs, in the given order.
+        Articles which are already loaded in the session are taken from
+        the session, and the remaining ones are fetched in chunks of at
+        most MAX_IN_IDS. If 'rows' is True, lightweight rows are returned
+        instead (see '_select()').
+        """
         db = config.database()
-        return db.exe(select(Article).where(Article.id==id).order_by(Article.date.desc())).scalars().one_or_none()
+
+        articles = {}
+        missing = []
+        for i in ids:
+            a = None if rows else db.session.identity_map.get(identity_key(Article, i))
+            if a is not None and not inspect(a).expired:
+                articles[i] = a
+            else:
+                missing.append(i)
+
+        for c in range(0, len(missing), Article.MAX_IN_IDS):
+            chunk = missing[c:c+Article.MAX_IN_IDS]
+            for a in Article._execute(Article._select(rows).where(Article.id.in_(chunk)), rows):
+                articles[a.id] = a
+
+        return [articles[i] for i in ids if i in articles]
 
 
     @staticmethod
-    def getPublished():
+    @cached('articles')
+    def getPublished(rows=False):
         """
         Get all articles with status 'Published'.
         """
-        db = config.database()
-        return db.exe(select(Article).where(Article.status==Article.STATUS_PUBLISHED).order_by(Article.date.desc())).scalars().all()
+        return Article._execute(Article._select(rows).where(Article.status==Article.STATUS_PUBLISHED).order_by(Article.date.desc()), rows).all()
 
 
     @staticmethod
-    def getAccepted():
+    @cached('articles')
+    def getAccepted(rows=False):
         """
         Get all articles with status 'Accepted'.
         """
-        db = config.database()
-        return db.exe(select(Article).where(Article.status==Article.STATUS_ACCEPTED).order_by(Article.date.desc())).scalars().all()
+        return Article._execute(Article._select(rows).where(Article.status==Article.STATUS_ACCEPTED).order_by(Article.date.desc()), rows).all()
 
 
     @staticmethod
-    def getSubmitted():
+    @cached('articles')
+    def getSubmitted(rows=False):
         """
         Get all articles with status 'Submitted'.
         """
-        db = config.database()
-        return db.exe(select(Article).where(Article.status==Article.STATUS_SUBMITTED)).scalars().all()
+        return Article._execute(Article._select(rows).where(Article.status==Article.STATUS_SUBMITTED), rows).all()
 
 
     @staticmethod
-    def getNotPublished():
+    @cached('articles')
+    def getNotPublished(rows=False):
         """
         Get all articles with status which is not 'Published'.
         """
-        db = config.database()
-        return db.exe(select(Article).where(or_(Article.status==Article.STATUS_SUBMITTED, Article.status==Article.STATUS_ACCEPTED)).order_by(Article.date.desc())).scalars().all()
+        return Article._execute(Article._select(rows).where(or_(Article.status==Article.STATUS_SUBMITTED, Article.status==Article.STATUS_ACCEPTED)).order_by(Article.date.desc()), rows).all()
 
 
     @staticmethod
-    def getNonPeerReviewed():
+    @cached('articles')
+    def getNonPeerReviewed(rows=False):
         """
         Get all non-peer reviewed articles.
         """
-        db = config.database()
-        return db.exe(select(Article).where(Article.status==Article.STATUS_NON_REVIEWED).order_by(Article.date.desc())).scalars().all()
+        return Article._execute(Article._select(rows).where(Article.status==Article.STATUS_NON_REVIEWED).order_by(Article.date.desc()), rows).all()
 
 
     @staticmethod
-    def getByDOI(doi):
+    def firstAuthorColumn():
         """
-        Return an article based on its DOI.
+        Returns an SQL expression for the first entry of the author list.
         """
-        db = config.database()
-        return db.exe(select(Article).where(Article.doi==doi)).scalars().one_or_none()
+        return func.substr(
+            Article.authors, 1,
+            func.instr(Article.authors.concat(', '), ', ')-1
+        ).label('firstauthor')
 
 
     @staticmethod
-    def getall():
+    @cached('articles')
+    def getTreeCounts(search=None):
         """
-        Returns a list of all publications.
+        Returns the number of articles with each status, per year. If
+        given, only articles matching the search string are counted.
         """
         db = config.database()
-        return db.exe(select(Article)).scalars().all()
+        stmt = select(Article.status, Article.year, func.count(Article.id).label('npublications'))
+        if search is not None:
+            stmt = stmt.where(Article.id.in_(fulltext.matching(Article.__tablename__, search)))
+
+        return db.exe(stmt.group_by(Article.status, Article.year)).all()
 
 
     @staticmethod
-    def save(id=None, **kwargs):
+    def getTreeRows(statuses=None, year=None, ids=None, search=None):
         """
-        Save the given article to the database. If an ID is given,
-        the article is updated rather than inserted.
+        Returns the (id, status, date, title, firstauthor) of the articles
+        with the given statuses, published in the given year, ordered by
+        date. Only the first entry of the author list is fetched from the
+        database. If given, only articles matching the search string are
+        returned.
         """
         db = config.database()
-        
-        if id is not None:
-            stmt = update(Article).where(Article.id==id)
-        else:
-            stmt = insert(Article)
 
-        stmt = stmt.values(**kwargs)
-        result = db.exe(stmt, commit=True)
+        stmt = select(Article.id, Article.status, Article.date, Article.title, Article.firstAuthorColumn())
+        if statuses is not None:
+            stmt = stmt.where(Article.status.in_(statuses))
+        if year is not None:
+            stmt = stmt.where(Article.year==year)
+        if ids is not None:
+            stmt = stmt.where(Article.id.in_(ids))
+        if search is not None:
+            stmt = stmt.where(Article.id.in_(fulltext.matching(Article.__tablename__, search)))
 
-        return result
+        return db.exe(stmt.order_by(Article.date.desc())).all()
 
 
     @staticmethod
-    def fromArXiv(arxiv_id):
+    def getPaperRows(ids):
         """
-        Fetch article details from its arXiv ID (or URL).
+        Returns the (id, date, title, nauthors) of the articles with the
+        given IDs, ordered by date (newest first). The IDs are passed in
+        chunks of at most MAX_IN_IDS.
         """
-        entry = refhelp.fromArXiv(arxiv_id)
-
-        def ret(key, d=''):
-            if key in entry:
-                return entry[key]
-            else:
-                return d
-
-        a = Article()
+        db = config.database()
 
-        aid = ret('id')
-        idx = aid.rfind('/')+1
-        a.doi = aid[idx:]
-        a.title = ret('title')
-        a.url = ret('id')
-        a.journal = 'arXiv preprint'
-        a.issue = ''
-        a.volume = ''
-        a.pages = ''
-        a.date = datetime.fromisoformat(ret('published'))
-        a.status = Article.STATUS_SUBMITTED
+        rows = []
+        for c in range(0, len(ids), Article.MAX_IN_IDS):
+            chunk = ids[c:c+Article.MAX_IN_IDS]
+            rows += db.exe(select(Article.id, Article.date, Article.title, Article.nauthors).where(Article.id.in_(chunk))).all()
 
-        authors = []
-        for auth in entry.authors:
-            authors += [auth['name']]
+        return sorted(rows, key=lambda r : r.date, reverse=True)
 
-        a.authors = ', '.join(authors)
 
-        return a
+    @staticmethod
+    @cached('articles')
+    def search(s, limit=None):
+        """
+        Returns the IDs of the articles matching the given search string,
+        best match first (see 'fulltext').
+        """
+        db = config.database()
+        return fulltext.search(db, Article.__tablename__, s, limit=limit)
 
 
     @staticmethod
-    def fromDOI(doi):
+    @cached('articles')
+    def getStatistics():
         """
-        Fetch article details from its DOI number (or URL).
+        Returns the number of articles in each tree view category, as
+        well as the number of first-author articles.
         """
-        js = refhelp.fromDOI(doi)
+        db = config.database()
 
-        def ret(key, d=''):
-            if key in js:
-                return js[key]
-            else:
-                return d
-
-        a = Article()
-
-        a.doi = ret('DOI')
-        a.title = ret('title')
-        a.url = f'https://doi.org/{a.doi}'
-        a.journal = ret('container-title')
-        a.issue = ret('issue')
-        a.volume = ret('volume')
-        if 'page' in js:
-            a.pages = ret('page')
-        elif 'article-number' in js:
-            a.pages = ret('article-number')
-
-        if 'published-print' in js:
-            dt = js['published-print']['date-parts'][0]
-        elif 'published-online' in js:
-            dt = js['published-online']['date-parts'][0]
-        elif 'created' in js:
-            dt = js['created']['date-parts'][0]
-        else:
-            dt = None
-
-        if dt:
-            dt = [f'{x:02d}' for x in dt]
-            ds = '-'.join(dt)
-            if re.match(r'[0-9]{4}-[0-9]{2}-[0-9]{2}$', ds):
-                a.date = datetime.fromisoformat(ds)
-            elif re.match(r'[0-9]{4}-[0-9]{2}$', ds):
-                a.date = datetime.fromisoformat(ds + '-01')
-            elif re.match(r'[0-9]{4}$', ds):
-                a.date = datetime(int(ds), 1, 1)
-            else:
-                raise Exception(f"Unrecognized date format: '{ds}'.")
-        else:
-            a.date = datetime.now()
+        stats = {c: 0 for c in Article.CATEGORIES}
+        nfirst = {c: 0 for c in Article.CATEGORIES}
 
-        if 'published-print' in js:
-            a.status = Article.STATUS_PUBLISHED
-        else:
-            a.status = Article.STATUS_ACCEPTED
-
-        authors = []
-        aut = ret('author')
-        for author in aut:
-            if 'given' in author:
-                given = author['given'].split(' ')
-                gvn = ''
-                for g in given:
-                    gvn += g[0] + '. '
-                gvn = gvn.strip()
-
-                authors.append(gvn + ' ' + author['family'])
-            # "Teams" do not have given names
-            elif 'name' in author:
-                authors.append(author['name'])
-            else:
-                # Sometimes ORCIDs are given as separate authors
-                pass
+        rows = db.exe(
+            select(Article.status, Article.authorpos, func.count(Article.id).label('npublications'))
+            .group_by(Article.status, Article.authorpos)
+        ).all()
+        for r in rows:
+            cat = Article.STATUS_CATEGORY[r.status]
+            stats[cat] += r.npublications
+            if r.authorpos == Article.POSITION_FIRST:
+                nfirst[cat] += r.npublications
 
-        a.authors = ', '.join(authors)
+        stats['nfirst'] = nfirst['npublished'] + nfirst['published']
+        stats['nfirst_nr'] = nfirst['npeerreviewed']
 
-        return a
+        return stats
 
 
     @staticmethod
-    def getIcons():
-        root = Path(__file__).parent.parent.absolute()
-        return {
-            'year': QtGui.QIcon(f'{root}/icons/year.png'),
-            'category': QtGui.QIcon(f'{root}/icons/category.png'),
-            'article-blue': QtGui.QIcon(f'{root}/icons/article-blue.png'),
-            'article-green': QtGui.QIcon(f'{root}/icons/article-green.png'),
-            'article-red': QtGui.QIcon(f'{root}/icons/article-red.png')
-        }
+    @cached('articles')
+    def getByDOI(doi, rows=False):
+        """
+        Return an article based on its DOI.
+        """
+        return Article._execute(Article._select(rows).where(Article.doi==doi), rows).one_or_none()
 
 
     @staticmethod
-    def loadPublicationsToTreeview(treeViewModel, checkable=False):
+    @cached('articles')
+    def getByArXiv(arxiv_id, rows=False):
         """
-        Load all articles from the database into a treeview.
+        Return all versions of the article with the given arXiv id (with
+        or without version). Articles from arXiv are stored with the
+        versioned id as DOI.
         """
-        ICONS = Article.getIcons()
-        def addItem(parent, name, icon, data=None):
-            """
-            Add an item to the tree view.
-            """
-            itm = QtGui.QStandardItem(name)
-            itm.setIcon(ICONS[icon])
+        base = refhelp.splitArXivVersion(arxiv_id)[0]
+        stmt = Article._select(rows).where(or_(
+            Article.doi==base, Article.doi.startswith(base + 'v', autoescape=True)
+        ))
+        return Article._execute(stmt, rows).all()
 
-            if checkable:
-                itm.setCheckable(checkable)
 
-            if data:
-                itm.setData(data)
+    @staticmethod
+    @cached('articles')
+    def getall(rows=False):
+        """
+        Returns a list of all publications.
+        """
+        return Article._execute(Article._select(rows), rows).all()
 
-            parent.appendRow(itm)
 
-            return itm
+    @staticmethod
+    def save(id=None, **kwargs):
+        """
+        Save the given article to the database. If an ID is given,
+        the article is updated rather than inserted.
+
+        Returns a dict describing the change, containing the ID of the
+        article and whether it was inserted, together with its status,
+        year and first-authorship before ('old...') and after ('new...')
+        saving. The old values are None for inserted articles.
+        """
+        db = config.database()
 
+        def summary(id):
+            return db.exe(select(Article.status, Article.date, Article.authorpos).where(Article.id==id)).one_or_none()
 
-        published = Article.getPublished()
-        npublishd = Article.getNotPublished()
-        npeerrvwd = Article.getNonPeerReviewed()
+        if 'authors' in kwargs:
+            kwargs['authorpos'] = Article.getAuthorPosition(kwargs['authors'], Article.getAuthorName())
+            kwargs['nauthors'] = len(Authorship.splitAuthors(kwargs['authors']))
+        if 'date' in kwargs:
+            kwargs['year'] = kwargs['date'].year
 
-        root = treeViewModel.invisibleRootItem()
+        old = None
+        if id is not None:
+            old = summary(id)
+            stmt = update(Article).where(Article.id==id)
+        else:
+            stmt = insert(Article)
 
-        npb = addItem(root, f'In preparation ({len(npublishd)})', 'category')
-        pub = addItem(root, f'Published ({len(published)})', 'category')
-        npr = addItem(root, f'Non-peer reviewed ({len(npeerrvwd)})', 'category')
+        stmt = stmt.values(**kwargs)
+        result = db.exe(stmt)
 
-        authorname = Setting.get('name').value
+        inserted = id is None
+        if inserted:
+            id = result.inserted_primary_key[0]
 
-        years = []
-        yr = None
-        nfirst = 0
-        nart = 0
-        for p in npublishd:
-            if p.date.year not in years:
-                if yr is not None:
-                    yr.setText(yr.text() + f' ({nart})')
-                    nart = 0
-                yr = addItem(npb, f'{p.date.year}', 'year')
-                years.append(p.date.year)
+        if 'authors' in kwargs:
+            Authorship.setAuthors(id, kwargs['authors'])
 
-            if p.isFirstAuthor(authorname):
-                nfirst += 1
+        db.flush()
 
-            addItem(yr, p.getName(), 'article-red', p.id)
-            nart += 1
+        new = summary(id)
 
-        if yr is not None:
-            yr.setText(yr.text() + f' ({nart})')
+        return {
+            'id': id,
+            'inserted': inserted,
+            'oldstatus': old.status if old else None,
+            'newstatus': new.status,
+            'oldyear': old.date.year if old else None,
+            'newyear': new.date.year,
+            'oldfirst': old.authorpos == Article.POSITION_FIRST if old else None,
+            'newfirst': new.authorpos == Article.POSITION_FIRST
+        }
 
-        years = []
-        nart = 0
-        yr = None
-        for p in published:
-            if p.date.year not in years:
-                if yr is not None:
-                    yr.setText(yr.text() + f' ({nart})')
-                    nart = 0
-                yr = addItem(pub, f'{p.date.year}', 'year')
-                years.append(p.date.year)
 
-            if p.isFirstAuthor(authorname):
-                nfirst += 1
+    @staticmethod
+    def fromArXiv(arxiv_id, timeout=refhelp.TIMEOUT, session=None):
+        """
+        Fetch article details from its arXiv ID (or URL).
+        """
+        entry = refhelp.fromArXiv(arxiv_id, timeout=timeout, session=session)
+        return Article.fromArXivEntry(entry)
 
-            addItem(yr, p.getName(), 'article-green', p.id)
-            nart += 1
 
-        if yr is not None:
-            yr.setText(yr.text() + f' ({nart})')
+    @staticmethod
+    def fromArXivMany(arxiv_ids, timeout=refhelp.TIMEOUT, session=None):
+        """
+        Fetch the details of several articles from their arXiv IDs (or
+        URLs), using batched queries. Generates tuples '(arxiv_id, article)',
+        where 'article' is None if the article could not be found.
+        """
+        for arxiv_id, entry in refhelp.fromArXivMany(arxiv_ids, timeout=timeout, session=session):
+            if entry is None:
+                yield arxiv_id, None
+            else:
+                yield arxiv_id, Article.fromArXivEntry(entry)
 
-        years = []
-        nart = 0
-        nfirst_npr = 0
-        yr = None
-        for p in npeerrvwd:
-            if p.date.year not in years:
-                if yr is not None:
-                    yr.setText(yr.text() + f' ({nart})')
-                    nart = 0
 
-                yr = addItem(npr, f'{p.date.year}', 'year')
-                years.append(p.date.year)
+    @staticmethod
+    def fromArXivEntry(entry):
+        """
+        Create an article from an arXiv API feed entry.
+        """
+        return Article(status=Article.STATUS_SUBMITTED, **refhelp.parseArXiv(entry))
 
-            if p.isFirstAuthor(authorname):
-                nfirst_npr += 1
 
-            addItem(yr, p.getName(), 'article-green', p.id)
-            nart += 1
+    @staticmethod
+    def fromDOI(doi, timeout=refhelp.TIMEOUT, session=None):
+        """
+        Fetch article details from its DOI number (or URL).
+        """
+        js = refhelp.fromDOI(doi, timeout=timeout, session=session)
+        fields = refhelp.parseDOI(js)
 
-        if yr is not None:
-            yr.setText(yr.text() + f' ({nart})')
+        if fields.pop('published'):
+            status = Article.STATUS_PUBLISHED
+        else:
+            status = Article.STATUS_ACCEPTED
 
-        return {
-            'published': len(published),
-            'npublished': len(npublishd),
-            'npeerreviewed': len(npeerrvwd),
-            'nfirst': nfirst,
-            'nfirst_nr': nfirst_npr
-        }
+        return Article(status=status, **fields)
 
 
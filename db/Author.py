@@ -0,0 +1,67 @@
+
+from sqlalchemy import Column, Integer, String, func
+from . base import Base
+
+from sqlalchemy.sql.expression import select
+from . import config
+from . cache import cached
+from . Authorship import Authorship
+
+
+class Author(Base):
+    
+
+    __tablename__ = 'authors'
+
+
+    # Author ID
+    id = Column(Integer, primary_key=True)
+    # Author name, as written in the author lists
+    name = Column(String, unique=True, index=True)
+
+
+    @staticmethod
+    @cached('authors')
+    def get(id):
+        """
+        Returns the author with the given ID, as a read-only row.
+        """
+        db = config.database()
+        return db.exe(select(*Author.__table__.columns).where(Author.id==id)).one_or_none()
+
+
+    @staticmethod
+    @cached('authors', 'authorship')
+    def getCoauthors(exclude=None):
+        """
+        Returns the (id, name, npapers) of all authors, ordered by the number
+        of articles they have authored. The author with the name 'exclude'
+        is omitted from the list.
+        """
+        db = config.database()
+
+        npapers = func.count(Authorship.article_id.distinct()).label('npapers')
+        stmt = (
+            select(Author.id, Author.name, npapers)
+            .join(Authorship, Authorship.author_id==Author.id)
+            .group_by(Author.id)
+            .order_by(npapers.desc(), Author.name.desc())
+        )
+
+        if exclude is not None:
+            stmt = stmt.where(Author.name!=exclude)
+
+        return db.exe(stmt).all()
+
+
+    @staticmethod
+    @cached('authorship')
+    def getArticleIds(id):
+        """
+        Returns the IDs of all articles authored by the author with the
+        given ID.
+        """
+        db = config.database()
+        return db.exe(select(Authorship.article_id).where(Authorship.author_id==id).distinct()).scalars().all()
+
+
@@ -0,0 +1,115 @@
+
+from sqlalchemy import Column, ForeignKey, Integer
+from . base import Base
+
+from sqlalchemy.sql.expression import delete, insert, select
+from . import config
+
+
+class Authorship(Base):
+    
+
+    __tablename__ = 'authorship'
+
+
+    # Maximum number of names to pass in a single 'IN' query
+    MAX_IN_NAMES = 500
+
+
+    # Article ID
+    article_id = Column(Integer, ForeignKey('articles.id'), primary_key=True)
+    # Position of the author in the author list (starting from 1)
+    position = Column(Integer, primary_key=True)
+    # Author ID
+    author_id = Column(Integer, ForeignKey('authors.id'), index=True)
+
+
+    @staticmethod
+    def splitAuthors(authors):
+        """
+        Split an author list into the names of the individual authors.
+        """
+        if not authors:
+            return []
+
+        names = [a.strip() for a in authors.split(',')]
+        return [a for a in names if a]
+
+
+    @staticmethod
+    def getAuthorIds(names):
+        """
+        Returns a dict mapping the given author names to author IDs,
+        creating the authors which do not yet exist.
+        """
+        from . Author import Author
+
+        db = config.database()
+        names = list(set(names))
+
+        ids = {}
+        for c in range(0, len(names), Authorship.MAX_IN_NAMES):
+            chunk = names[c:c+Authorship.MAX_IN_NAMES]
+            db.exe(insert(Author).prefix_with('OR IGNORE'), [{'name': n} for n in chunk])
+            for id, name in db.exe(select(Author.id, Author.name).where(Author.name.in_(chunk))):
+                ids[name] = id
+
+        return ids
+
+
+    @staticmethod
+    def setAuthors(article_id, authors):
+        """
+        Replace the authorship records of the given article with those of
+        the given author list. Authors who are no longer credited on any
+        article are removed. The changes are not committed.
+        """
+        from . Author import Author
+
+        db = config.database()
+
+        oldids = set(db.exe(select(Authorship.author_id).where(Authorship.article_id==article_id)).scalars().all())
+        db.exe(delete(Authorship).where(Authorship.article_id==article_id))
+
+        names = Authorship.splitAuthors(authors)
+        ids = Authorship.getAuthorIds(names)
+
+        if names:
+            db.exe(insert(Authorship), [
+                {'article_id': article_id, 'position': i+1, 'author_id': ids[n]}
+                for i, n in enumerate(names)
+            ])
+
+        orphans = oldids - set(ids.values())
+        if orphans:
+            used = db.exe(select(Authorship.author_id).where(Authorship.author_id.in_(orphans)).distinct()).scalars().all()
+            orphans -= set(used)
+            db.exe(delete(Author).where(Author.id.in_(orphans)))
+
+
+    @staticmethod
+    def rebuild():
+        """
+        Rebuild the authorship records and author list from the author
+        lists of all articles. The changes are not committed.
+        """
+        from . Article import Article
+        from . Author import Author
+
+        db = config.database()
+
+        db.exe(delete(Authorship))
+        db.exe(delete(Author))
+
+        articles = [(id, Authorship.splitAuthors(authors)) for id, authors in db.exe(select(Article.id, Article.authors)).all()]
+        ids = Authorship.getAuthorIds([n for _, names in articles for n in names])
+
+        records = [
+            {'article_id': id, 'position': i+1, 'author_id': ids[n]}
+            for id, names in articles for i, n in enumerate(names)
+        ]
+
+        if records:
+            db.exe(insert(Authorship), records)
+
+
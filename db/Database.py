@@ -1,41 +1,235 @@
 # Database manager
 
+from contextlib import contextmanager
 from pathlib import Path
-from sqlalchemy import create_engine, select
+import threading
+from sqlalchemy import create_engine, event, select
 from sqlalchemy.orm import Session
 from datetime import datetime
-from . base import Base
+from . import migrations
+from . cache import QueryCache
+from . profiler import QueryProfiler
 
 
 class Database:
     
 
-    def __init__(self, filename, echo=False):
+    # Connection profiles. Each profile is a set of PRAGMAs which are
+    # applied to every new connection. The 'readonly' profile opens the
+    # database file as read-only and immutable, and so may only be used
+    # when no other process is modifying the database (and when it was
+    # last closed cleanly, as an immutable database ignores any WAL file).
+    PROFILES = {
+        # SQLite defaults
+        'default': {},
+        # Interactive use: few fsyncs per commit, and never blocking
+        # immediately if another process holds a lock. The journal mode
+        # is set explicitly, since WAL mode (see 'wal') is persistent and
+        # would otherwise stay in effect once it has been used.
+        'interactive': {
+            'journal_mode': 'DELETE',
+            'synchronous': 'NORMAL',
+            'cache_size': -32000,
+            'mmap_size': 268435456,
+            'temp_store': 'MEMORY',
+            'busy_timeout': 5000
+        },
+        # As 'interactive', but with a write-ahead log, so that reading
+        # and writing do not block each other, and commits are faster.
+        # WAL mode is stored in the database file, and requires shared
+        # memory between all processes using the database, so it must
+        # not be used for databases on network file systems (such as NFS
+        # or SMB shares), nor by older SQLite versions.
+        'wal': {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'cache_size': -32000,
+            'mmap_size': 268435456,
+            'temp_store': 'MEMORY',
+            'busy_timeout': 5000
+        },
+        # Bulk imports: no fsyncs and a large cache. A crash during an
+        # import may corrupt the database.
+        'bulk': {
+            'journal_mode': 'DELETE',
+            'synchronous': 'OFF',
+            'cache_size': -256000,
+            'mmap_size': 1073741824,
+            'temp_store': 'MEMORY',
+            'busy_timeout': 30000
+        },
+        # Report generation from a database which is not modified
+        'readonly': {
+            'query_only': 'ON',
+            'cache_size': -64000,
+            'mmap_size': 1073741824,
+            'temp_store': 'MEMORY'
+        }
+    }
+
+
+    def __init__(self, filename, echo=False, profile='interactive'):
         """
         Constructor.
         """
-        initdb = not Path(filename).is_file()
+        if profile not in self.PROFILES:
+            raise Exception(f"Unrecognized database connection profile: '{profile}'.")
 
-        self.engine = create_engine(f'sqlite:///{filename}', echo=echo)
+        self.filename = filename
+        self.profile = profile
+        self.readonly = (profile == 'readonly')
 
-        if initdb:
-            Base.metadata.create_all(self.engine)
+        if self.readonly:
+            uri = Path(filename).absolute().as_uri()
+            self.engine = create_engine(f'sqlite:///{uri}?mode=ro&immutable=1&uri=true', echo=echo)
+        else:
+            self.engine = create_engine(f'sqlite:///{filename}', echo=echo)
+
+        pragmas = self.PROFILES[profile]
+
+        @event.listens_for(self.engine, 'connect')
+        def setPragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for name, value in pragmas.items():
+                cursor.execute(f'PRAGMA {name} = {value}')
+            cursor.close()
+
+        # Default session, used by the main thread outside of any unit of
+        # work, as well as the per-thread stacks of sessions opened with
+        # 'transaction()'/'reading()'. Other threads (e.g. background
+        # workers) must only access the database in a unit of work.
+        self.defaultSession = Session(self.engine)
+        self.local = threading.local()
+
+        self.cache = QueryCache()
 
-        self.session = Session(self.engine)
+        # Opt-in statement profiling (see 'QueryProfiler.enable()')
+        self.profiler = QueryProfiler(self.engine)
 
+        # Create or upgrade the database schema
+        if self.readonly:
+            migrations.check(self)
+        else:
+            migrations.upgrade(self)
+
+
+    @property
+    def sessions(self):
+        """
+        The stack of unit-of-work sessions active in the current thread.
+        """
+        if not hasattr(self.local, 'sessions'):
+            self.local.sessions = []
 
-    def exe(self, stmt, commit=False):
-        r = self.session.execute(stmt)
+        return self.local.sessions
 
-        if commit:
-            self.session.commit()
+
+    @property
+    def session(self):
+        """
+        The session used for executing statements, i.e. the session of
+        the innermost active unit of work, or the default session.
+        """
+        if self.sessions:
+            return self.sessions[-1]
+        else:
+            return self.defaultSession
+
+
+    @contextmanager
+    def transaction(self):
+        """
+        Run a unit of work in a new, short-lived session. All statements
+        executed by the model classes within the 'with' block use this
+        session, and are committed together when the block exits (or
+        rolled back if an exception is raised). Objects loaded in the
+        session are detached, with their attributes still loaded,
+        afterwards.
+        """
+        session = Session(self.engine, expire_on_commit=False)
+        self.sessions.append(session)
+
+        try:
+            yield session
+            self.commit(session)
+        except Exception:
+            self.rollback(session)
+            raise
+        finally:
+            self.sessions.pop()
+            session.close()
+
+
+    @contextmanager
+    def reading(self):
+        """
+        Run a read-only unit of work in a new, short-lived session without
+        autoflush. Objects loaded in the session are detached when the
+        'with' block exits, so that they are not kept alive by the
+        identity map of a long-lived session.
+        """
+        session = Session(self.engine, autoflush=False)
+        self.sessions.append(session)
+
+        try:
+            yield session
+        finally:
+            self.sessions.pop()
+            session.close()
+
+
+    def exe(self, stmt, params=None, commit=False):
+        r = self.session.execute(stmt, params)
+
+        # Rows are fetched here when profiling, so that the fetching time
+        # is attributed to the statement (except for results which are
+        # meant to be streamed)
+        if self.profiler.enabled and getattr(stmt, 'is_select', False) and 'yield_per' not in stmt.get_execution_options():
+            r = self.profiler.fetch(r)
+
+        # Cached queries on the modified table are invalidated when the
+        # change is committed
+        if getattr(stmt, 'is_dml', False):
+            self.session.info.setdefault('tables', set()).add(stmt.table.name)
+
+        if commit and not self.sessions:
+            self.commit(self.session)
 
         return r
 
 
+    def commit(self, session):
+        """
+        Commit the given session, and invalidate the cached results which
+        depend on the tables modified in it. The results are invalidated
+        only after the commit, as results computed by other sessions
+        before the commit (but after the modifying statements) would
+        otherwise be cached as valid.
+        """
+        session.commit()
+        for table in session.info.pop('tables', ()):
+            self.cache.invalidate(table)
+
+
+    def rollback(self, session):
+        """
+        Roll back the given session.
+        """
+        session.rollback()
+        session.info.pop('tables', None)
+
+        # Cached results may refer to objects expired by the rollback
+        self.cache.clear()
+
+
     def flush(self):
+        """
+        Flush pending changes. Outside of a unit of work, the changes are
+        also committed immediately.
+        """
         self.session.flush()
-        self.session.commit()
+        if not self.sessions:
+            self.commit(self.session)
 
 
     def now(self, time=True):
@@ -1,15 +1,15 @@
 
 from datetime import datetime
-from sqlalchemy import Column, Date, Integer, String, or_
+from sqlalchemy import Column, Date, Index, Integer, String, func, inspect, or_
+from sqlalchemy.orm.util import identity_key
 from . base import Base
 from . Setting import Setting
 
-from PyQt5 import QtGui
-from pathlib import Path
-
 from sqlalchemy.sql.expression import insert, select, update
 from . import config
+from . cache import cached
 
+from . import fulltext
 from . import refhelp
 
 
@@ -17,6 +17,9 @@ class Presentation(Base):
     
 
     __tablename__ = 'presentations'
+    __table_args__ = (
+        Index('ix_presentations_type_year', 'type', 'year'),
+    )
 
 
     TYPE_ORAL = 1
@@ -24,12 +27,25 @@ class Presentation(Base):
     TYPE_INVITED = 3
 
 
+    # Maximum number of IDs to pass in a single 'IN' query
+    MAX_IN_IDS = 500
+
+
+    # Tree view category of each type, in display order
+    CATEGORIES = ['oral', 'poster', 'invited']
+    TYPE_CATEGORY = {
+        TYPE_ORAL: 'oral',
+        TYPE_POSTER: 'poster',
+        TYPE_INVITED: 'invited'
+    }
+
+
     # Presentation ID
     id = Column(Integer, primary_key=True)
     # Status
-    type = Column(Integer)
+    type = Column(Integer, index=True)
     # DOI
-    doi = Column(String)
+    doi = Column(String, index=True)
     # URL to poster/presentation
     url = Column(String)
     # EUROfusion pinboard ID
@@ -43,7 +59,9 @@ class Presentation(Base):
     # Presentation ID
     presentationid = Column(String)
     # Date
-    date = Column(Date)
+    date = Column(Date, index=True)
+    # Year (same as 'date.year')
+    year = Column(Integer)
     # Keywords
     keywords = Column(String)
 
@@ -73,62 +91,191 @@ class Presentation(Base):
         """
         Check if the presentation with the given DOI exists.
         """
-        p = Presentation.getByDOI(doi)
+        p = Presentation.getByDOI(doi, rows=True)
         return (p is not None)
 
 
     @staticmethod
-    def get(id):
+    def _select(rows=False):
+        """
+        Returns a statement selecting presentations. If 'rows' is True, the
+        columns are selected as lightweight, read-only rows which are not
+        attached to any session, rather than as ORM objects.
+        """
+        if rows:
+            return select(*Presentation.__table__.columns)
+        else:
+            return select(Presentation)
+
+
+    @staticmethod
+    def _execute(stmt, rows=False):
+        """
+        Execute a statement created with '_select()'.
+        """
+        db = config.database()
+        r = db.exe(stmt)
+
+        if rows:
+            return r
+        else:
+            return r.scalars()
+
+
+    @staticmethod
+    @cached('presentations')
+    def get(id, rows=False):
         """
         Returns the presentation with the given ID.
         """
+        return Presentation._execute(Presentation._select(rows).where(Presentation.id == id), rows).one_or_none()
+
+
+    @staticmethod
+    def getMany(ids, rows=False):
+        """
+        Returns the presentations with the given IDs, in the given order.
+        Presentations which are already loaded in the session are taken
+        from the session, and the remaining ones are fetched in chunks of
+        at most MAX_IN_IDS. If 'rows' is True, lightweight rows are
+        returned instead (see '_select()').
+        """
         db = config.database()
-        return db.exe(select(Presentation).where(Presentation.id == id)).scalars().one_or_none()
+
+        presentations = {}
+        missing = []
+        for i in ids:
+            p = None if rows else db.session.identity_map.get(identity_key(Presentation, i))
+            if p is not None and not inspect(p).expired:
+                presentations[i] = p
+            else:
+                missing.append(i)
+
+        for c in range(0, len(missing), Presentation.MAX_IN_IDS):
+            chunk = missing[c:c+Presentation.MAX_IN_IDS]
+            for p in Presentation._execute(Presentation._select(rows).where(Presentation.id.in_(chunk)), rows):
+                presentations[p.id] = p
+
+        return [presentations[i] for i in ids if i in presentations]
 
 
     @staticmethod
-    def getOral():
+    @cached('presentations')
+    def getOral(rows=False):
         """
         Returns all oral presentations.
         """
-        db = config.database()
-        return db.exe(select(Presentation).where(Presentation.type == Presentation.TYPE_ORAL).order_by(Presentation.date.desc())).scalars().all()
+        return Presentation._execute(Presentation._select(rows).where(Presentation.type == Presentation.TYPE_ORAL).order_by(Presentation.date.desc()), rows).all()
 
 
     @staticmethod
-    def getPoster():
+    @cached('presentations')
+    def getPoster(rows=False):
         """
         Returns all poster presentations.
         """
-        db = config.database()
-        return db.exe(select(Presentation).where(Presentation.type == Presentation.TYPE_POSTER).order_by(Presentation.date.desc())).scalars().all()
+        return Presentation._execute(Presentation._select(rows).where(Presentation.type == Presentation.TYPE_POSTER).order_by(Presentation.date.desc()), rows).all()
 
 
     @staticmethod
-    def getInvited():
+    @cached('presentations')
+    def getInvited(rows=False):
         """
         Returns all invited presentations.
         """
+        return Presentation._execute(Presentation._select(rows).where(Presentation.type == Presentation.TYPE_INVITED).order_by(Presentation.date.desc()), rows).all()
+
+
+    @staticmethod
+    def firstAuthorColumn():
+        """
+        Returns an SQL expression for the first entry of the author list.
+        """
+        return func.substr(
+            Presentation.authors, 1,
+            func.instr(Presentation.authors.concat(', '), ', ')-1
+        ).label('firstauthor')
+
+
+    @staticmethod
+    @cached('presentations')
+    def getTreeCounts(search=None):
+        """
+        Returns the number of presentations of each type, per year. If
+        given, only presentations matching the search string are counted.
+        """
         db = config.database()
-        return db.exe(select(Presentation).where(Presentation.type == Presentation.TYPE_INVITED).order_by(Presentation.date.desc())).scalars().all()
+        stmt = select(Presentation.type, Presentation.year, func.count(Presentation.id).label('npublications'))
+        if search is not None:
+            stmt = stmt.where(Presentation.id.in_(fulltext.matching(Presentation.__tablename__, search)))
+
+        return db.exe(stmt.group_by(Presentation.type, Presentation.year)).all()
 
 
     @staticmethod
-    def getByDOI(doi):
+    def getTreeRows(types=None, year=None, ids=None, search=None):
         """
-        Returns the presentation with the given DOI.
+        Returns the (id, type, date, title, firstauthor) of the presentations
+        of the given types, given in the given year, ordered by date. Only
+        the first entry of the author list is fetched from the database.
+        If given, only presentations matching the search string are
+        returned.
         """
         db = config.database()
-        return db.exe(select(Presentation).where(Presentation.doi == doi)).scalars().one_or_none()
+
+        stmt = select(Presentation.id, Presentation.type, Presentation.date, Presentation.title, Presentation.firstAuthorColumn())
+        if types is not None:
+            stmt = stmt.where(Presentation.type.in_(types))
+        if year is not None:
+            stmt = stmt.where(Presentation.year==year)
+        if ids is not None:
+            stmt = stmt.where(Presentation.id.in_(ids))
+        if search is not None:
+            stmt = stmt.where(Presentation.id.in_(fulltext.matching(Presentation.__tablename__, search)))
+
+        return db.exe(stmt.order_by(Presentation.date.desc())).all()
 
 
     @staticmethod
-    def getall():
+    @cached('presentations')
+    def search(s, limit=None):
         """
-        Returns all presentations.
+        Returns the IDs of the presentations matching the given search string,
+        best match first (see 'fulltext').
         """
         db = config.database()
-        return db.exe(select(Presentation).order_by(Presentation.date.desc())).scalars().all()
+        return fulltext.search(db, Presentation.__tablename__, s, limit=limit)
+
+
+    @staticmethod
+    @cached('presentations')
+    def getStatistics():
+        """
+        Returns the number of presentations in each tree view category.
+        """
+        stats = {c: 0 for c in Presentation.CATEGORIES}
+        for r in Presentation.getTreeCounts():
+            stats[Presentation.TYPE_CATEGORY[r.type]] += r.npublications
+
+        return stats
+
+
+    @staticmethod
+    @cached('presentations')
+    def getByDOI(doi, rows=False):
+        """
+        Returns the presentation with the given DOI.
+        """
+        return Presentation._execute(Presentation._select(rows).where(Presentation.doi == doi), rows).one_or_none()
+
+
+    @staticmethod
+    @cached('presentations')
+    def getall(rows=False):
+        """
+        Returns all presentations.
+        """
+        return Presentation._execute(Presentation._select(rows).order_by(Presentation.date.desc()), rows).all()
 
 
     @staticmethod
@@ -136,10 +283,23 @@ class Presentation(Base):
         """
         Save the given presentation to the database. If an ID is given,
         the presentation is updated rather than inserted.
+
+        Returns a dict describing the change, containing the ID of the
+        presentation and whether it was inserted, together with its type
+        and year before ('old...') and after ('new...') saving. The old
+        values are None for inserted presentations.
         """
         db = config.database()
 
+        def summary(id):
+            return db.exe(select(Presentation.type, Presentation.date).where(Presentation.id==id)).one_or_none()
+
+        if 'date' in kwargs:
+            kwargs['year'] = kwargs['date'].year
+
+        old = None
         if id is not None:
+            old = summary(id)
             stmt = update(Presentation).where(Presentation.id==id)
         else:
             stmt = insert(Presentation)
@@ -147,15 +307,28 @@ class Presentation(Base):
         stmt = stmt.values(**kwargs)
         result = db.exe(stmt, commit=True)
 
-        return result
+        inserted = id is None
+        if inserted:
+            id = result.inserted_primary_key[0]
+
+        new = summary(id)
+
+        return {
+            'id': id,
+            'inserted': inserted,
+            'oldtype': old.type if old else None,
+            'newtype': new.type,
+            'oldyear': old.date.year if old else None,
+            'newyear': new.date.year
+        }
 
 
     @staticmethod
-    def fromDOI(doi):
+    def fromDOI(doi, timeout=refhelp.TIMEOUT, session=None):
         """
         Fetch presentation details from its DOI number (or URL).
         """
-        js = refhelp.fromDOI(doi)
+        js = refhelp.fromDOI(doi, timeout=timeout, session=session)
 
         def ret(key, d=''):
             value = js.get(key, d)
@@ -203,80 +376,3 @@ class Presentation(Base):
         return p
 
 
-    @staticmethod
-    def getIcons():
-        root = Path(__file__).parent.parent.absolute()
-        return {
-            'year': QtGui.QIcon(f'{root}/icons/year.png'),
-            'category': QtGui.QIcon(f'{root}/icons/category.png'),
-            'oral': QtGui.QIcon(f'{root}/icons/oral.png'),
-            'poster': QtGui.QIcon(f'{root}/icons/poster.png'),
-            'invited': QtGui.QIcon(f'{root}/icons/invited.png')
-        }
-
-
-    @staticmethod
-    def loadPresentationsToTreeview(treeViewModel, checkable=False):
-        """
-        Load all presentations from the database into a treeview.
-        """
-        ICONS = Presentation.getIcons()
-
-        def addItem(parent, name, icon, data=None):
-            """
-            Add an item to the tree view.
-            """
-            itm = QtGui.QStandardItem(name)
-            itm.setIcon(ICONS[icon])
-
-            if checkable:
-                itm.setCheckable(checkable)
-
-            if data:
-                itm.setData(data)
-
-            parent.appendRow(itm)
-
-            return itm
-
-
-        def addPresentations(parent, presentations, icon):
-            years = []
-            yr = None
-            npres = 0
-
-            for presentation in presentations:
-                if presentation.date.year not in years:
-                    if yr is not None:
-                        yr.setText(yr.text() + f' ({npres})')
-                        npres = 0
-
-                    yr = addItem(parent, f'{presentation.date.year}', 'year')
-                    years.append(presentation.date.year)
-
-                addItem(yr, presentation.getName(), icon, presentation.id)
-                npres += 1
-
-            if yr is not None:
-                yr.setText(yr.text() + f' ({npres})')
-
-
-        oral = Presentation.getOral()
-        poster = Presentation.getPoster()
-        invited = Presentation.getInvited()
-
-        root = treeViewModel.invisibleRootItem()
-
-        ora = addItem(root, f'Oral presentations ({len(oral)})', 'category')
-        pos = addItem(root, f'Poster presentations ({len(poster)})', 'category')
-        inv = addItem(root, f'Invited presentations ({len(invited)})', 'category')
-
-        addPresentations(ora, oral, 'oral')
-        addPresentations(pos, poster, 'poster')
-        addPresentations(inv, invited, 'invited')
-
-        return {
-            'oral': len(oral),
-            'poster': len(poster),
-            'invited': len(invited)
-        }
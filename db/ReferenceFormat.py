@@ -4,6 +4,7 @@ from . base import Base
 
 from sqlalchemy.sql.expression import insert, select, update
 from . import config
+from . cache import cached
 
 
 class ReferenceFormat(Base):
@@ -12,38 +13,52 @@ class ReferenceFormat(Base):
     __tablename__ = 'referenceformats'
 
 
+    # Kinds of reference formats: Python code, executed as the body of a
+    # function of the reference format variables, or a declarative
+    # template (see 'ReferenceTemplate')
+    KIND_CODE = 1
+    KIND_TEMPLATE = 2
+
+
     DEFAULT = "return f'{authors}, {journal} {volume} ({year})'"
+    DEFAULT_TEMPLATE = "{authors}, {journal} {volume} ({year})"
 
 
     # Reference format ID
     id = Column(Integer, primary_key=True)
     # Reference format name
-    name = Column(String)
-    # Reference format code
+    name = Column(String, index=True)
+    # Reference format code (or template)
     code = Column(String)
+    # Kind of reference format (KIND_CODE if not set)
+    kind = Column(Integer, default=KIND_CODE)
 
 
     @staticmethod
+    @cached('referenceformats')
     def get(id=None, name=None):
         """
-        Returns the reference format with the given name.
+        Returns the reference format with the given name (or ID), as a
+        read-only row.
         """
         db = config.database()
+        stmt = select(*ReferenceFormat.__table__.columns)
         if name is not None:
-            return db.exe(select(ReferenceFormat).where(ReferenceFormat.name==name)).scalars().one_or_none()
+            return db.exe(stmt.where(ReferenceFormat.name==name)).one_or_none()
         elif id is not None:
-            return db.exe(select(ReferenceFormat).where(ReferenceFormat.id==id)).scalars().one_or_none()
+            return db.exe(stmt.where(ReferenceFormat.id==id)).one_or_none()
         else:
             raise Exception(f"Neither an ID nor a name was specified when trying to get a 'ReferenceFormat'.")
 
 
     @staticmethod
+    @cached('referenceformats')
     def getAll():
         """
-        Returns all reference formats from the database.
+        Returns all reference formats from the database, as read-only rows.
         """
         db = config.database()
-        return db.exe(select(ReferenceFormat).order_by(ReferenceFormat.name.asc())).scalars().all()
+        return db.exe(select(*ReferenceFormat.__table__.columns).order_by(ReferenceFormat.name.asc())).all()
 
 
     @staticmethod
@@ -4,6 +4,7 @@ from . base import Base
 
 from sqlalchemy.sql.expression import insert, select, update
 from . import config
+from . cache import cached
 
 
 class Setting(Base):
@@ -15,7 +16,7 @@ class Setting(Base):
     # Setting ID
     id = Column(Integer, primary_key=True)
     # Setting name
-    name = Column(String)
+    name = Column(String, index=True)
     # Setting value
     value = Column(String)
 
@@ -35,12 +36,13 @@ class Setting(Base):
 
 
     @staticmethod
+    @cached('settings')
     def get(name):
         """
-        Returns the setting with the given name.
+        Returns the setting with the given name, as a read-only row.
         """
         db = config.database()
-        return db.exe(select(Setting).where(Setting.name==name)).scalars().one_or_none()
+        return db.exe(select(*Setting.__table__.columns).where(Setting.name==name)).one_or_none()
 
 
     @staticmethod
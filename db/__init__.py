@@ -1,7 +1,60 @@
+# Database model of the publication manager
+#
+# The model classes are imported when they are first used, rather than
+# when the package is imported, so that modules which do not use the
+# database (such as 'refhelp' and 'httpcache', used by the command-line
+# tools) can be imported without importing SQLAlchemy. 'from db import
+# Article' works as usual.
+#
+# Each class is defined in a submodule with the same name as the class.
+# Importing the submodule (e.g. with 'from . Article import Article' in
+# another submodule) sets an attribute with that name on the package,
+# which would then hide the class, so the package replaces such
+# attributes with the class (see 'Package.__setattr__()').
+
+import importlib
+import sys
+import types
+
+
+MODELS = ['Article', 'Author', 'Authorship', 'Database', 'Presentation', 'ReferenceFormat', 'Setting']
+
+__all__ = list(MODELS)
+
+
+def __getattr__(name):
+    """
+    Import the named model class on first use.
+    """
+    if name not in MODELS:
+        raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+
+    cls = getattr(importlib.import_module(f'{__name__}.{name}'), name)
+
+    # Subsequent lookups find the class without calling '__getattr__()'
+    globals()[name] = cls
+    return cls
+
+
+def __dir__():
+    return sorted(set(list(globals().keys()) + __all__))
+
+
+class Package(types.ModuleType):
+
+
+    def __setattr__(self, name, value):
+        """
+        Set the model class, rather than the submodule defining it, when
+        the import system sets the attribute for an imported submodule.
+        Other assignments are made as usual.
+        """
+        if name in MODELS and isinstance(value, types.ModuleType) and value.__name__ == f'{__name__}.{name}':
+            value = getattr(value, name)
+
+        super().__setattr__(name, value)
+
+
+sys.modules[__name__].__class__ = Package
 
-from . Article import Article
-from . Database import Database
-from . Presentation import Presentation
-from . ReferenceFormat import ReferenceFormat
-from . Setting import Setting
 
@@ -0,0 +1,307 @@
+# Bulk import of articles from lists of DOIs and arXiv ids
+#
+# The metadata of the articles are fetched concurrently by a bounded pool
+# of threads which share one keep-alive HTTP session (with arXiv ids
+# being queried in batches), and the articles are then inserted into the
+# database in a single transaction. Progress is recorded in a state file
+# (one JSON object per line), so that an interrupted import can be
+# resumed without fetching the articles which were already fetched again.
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+import json
+import os
+
+from . import config
+from . import refhelp
+from . Article import Article
+from . refhelp import isArXiv, normalizeId, parseIds
+
+
+# Status of an id in the state file
+STATUS_FETCHED = 'fetched'
+STATUS_IMPORTED = 'imported'
+STATUS_EXISTS = 'exists'
+STATUS_FAILED = 'failed'
+
+# Article columns stored in the state file
+FIELDS = ['doi', 'url', 'title', 'authors', 'journal', 'volume', 'issue', 'pages', 'status']
+
+
+class BulkImport:
+
+
+    def __init__(self, ids, statefile=None, workers=8, timeout=refhelp.TIMEOUT):
+        """
+        Constructor.
+
+        :param ids:       List of DOIs and arXiv ids to import.
+        :param statefile: File in which to record the progress of the
+                          import. If the file exists, the import is
+                          resumed, and the ids of the interrupted import
+                          are added to 'ids'.
+        :param workers:   Maximum number of concurrent requests.
+        :param timeout:   Timeout (in seconds) of each request.
+        """
+        self.ids = list(dict.fromkeys([normalizeId(i) for i in ids]))
+        self.statefile = statefile
+        self.workers = workers
+        self.timeout = timeout
+
+        # Current status of each id, and fetched article data
+        self.status = {}
+        self.articles = {}
+        self.errors = {}
+
+        if statefile is not None:
+            recorded = []
+            if os.path.exists(statefile):
+                recorded = self.loadState()
+
+            # Only ids which are not yet listed in the state file are
+            # recorded, so that resuming does not append the full list
+            # again every time
+            recorded = set(recorded)
+            new = [i for i in self.ids if i not in recorded]
+            if new:
+                self.record(None, None, ids=new)
+
+
+    def loadState(self):
+        """
+        Load the state of a previously interrupted import. Returns the
+        list of ids recorded in the state file.
+        """
+        recorded = []
+        with open(self.statefile, 'r') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Incomplete last line of an interrupted import
+                    continue
+
+                if entry['id'] is None:
+                    recorded += entry['ids']
+                    continue
+
+                self.status[entry['id']] = entry['status']
+                if entry['status'] == STATUS_FETCHED:
+                    self.articles[entry['id']] = entry['article']
+                elif entry['status'] == STATUS_FAILED:
+                    self.errors[entry['id']] = entry['error']
+
+        self.ids = list(dict.fromkeys(recorded + self.ids))
+        return recorded
+
+
+    def record(self, id, status, **kwargs):
+        """
+        Record the status of the given id in the state file. An id of
+        'None' records a list of ids to import.
+        """
+        if id is not None:
+            self.status[id] = status
+
+        if self.statefile is not None:
+            with open(self.statefile, 'a') as f:
+                f.write(json.dumps(dict(id=id, status=status, **kwargs)) + '\n')
+
+
+    def skipExisting(self):
+        """
+        Mark all ids of articles which already exist in the database.
+        Returns the number of such ids.
+        """
+        n = 0
+        for id in self.ids:
+            if self.status.get(id) in [STATUS_IMPORTED, STATUS_EXISTS]:
+                continue
+
+            if self.exists(id, id[6:] if isArXiv(id) else id):
+                self.record(id, STATUS_EXISTS)
+                n += 1
+
+        return n
+
+
+    def exists(self, id, doi):
+        """
+        Check whether the article with the given id (with DOI 'doi') exists
+        in the database. arXiv ids are compared without version, since a
+        newer version may have been published since the article was added.
+        """
+        if isArXiv(id):
+            return Article.existsArXiv(doi)
+        else:
+            return Article.exists(doi)
+
+
+    def pending(self):
+        """
+        Returns the ids which have not yet been fetched.
+        """
+        return [i for i in self.ids if self.status.get(i) in [None, STATUS_FAILED]]
+
+
+    def articleData(self, a):
+        """
+        Returns the data of the given article to store in the state file.
+        """
+        data = {f: getattr(a, f) for f in FIELDS}
+        data['date'] = a.date.strftime('%Y-%m-%d')
+
+        return data
+
+
+    def fetchDOI(self, id, session):
+        """
+        Fetch the article with the given DOI. Returns a list with a tuple
+        '(id, data, error)'.
+        """
+        try:
+            a = Article.fromDOI(id, timeout=self.timeout, session=session)
+            return [(id, self.articleData(a), None)]
+        except Exception as ex:
+            return [(id, None, str(ex))]
+
+
+    def fetchArXiv(self, ids, session):
+        """
+        Fetch the articles with the given arXiv ids, using batched arXiv
+        queries. Returns a list of tuples '(id, data, error)'.
+        """
+        try:
+            articles = dict(Article.fromArXivMany([i[6:] for i in ids], timeout=self.timeout, session=session))
+        except Exception as ex:
+            return [(id, None, str(ex)) for id in ids]
+
+        results = []
+        for id in ids:
+            a = articles.get(refhelp.normalizeArXiv(id[6:]))
+            if a is None:
+                results.append((id, None, 'Not found on arXiv.'))
+            else:
+                results.append((id, self.articleData(a), None))
+
+        return results
+
+
+    def fetch(self, progress=None, cancelled=None):
+        """
+        Fetch the metadata of all pending ids concurrently. DOIs are
+        resolved one per request, while arXiv ids are queried in batches
+        by a single worker (as arXiv limits the request rate). This method
+        does not access the database, and so may be called from any
+        thread.
+
+        :param progress:  Function called as 'progress(ndone, ntotal, id, error)'
+                          after each id has been fetched ('error' is None
+                          on success).
+        :param cancelled: Function returning True if the import should
+                          be cancelled. Requests in progress are
+                          completed (and their results kept), but no
+                          further requests are started.
+        """
+        pending = self.pending()
+        arxiv = [i for i in pending if isArXiv(i)]
+        ndone = 0
+
+        with refhelp.createSession(self.workers) as session:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                futures = [executor.submit(self.fetchDOI, i, session) for i in pending if not isArXiv(i)]
+                if arxiv:
+                    futures.append(executor.submit(self.fetchArXiv, arxiv, session))
+
+                stopped = False
+                for future in as_completed(futures):
+                    if future.cancelled():
+                        continue
+
+                    for id, data, error in future.result():
+                        if error is None:
+                            self.articles[id] = data
+                            self.errors.pop(id, None)
+                            self.record(id, STATUS_FETCHED, article=data)
+                        else:
+                            self.errors[id] = error
+                            self.record(id, STATUS_FAILED, error=error)
+
+                        ndone += 1
+                        if progress is not None:
+                            progress(ndone, len(pending), id, error)
+
+                    # Keep the results of the requests in progress
+                    if not stopped and cancelled is not None and cancelled():
+                        for f in futures:
+                            f.cancel()
+                        stopped = True
+
+
+    def commit(self):
+        """
+        Insert all fetched articles into the database, in a single
+        transaction. Articles which already exist in the database are
+        skipped. Returns the IDs of the inserted articles.
+        """
+        db = config.database()
+        inserted = []
+        imported = []
+
+        with db.transaction():
+            for id in self.ids:
+                if self.status.get(id) != STATUS_FETCHED:
+                    continue
+
+                data = dict(self.articles[id], pinboard='', keywords='')
+                data['date'] = datetime.fromisoformat(data['date']).date()
+
+                if self.exists(id, data['doi']):
+                    imported.append((id, STATUS_EXISTS))
+                else:
+                    inserted.append(Article.save(**data)['id'])
+                    imported.append((id, STATUS_IMPORTED))
+
+        # Only record the articles as imported once they are committed
+        for id, status in imported:
+            self.record(id, status)
+
+        return inserted
+
+
+    def summary(self):
+        """
+        Returns the number of ids with each status.
+        """
+        counts = {STATUS_IMPORTED: 0, STATUS_EXISTS: 0, STATUS_FETCHED: 0, STATUS_FAILED: 0}
+        for id in self.ids:
+            if id in self.status:
+                counts[self.status[id]] += 1
+
+        return counts
+
+
+    def finish(self):
+        """
+        Remove the state file if all ids have been imported (or already
+        existed in the database). Returns True if the import is complete.
+        """
+        complete = all([self.status.get(i) in [STATUS_IMPORTED, STATUS_EXISTS] for i in self.ids])
+
+        if complete and self.statefile is not None and os.path.exists(self.statefile):
+            os.remove(self.statefile)
+
+        return complete
+
+
+    def run(self, progress=None, cancelled=None):
+        """
+        Run the complete import: skip existing articles, fetch the
+        remaining ones and insert them into the database. Returns the
+        IDs of the inserted articles.
+        """
+        self.skipExisting()
+        self.fetch(progress=progress, cancelled=cancelled)
+        return self.commit()
+
+
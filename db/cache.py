@@ -0,0 +1,190 @@
+# Query result cache
+#
+# Results of the static finders of the model classes are memoized per
+# database. Every table has a generation counter which is incremented
+# whenever a change to the table, made with a statement executed through
+# 'Database.exe()', is committed, and a cached result is only used if none
+# of the tables it was computed from have changed since.
+#
+# A session with uncommitted changes sees data which other sessions do
+# not, so the cache is bypassed by such sessions (see 'cached()').
+#
+# Only plain values and read-only rows are cached. ORM objects belong to
+# the session which loaded them, and must not be handed to other sessions
+# (which may be in other threads), so for finders called with 'rows=False'
+# only the IDs of the returned objects are cached. The objects are then
+# loaded in the current session with the 'getMany()' finder of their
+# class, which takes objects which are still loaded from the session.
+
+import functools
+import inspect
+import threading
+from collections import OrderedDict
+
+from . import config
+
+
+class QueryCache:
+
+
+    def __init__(self, maxsize=256):
+        """
+        Constructor.
+        """
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.generations = {}
+
+        self.hits = 0
+        self.misses = 0
+
+        # Guards the entries, which may be accessed from worker threads
+        self.lock = threading.Lock()
+
+
+    def clear(self):
+        """
+        Remove all entries from the cache.
+        """
+        with self.lock:
+            self.entries.clear()
+
+
+    def invalidate(self, table=None):
+        """
+        Invalidate all cached results which depend on the named table. If
+        no table is given, the entire cache is invalidated.
+        """
+        if table is None:
+            self.clear()
+        else:
+            with self.lock:
+                self.generations[table] = self.generations.get(table, 0) + 1
+
+
+    def call(self, tables, f, args, kwargs):
+        """
+        Return the cached result of calling 'f' with the given arguments,
+        calling 'f' if no valid result is cached. The result is assumed to
+        only depend on the contents of the named tables.
+        """
+        try:
+            key = (f.__module__, f.__qualname__, args, tuple(sorted(kwargs.items())))
+            hash(key)
+        except TypeError:
+            # Unhashable arguments
+            self.misses += 1
+            return f(*args, **kwargs)
+
+        with self.lock:
+            gens = tuple([self.generations.get(t, 0) for t in tables])
+
+            if key in self.entries:
+                g, value = self.entries[key]
+                if g == gens:
+                    self.hits += 1
+                    self.entries.move_to_end(key)
+                    return self._copy(value)
+
+            self.misses += 1
+
+        value = f(*args, **kwargs)
+
+        with self.lock:
+            self.entries[key] = (gens, value)
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+        return self._copy(value)
+
+
+    def _copy(self, value):
+        """
+        Returns a copy of the given result, so that callers may modify
+        the returned lists and dicts without affecting the cache.
+        """
+        if isinstance(value, (list, dict)):
+            return value.copy()
+        else:
+            return value
+
+
+    def stats(self):
+        """
+        Returns the hit and miss counts of the cache.
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self.entries),
+            'maxsize': self.maxsize
+        }
+
+
+def identities(value):
+    """
+    Returns the class and the IDs of the given ORM object or list of
+    objects, from which the objects can be loaded by 'objects()'.
+    """
+    if isinstance(value, list):
+        return (type(value[0]) if value else None), [v.id for v in value]
+    elif value is None:
+        return None, None
+    else:
+        return type(value), value.id
+
+
+def objects(cls, ids):
+    """
+    Load the ORM objects with the given IDs (as returned by 'identities()')
+    in the current session.
+    """
+    if isinstance(ids, list):
+        return cls.getMany(ids) if ids else []
+    elif ids is None:
+        return None
+    else:
+        objs = cls.getMany([ids])
+        return objs[0] if objs else None
+
+
+def cached(*tables):
+    """
+    Decorator for finders whose results only depend on the contents of
+    the named tables. Results are cached in the query cache of the
+    active database. Finders with a 'rows' argument return ORM objects
+    unless it is True, and only the IDs of the objects are then cached.
+    """
+    def decorator(f):
+        params = list(inspect.signature(f).parameters)
+        rowsindex = params.index('rows') if 'rows' in params else None
+
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            db = config.database()
+            if 'tables' in db.session.info:
+                # Uncommitted changes
+                return f(*args, **kwargs)
+
+            if rowsindex is not None:
+                rows = kwargs['rows'] if 'rows' in kwargs else (len(args) > rowsindex and args[rowsindex])
+                if not rows:
+                    # On a miss, the loaded objects are returned as they
+                    # are, and only their IDs are cached
+                    loaded = []
+                    @functools.wraps(f)
+                    def ids(*args, **kwargs):
+                        loaded.append(f(*args, **kwargs))
+                        return identities(loaded[0])
+
+                    cls, i = db.cache.call(tables, ids, args, kwargs)
+                    return loaded[0] if loaded else objects(cls, i)
+
+            return db.cache.call(tables, f, args, kwargs)
+
+        return wrapper
+
+    return decorator
+
+
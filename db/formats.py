@@ -0,0 +1,260 @@
+# Bibliography output formats
+#
+# Publications are written as BibTeX, RIS or CSL-JSON entries by a
+# 'Writer', one entry at a time, so that bibliographies of any size can
+# be streamed to a file. The entries are formatted from the attributes
+# of the publications (doi, title, authors, journal, volume, issue, pages,
+# date and url), so articles, lightweight rows and plain records of
+# fetched details (such as those returned by 'refhelp.parseDOI()') can
+# all be written. Publications with a 'venue' rather than a journal are
+# written as presentations.
+#
+# Every entry gets a cite key of the form 'Surname2021', which is made
+# unique by appending a letter ('Surname2021a', 'Surname2021b', ...).
+
+import json
+import re
+
+
+def citeKey(pub):
+    """
+    Returns the cite key of the given publication, based on the surname of
+    its first author and its year of publication.
+    """
+    authors = pub.authors.split(', ')
+    surname = authors[0].split(' ')[-1]
+    return surname + f'{pub.date.year:d}'
+
+
+class CiteKeys:
+    """
+    Index of the cite keys used in a bibliography.
+
+    Base keys end with the year, and suffixes are letters, so a suffixed
+    key can never equal another base key. Only the number of keys
+    generated from each base key therefore needs to be stored.
+    """
+
+
+    def __init__(self):
+        """
+        Constructor.
+        """
+        # Number of keys generated from each base key
+        self.counts = {}
+
+
+    def key(self, pub):
+        """
+        Returns a unique cite key for the given publication.
+        """
+        base = citeKey(pub)
+
+        n = self.counts.get(base, 0)
+        self.counts[base] = n+1
+
+        if n == 0:
+            return base
+        else:
+            return base + suffix(n-1)
+
+
+def suffix(n):
+    """
+    Returns the suffix distinguishing cite keys with the same base
+    ('a', 'b', ..., 'z', 'aa', 'ab', ...).
+    """
+    s = ''
+    n += 1
+    while n > 0:
+        n, r = divmod(n-1, 26)
+        s = chr(ord('a')+r) + s
+
+    return s
+
+
+def isPresentation(pub):
+    """
+    Check whether the given publication is a presentation.
+    """
+    return hasattr(pub, 'venue')
+
+
+def authorNames(pub):
+    """
+    Returns the list of author names of the given publication.
+    """
+    return [a for a in pub.authors.split(', ') if a]
+
+
+def splitName(name):
+    """
+    Split an author name into the given names (initials) and the family
+    name. Names without initials (such as collaborations) are returned as
+    '(None, name)'.
+    """
+    if '.' not in name:
+        return None, name
+
+    words = name.split(' ')
+    return ' '.join(words[:-1]), words[-1]
+
+
+def bibtex(pub, key):
+    """
+    Format a publication as a BibTeX entry.
+    """
+    authors = pub.authors.split(', ')
+    for i in range(len(authors)):
+        if '.' not in authors[i]:
+            authors[i] = '{' + authors[i] + '}'
+
+    authorlist = ' and '.join(authors)
+
+    if isPresentation(pub):
+        s  =f"@misc {{{key},\n"
+        s +=f"    title = {{{pub.title}}},\n"
+        s +=f"    author = {{{authorlist}}},\n"
+        s +=f"    howpublished = {{{pub.venue}}},\n"
+    else:
+        s  =f"@article {{{key},\n"
+        s +=f"    title = {{{pub.title}}},\n"
+        s +=f"    author = {{{authorlist}}},\n"
+        s +=f"    journal = {{{pub.journal}}},\n"
+        s +=f"    volume = {{{pub.volume}}},\n"
+        s +=f"    pages = {{{pub.pages}}},\n"
+        s +=f"    issue = {{{pub.issue}}},\n"
+
+    s +=f"    year = {{{pub.date.year}}},\n"
+    s +=f"    doi = {{{pub.doi}}},\n"
+    s +=f"    url = {{{pub.url}}}\n"
+    s += "}"
+
+    return s
+
+
+def ris(pub, key):
+    """
+    Format a publication as an RIS record.
+    """
+    presentation = isPresentation(pub)
+
+    lines = [f'TY  - {"CONF" if presentation else "JOUR"}', f'ID  - {key}']
+    for name in authorNames(pub):
+        given, family = splitName(name)
+        lines.append(f'AU  - {family}, {given}' if given else f'AU  - {family}')
+
+    lines.append(f'TI  - {pub.title}')
+    if presentation:
+        lines.append(f'T2  - {pub.venue}')
+    else:
+        lines.append(f'T2  - {pub.journal}')
+        if pub.volume:
+            lines.append(f'VL  - {pub.volume}')
+        if pub.issue:
+            lines.append(f'IS  - {pub.issue}')
+        if pub.pages:
+            pages = re.split(r'\s*[-–]+\s*', pub.pages, maxsplit=1)
+            lines.append(f'SP  - {pages[0]}')
+            if len(pages) > 1:
+                lines.append(f'EP  - {pages[1]}')
+
+    lines.append(f'PY  - {pub.date.year}')
+    lines.append(f'DA  - {pub.date.strftime("%Y/%m/%d")}/')
+    if pub.doi:
+        lines.append(f'DO  - {pub.doi}')
+    if pub.url:
+        lines.append(f'UR  - {pub.url}')
+    lines.append('ER  - ')
+
+    return '\n'.join(lines)
+
+
+def csljson(pub, key):
+    """
+    Format a publication as a CSL-JSON item.
+    """
+    authors = []
+    for name in authorNames(pub):
+        given, family = splitName(name)
+        if given:
+            authors.append({'family': family, 'given': given})
+        else:
+            authors.append({'literal': family})
+
+    item = {
+        'id': key,
+        'title': pub.title,
+        'author': authors,
+        'issued': {'date-parts': [[pub.date.year, pub.date.month, pub.date.day]]},
+        'DOI': pub.doi,
+        'URL': pub.url
+    }
+
+    if isPresentation(pub):
+        item.update({'type': 'speech', 'event-title': pub.venue})
+    else:
+        item.update({
+            'type': 'article-journal', 'container-title': pub.journal,
+            'volume': pub.volume, 'issue': pub.issue, 'page': pub.pages
+        })
+
+    return json.dumps({k: v for k, v in item.items() if v}, ensure_ascii=False, indent=2)
+
+
+# Output formats: (format function, header, entry separator, footer)
+FORMATS = {
+    'bibtex': (bibtex, '', '\n\n', '\n'),
+    'ris': (ris, '', '\n\n', '\n'),
+    'csl-json': (csljson, '[\n', ',\n', '\n]\n')
+}
+
+
+class Writer:
+    """
+    Writes publications to a file in one of the output formats, one entry
+    at a time.
+    """
+
+
+    def __init__(self, f, format='bibtex'):
+        """
+        Constructor.
+
+        :param f:      File (or any object with a 'write()' method) to
+                       write the entries to.
+        :param format: Name of the output format (see FORMATS).
+        """
+        if format not in FORMATS:
+            raise Exception(f"Unrecognized output format: '{format}'.")
+
+        self.f = f
+        self.format, self.header, self.separator, self.footer = FORMATS[format]
+        self.keys = CiteKeys()
+        self.nentries = 0
+
+
+    def write(self, pub):
+        """
+        Write the entry of the given publication. Returns its cite key.
+        """
+        key = self.keys.key(pub)
+        entry = self.format(pub, key)
+
+        self.f.write(self.header if self.nentries == 0 else self.separator)
+        self.f.write(entry)
+        self.nentries += 1
+
+        return key
+
+
+    def close(self):
+        """
+        Finish the output. The file itself is not closed.
+        """
+        if self.nentries > 0:
+            self.f.write(self.footer)
+        elif self.header:
+            self.f.write(self.header + self.footer)
+
+
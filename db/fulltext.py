@@ -0,0 +1,175 @@
+# Full-text search
+#
+# The searchable columns of the articles and presentations are mirrored
+# in SQLite FTS5 tables, which are kept in sync with the publication
+# tables by triggers. The FTS5 tables are external-content tables, so the
+# text itself is only stored once (in the publication tables), and the
+# index is only updated when one of the indexed columns changes.
+#
+# Search strings are turned into prefix queries (so that results can be
+# shown as the user types), matching publications which contain all of
+# the words, or words starting with them. Words joined by punctuation
+# (as in a DOI, or 'DIII-D') must appear in sequence.
+#
+# Results are ranked in tiers: publications with all words as whole words
+# in the title, author list or keywords come first, followed by those
+# with all words as whole words in any column, and then by the other
+# matches, with the most recently added publications first within each
+# tier. Each tier is queried only until enough results have been found.
+# BM25 is not used, as it reads the full posting list of every term to
+# weight it, which takes 25-50 ms for common prefixes in a library of
+# 100,000 publications.
+
+import re
+from sqlalchemy import literal_column, select, table, text
+
+
+# Indexed columns of each table
+COLUMNS = {
+    'articles': ['title', 'authors', 'journal', 'keywords', 'doi'],
+    'presentations': ['title', 'authors', 'venue', 'keywords', 'doi']
+}
+
+# Tiers of search results, as (prefix, columns) arguments to
+# 'matchQuery()'
+TIERS = [
+    (False, ['title', 'authors', 'keywords']),
+    (False, None),
+    (True, None)
+]
+
+# Words are indexed without diacritics (so that 'Fulop' finds 'Fülöp'),
+# and prefixes of two to five characters are indexed separately, so that
+# prefix queries of the length typed while searching read one posting
+# list, rather than merging those of all words with the prefix.
+TOKENIZE = 'unicode61 remove_diacritics 2'
+PREFIX = '2 3 4 5'
+
+
+def ftsTable(tablename):
+    """
+    Returns the name of the FTS5 table indexing the given table.
+    """
+    return f'{tablename}_fts'
+
+
+def createIndex(db, tablename):
+    """
+    Create the FTS5 table and the synchronization triggers for the given
+    table (unless they already exist), and (re)build the index from the
+    contents of the table.
+    """
+    fts = ftsTable(tablename)
+    columns = COLUMNS[tablename]
+    cols = ', '.join(columns)
+    new = ', '.join([f'new.{c}' for c in columns])
+    old = ', '.join([f'old.{c}' for c in columns])
+
+    db.exe(text(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+        f"{cols}, content='{tablename}', content_rowid='id', "
+        f"tokenize='{TOKENIZE}', prefix='{PREFIX}')"
+    ))
+
+    db.exe(text(
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {tablename} BEGIN "
+        f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new}); "
+        f"END"
+    ))
+    db.exe(text(
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {tablename} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old}); "
+        f"END"
+    ))
+    db.exe(text(
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE OF {cols} ON {tablename} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old}); "
+        f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new}); "
+        f"END"
+    ))
+
+    db.exe(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+
+
+def dropIndex(db, tablename):
+    """
+    Drop the FTS5 table and the synchronization triggers for the given
+    table.
+    """
+    fts = ftsTable(tablename)
+    for trigger in ['insert', 'delete', 'update']:
+        db.exe(text(f'DROP TRIGGER IF EXISTS {fts}_{trigger}'))
+
+    db.exe(text(f'DROP TABLE IF EXISTS {fts}'))
+
+
+def matchQuery(s, prefix=True, columns=None):
+    """
+    Convert a search string into an FTS5 query, matching all words of the
+    string as prefixes (or as whole words, if 'prefix' is False). Single
+    characters are only matched as whole words, as almost every row
+    contains a word starting with any given character. If 'columns' is
+    given, only the given columns are searched. Returns None if the string
+    contains no words.
+    """
+    terms = []
+    for part in s.split():
+        words = re.findall(r'\w+', part)
+        if not words:
+            continue
+
+        if prefix and (len(words) > 1 or len(words[0]) > 1):
+            terms.append(f'"{" ".join(words)}"*')
+        else:
+            terms.append(f'"{" ".join(words)}"')
+
+    if not terms:
+        return None
+
+    q = ' AND '.join(terms)
+    if columns is not None:
+        q = f'{{{" ".join(columns)}}} : ({q})'
+
+    return q
+
+
+def matching(tablename, s, prefix=True, columns=None):
+    """
+    Returns a statement selecting the IDs of the rows of the given table
+    which match the given search string.
+    """
+    fts = ftsTable(tablename)
+    q = matchQuery(s, prefix=prefix, columns=columns)
+
+    stmt = select(literal_column('rowid').label('id')).select_from(table(fts))
+    if q is None:
+        # Nothing matches a string without words
+        return stmt.where(literal_column('0') == 1)
+    else:
+        return stmt.where(literal_column(fts).op('MATCH')(q))
+
+
+def search(db, tablename, s, limit=None):
+    """
+    Returns the IDs of the rows of the given table which match the given
+    search string, best match first.
+    """
+    ids = []
+    found = set()
+    for prefix, columns in TIERS:
+        stmt = matching(tablename, s, prefix=prefix, columns=columns).order_by(literal_column('rowid').desc())
+
+        # The tiers are nested, so the first 'limit' rows of each tier
+        # are enough to find the first 'limit' rows overall
+        if limit is not None:
+            stmt = stmt.limit(limit)
+
+        for id in db.exe(stmt).scalars():
+            if id not in found:
+                found.add(id)
+                ids.append(id)
+
+        if limit is not None and len(ids) >= limit:
+            return ids[:limit]
+
+    return ids
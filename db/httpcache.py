@@ -0,0 +1,249 @@
+# Persistent HTTP response cache
+#
+# Responses from doi.org and arXiv are stored in a local SQLite database,
+# keyed by the normalized DOI/arXiv id. Entries younger than the TTL are
+# served without contacting the server; older entries are revalidated
+# using the ETag/Last-Modified headers of the cached response. When the
+# total size of the cached responses exceeds the size cap, the least
+# recently used entries are evicted. In offline mode, responses are only
+# served from the cache. Recently used responses are also kept in memory,
+# so that repeated lookups do not need to access the cache database.
+
+from collections import OrderedDict
+import os
+from pathlib import Path
+import sqlite3
+import threading
+import time
+
+import requests
+
+
+class HTTPCache:
+
+
+    def __init__(self, filename=None, ttl=30*24*3600, maxsize=64*1024*1024, offline=False, memsize=256):
+        """
+        Constructor.
+
+        :param filename: Name of the cache database (see 'defaultFilename()').
+        :param ttl:      Time (in seconds) for which cached responses are
+                         served without revalidation.
+        :param maxsize:  Maximum total size (in bytes) of the cached
+                         responses.
+        :param offline:  If True, responses are only served from the cache.
+        :param memsize:  Number of recently used responses to keep in memory.
+        """
+        if filename is None:
+            filename = HTTPCache.defaultFilename()
+
+        Path(filename).parent.mkdir(parents=True, exist_ok=True)
+
+        self.filename = filename
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.offline = offline
+        self.memsize = memsize
+        self.memory = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+
+        # The cache may be used by several fetching threads at once
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(filename, check_same_thread=False, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode = WAL')
+        self.conn.execute('PRAGMA synchronous = NORMAL')
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                url TEXT,
+                body BLOB,
+                etag TEXT,
+                lastmodified TEXT,
+                fetched REAL,
+                accessed REAL,
+                size INTEGER
+            )
+        """)
+        self.conn.execute('CREATE INDEX IF NOT EXISTS ix_responses_accessed ON responses (accessed)')
+
+
+    @staticmethod
+    def defaultFilename():
+        """
+        Returns the name of the default cache database, in the user's
+        cache directory.
+        """
+        cachedir = os.environ.get('XDG_CACHE_HOME', str(Path.home() / '.cache'))
+        return str(Path(cachedir) / 'publicationmanager' / 'http.db')
+
+
+    def close(self):
+        """
+        Close the cache database.
+        """
+        with self.lock:
+            self.conn.close()
+
+
+    def clear(self):
+        """
+        Remove all cached responses.
+        """
+        with self.lock:
+            self.memory.clear()
+            self.conn.execute('DELETE FROM responses')
+
+
+    def lookup(self, key):
+        """
+        Returns the cached response with the given key as a tuple
+        (body, etag, lastmodified, fetched), or None.
+        """
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                return self.memory[key]
+
+            row = self.conn.execute('SELECT body, etag, lastmodified, fetched FROM responses WHERE key=?', (key,)).fetchone()
+            if row is not None:
+                self.conn.execute('UPDATE responses SET accessed=? WHERE key=?', (time.time(), key))
+                self.remember(key, row)
+
+        return row
+
+
+    def remember(self, key, row):
+        """
+        Keep the given response in memory. Must be called with the lock held.
+        """
+        self.memory[key] = row
+        self.memory.move_to_end(key)
+        if len(self.memory) > self.memsize:
+            self.memory.popitem(last=False)
+
+
+    def store(self, key, url, body, etag=None, lastmodified=None):
+        """
+        Store a response in the cache, evicting the least recently used
+        responses if the size cap is exceeded.
+        """
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO responses (key, url, body, etag, lastmodified, fetched, accessed, size) VALUES (?,?,?,?,?,?,?,?)',
+                (key, url, body, etag, lastmodified, now, now, len(body))
+            )
+            self.remember(key, (body, etag, lastmodified, now))
+            self.evict()
+
+
+    def touch(self, key):
+        """
+        Mark the cached response with the given key as fresh.
+        """
+        now = time.time()
+        with self.lock:
+            self.conn.execute('UPDATE responses SET fetched=? WHERE key=?', (now, key))
+            if key in self.memory:
+                self.remember(key, self.memory[key][:3] + (now,))
+
+
+    def evict(self):
+        """
+        Evict the least recently used responses until the total size of
+        the cache is below the size cap. Must be called with the lock held.
+        """
+        total = self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        if total <= self.maxsize:
+            return
+
+        for key, size in self.conn.execute('SELECT key, size FROM responses ORDER BY accessed').fetchall():
+            self.conn.execute('DELETE FROM responses WHERE key=?', (key,))
+            self.memory.pop(key, None)
+            total -= size
+
+            if total <= self.maxsize:
+                break
+
+
+    def stats(self):
+        """
+        Returns the hit, miss and revalidation counts, as well as the
+        number and total size of the cached responses.
+        """
+        with self.lock:
+            n, size = self.conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses').fetchone()
+
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'revalidated': self.revalidated,
+            'entries': n,
+            'size': size
+        }
+
+
+    def peek(self, key):
+        """
+        Returns the cached response with the given key if it can be used
+        without contacting the server (i.e. if it is younger than the TTL,
+        or in offline mode), and None otherwise.
+        """
+        cached = self.lookup(key)
+
+        if cached is not None and (self.offline or time.time() - cached[3] < self.ttl):
+            self.hits += 1
+            return cached[0]
+        else:
+            return None
+
+
+    def get(self, key, url, headers=None, timeout=None, session=None, error='Error when fetching'):
+        """
+        Fetch the given URL, using the cached response with the given key
+        if possible. Returns the response body as a string. Raises an
+        exception if the request fails (and no cached response can be
+        used instead).
+        """
+        cached = self.lookup(key)
+
+        if cached is not None:
+            body, etag, lastmodified, fetched = cached
+            if self.offline or time.time() - fetched < self.ttl:
+                self.hits += 1
+                return body
+        elif self.offline:
+            raise Exception(f"{error}: '{key}' is not available offline.")
+
+        # Revalidate stale responses
+        headers = dict(headers or {})
+        if cached is not None:
+            if etag:
+                headers['If-None-Match'] = etag
+            if lastmodified:
+                headers['If-Modified-Since'] = lastmodified
+
+        try:
+            r = (session or requests).get(url, headers=headers, timeout=timeout)
+        except requests.exceptions.RequestException:
+            # Serve stale responses when the server can not be reached
+            if cached is not None:
+                self.hits += 1
+                return cached[0]
+            raise
+
+        if r.status_code == 304 and cached is not None:
+            self.revalidated += 1
+            self.touch(key)
+            return cached[0]
+        elif r.status_code == 200:
+            self.misses += 1
+            self.store(key, url, r.text, r.headers.get('ETag'), r.headers.get('Last-Modified'))
+            return r.text
+        else:
+            raise Exception(f"{error}. The server returned HTTP status code '{r.status_code}: {r.reason}'.")
+
+
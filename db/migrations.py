@@ -0,0 +1,205 @@
+# Database schema migrations
+#
+# The schema version of a database is stored in 'PRAGMA user_version'.
+# When a database is opened, all migrations with a version number greater
+# than that of the database are applied in order, each in its own
+# transaction. Version 1 creates all tables which do not yet exist with
+# the current schema, so later migrations must be written so that they
+# can be applied both to such freshly created tables and to tables
+# created by earlier versions of the publication manager (for example
+# by only adding columns and indexes which do not already exist).
+#
+# To change the schema, update the model class and append a migration
+# to MIGRATIONS which brings existing databases up to date.
+
+from contextlib import contextmanager
+from sqlalchemy import inspect, text
+
+from . base import Base
+from . import config
+from . import fulltext
+
+# All model classes are imported, so that 'v1_createTables()' creates
+# their tables
+from . Article import Article
+from . Author import Author
+from . Authorship import Authorship
+from . Presentation import Presentation
+from . ReferenceFormat import ReferenceFormat
+from . Setting import Setting
+
+
+def addColumn(db, table, column):
+    """
+    Add the given column to the given table, unless it already exists.
+    SQLite can add columns in place, without rebuilding the table.
+    """
+    conn = db.session.connection()
+    columns = [c['name'] for c in inspect(conn).get_columns(table.name)]
+
+    if column.name not in columns:
+        coltype = column.type.compile(dialect=conn.dialect)
+        conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {coltype}'))
+
+
+def createIndexes(db, table, names):
+    """
+    Create the named indexes declared for the given table, unless they
+    already exist.
+    """
+    conn = db.session.connection()
+    for index in table.indexes:
+        if index.name in names:
+            index.create(conn, checkfirst=True)
+
+
+def v1_createTables(db):
+    """
+    Create all tables which do not exist.
+    """
+    Base.metadata.create_all(db.session.connection())
+
+
+def v2_authorship(db):
+    """
+    Generate authorship records from the author lists of all articles.
+    """
+    Authorship.rebuild()
+
+
+def v3_authorPosition(db):
+    """
+    Add the position of the user in the author list of each article.
+    """
+    addColumn(db, Article.__table__, Article.__table__.c.authorpos)
+    createIndexes(db, Article.__table__, ['ix_articles_authorpos'])
+
+    Article.updateAuthorPositions()
+
+
+def v4_indexes(db):
+    """
+    Add a stored 'year' column to articles and presentations, as well as
+    indexes for the columns commonly used in queries.
+    """
+    for cls in [Article, Presentation]:
+        addColumn(db, cls.__table__, cls.__table__.c.year)
+        db.exe(text(f"UPDATE {cls.__tablename__} SET year = CAST(strftime('%Y', date) AS INTEGER)"))
+
+    createIndexes(db, Article.__table__, [
+        'ix_articles_status', 'ix_articles_date', 'ix_articles_doi',
+        'ix_articles_status_year'
+    ])
+    createIndexes(db, Presentation.__table__, [
+        'ix_presentations_type', 'ix_presentations_date', 'ix_presentations_doi',
+        'ix_presentations_type_year'
+    ])
+    createIndexes(db, ReferenceFormat.__table__, ['ix_referenceformats_name'])
+    createIndexes(db, Setting.__table__, ['ix_settings_name'])
+
+
+def v5_fulltext(db):
+    """
+    Add full-text indexes of the articles and presentations.
+    """
+    fulltext.createIndex(db, Article.__tablename__)
+    fulltext.createIndex(db, Presentation.__tablename__)
+
+
+def v6_authorCount(db):
+    """
+    Add the number of authors of each article.
+    """
+    addColumn(db, Article.__table__, Article.__table__.c.nauthors)
+    Article.updateAuthorCounts()
+
+
+def v7_referenceFormatKind(db):
+    """
+    Add the kind of each reference format (code or template).
+    """
+    addColumn(db, ReferenceFormat.__table__, ReferenceFormat.__table__.c.kind)
+    db.exe(text(f'UPDATE referenceformats SET kind = {ReferenceFormat.KIND_CODE} WHERE kind IS NULL'))
+
+
+def v8_fulltextPrefixes(db):
+    """
+    Rebuild the full-text indexes with longer indexed prefixes.
+    """
+    for tablename in [Article.__tablename__, Presentation.__tablename__]:
+        fulltext.dropIndex(db, tablename)
+        fulltext.createIndex(db, tablename)
+
+
+MIGRATIONS = [
+    (1, v1_createTables),
+    (2, v2_authorship),
+    (3, v3_authorPosition),
+    (4, v4_indexes),
+    (5, v5_fulltext),
+    (6, v6_authorCount),
+    (7, v7_referenceFormatKind),
+    (8, v8_fulltextPrefixes),
+]
+
+
+def getVersion(db):
+    """
+    Returns the schema version of the given database.
+    """
+    return db.exe(text('PRAGMA user_version')).scalar()
+
+
+@contextmanager
+def activeDatabase(db):
+    """
+    Temporarily make the given database the active database, so that the
+    model classes can be used during a migration.
+    """
+    prev = config.database()
+    config.init(db)
+    try:
+        yield db
+    finally:
+        config.init(prev)
+
+
+def check(db):
+    """
+    Verify that the given database has the latest schema version,
+    without modifying it.
+    """
+    version = getVersion(db)
+    latest = MIGRATIONS[-1][0]
+
+    if version != latest:
+        raise Exception(f"The database has schema version {version}, but version {latest} is required. Open the database for writing once to upgrade it.")
+
+
+def upgrade(db):
+    """
+    Apply all pending migrations to the given database.
+    """
+    version = getVersion(db)
+    latest = MIGRATIONS[-1][0]
+
+    if version > latest:
+        raise Exception(f"The database has schema version {version}, but this version of the publication manager only supports versions up to {latest}.")
+
+    with activeDatabase(db):
+        for v, migrate in MIGRATIONS:
+            if v <= version:
+                continue
+
+            try:
+                migrate(db)
+                db.exe(text(f'PRAGMA user_version = {v}'))
+                db.flush()
+            except Exception:
+                db.rollback(db.session)
+                raise
+            finally:
+                # Migrations may modify tables using raw SQL
+                db.cache.clear()
+
+
@@ -0,0 +1,312 @@
+# SQL query profiler
+#
+# Opt-in instrumentation of all statements executed on the database
+# engine, including the lazy loads of the ORM which bypass
+# 'Database.exe()'. Every statement is timed and attributed to the call
+# site in the publication manager which issued it, and the statements are
+# aggregated per user action (tree reload, dialog, export, ...), so that
+# actions issuing many (or repeated) statements stand out. Statements
+# slower than a threshold are written to a slow-query log, together with
+# their 'EXPLAIN QUERY PLAN' output.
+
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+import sys
+import threading
+import time
+
+from sqlalchemy import event
+
+from . import config
+
+
+# Repository root, and the modules which are skipped when looking for the
+# call site of a statement
+ROOT = str(Path(config.rootpath()).parent)
+SKIP = [str(Path(config.rootpath()) / f) for f in ('Database.py', 'cache.py', 'profiler.py')]
+
+
+class QueryProfiler:
+
+
+    # Number of user actions for which profiles are kept
+    MAXACTIONS = 50
+
+    # Number of frames of the call site reported
+    NFRAMES = 3
+
+    # Number of times a statement must be repeated from the same call
+    # site within an action to be flagged as a likely N+1 pattern
+    REPEATED = 10
+
+
+    def __init__(self, engine, slowlog=None, threshold=0.05):
+        """
+        Constructor.
+
+        :param engine:    SQLAlchemy engine to instrument.
+        :param slowlog:   Name of the slow-query log file (or None).
+        :param threshold: Time (in seconds) above which statements are
+                          written to the slow-query log.
+        """
+        self.engine = engine
+        self.slowlog = slowlog
+        self.threshold = threshold
+        self.enabled = False
+
+        self.actions = deque(maxlen=self.MAXACTIONS)
+        self.current = None
+        self.unattributed = self._newAction('(outside of user actions)')
+        self.nslow = 0
+
+        # Statements may be executed by worker threads
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+
+    def enable(self, slowlog=None, threshold=None):
+        """
+        Start profiling statements.
+        """
+        if slowlog is not None:
+            self.slowlog = slowlog
+        if threshold is not None:
+            self.threshold = threshold
+
+        if not self.enabled:
+            event.listen(self.engine, 'before_cursor_execute', self._before)
+            event.listen(self.engine, 'after_cursor_execute', self._after)
+            self.enabled = True
+
+
+    def disable(self):
+        """
+        Stop profiling statements.
+        """
+        if self.enabled:
+            event.remove(self.engine, 'before_cursor_execute', self._before)
+            event.remove(self.engine, 'after_cursor_execute', self._after)
+            self.enabled = False
+
+
+    def reset(self):
+        """
+        Discard all recorded profiles.
+        """
+        with self.lock:
+            self.actions.clear()
+            self.unattributed = self._newAction('(outside of user actions)')
+            self.nslow = 0
+
+
+    def _newAction(self, name):
+        return {
+            'name': name,
+            'started': datetime.now(),
+            'elapsed': None,
+            'nstatements': 0,
+            'time': 0,
+            'statements': {}
+        }
+
+
+    @contextmanager
+    def action(self, name):
+        """
+        Attribute all statements executed within the 'with' block (by any
+        thread) to the named user action. Actions started within another
+        action are part of the outer action.
+        """
+        if not self.enabled or self.current is not None:
+            yield
+            return
+
+        action = self._newAction(name)
+        with self.lock:
+            self.current = action
+            self.actions.append(action)
+
+        tic = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self.lock:
+                action['elapsed'] = time.perf_counter() - tic
+                self.current = None
+
+
+    def callSite(self):
+        """
+        Returns the innermost frames of the current call stack which are
+        part of the publication manager.
+        """
+        frames = []
+        frame = sys._getframe(1)
+        while frame is not None and len(frames) < self.NFRAMES:
+            filename = frame.f_code.co_filename
+            if filename.startswith(ROOT) and filename not in SKIP and 'site-packages' not in filename:
+                frames.append(f'{filename[len(ROOT)+1:]}:{frame.f_lineno} ({frame.f_code.co_name})')
+
+            frame = frame.f_back
+
+        return ' < '.join(frames)
+
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('profiler_start', []).append(time.perf_counter())
+
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['profiler_start'].pop()
+        site = self.callSite()
+
+        with self.lock:
+            action = self.current if self.current is not None else self.unattributed
+            key = (statement, site)
+            if key not in action['statements']:
+                action['statements'][key] = {'sql': statement, 'site': site, 'n': 0, 'time': 0, 'max': 0, 'rows': None}
+
+            entry = action['statements'][key]
+            entry['n'] += 1
+            entry['time'] += elapsed
+            entry['max'] = max(entry['max'], elapsed)
+            if cursor.rowcount >= 0:
+                entry['rows'] = (entry['rows'] or 0) + cursor.rowcount
+
+            action['nstatements'] += 1
+            action['time'] += elapsed
+
+        stmt = {
+            'action': action, 'entry': entry, 'elapsed': elapsed,
+            'statement': statement, 'parameters': parameters[0] if executemany else parameters,
+            'connection': cursor.connection, 'logged': False
+        }
+        self.local.last = stmt
+
+        if elapsed > self.threshold:
+            self.logSlow(stmt)
+
+
+    def fetch(self, result):
+        """
+        Fetch all rows of the given result, recording the number of rows
+        and the time spent fetching them for the statement which produced
+        it. (SQLite does most of the work of a query while the rows are
+        being fetched.) Returns an equivalent result.
+        """
+        tic = time.perf_counter()
+        frozen = result.freeze()
+        elapsed = time.perf_counter() - tic
+
+        stmt = getattr(self.local, 'last', None)
+        self.local.last = None
+        if stmt is not None:
+            with self.lock:
+                stmt['entry']['rows'] = (stmt['entry']['rows'] or 0) + len(frozen.data)
+                stmt['entry']['time'] += elapsed
+                stmt['entry']['max'] = max(stmt['entry']['max'], stmt['elapsed'] + elapsed)
+                stmt['action']['time'] += elapsed
+
+            stmt['elapsed'] += elapsed
+            stmt['rows'] = len(frozen.data)
+            if not stmt['logged'] and stmt['elapsed'] > self.threshold:
+                self.logSlow(stmt)
+
+        return frozen()
+
+
+    def explain(self, connection, statement, parameters):
+        """
+        Returns the query plan of the given statement, as formatted by the
+        SQLite command line shell.
+        """
+        if not statement.lstrip().upper().startswith(('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE')):
+            return '(no query plan)'
+
+        try:
+            rows = connection.execute(f'EXPLAIN QUERY PLAN {statement}', parameters).fetchall()
+        except Exception as ex:
+            return f'(EXPLAIN QUERY PLAN failed: {ex})'
+
+        depth = {0: 0}
+        lines = ['QUERY PLAN']
+        for id, parent, _, detail in rows:
+            depth[id] = depth.get(parent, 0) + 1
+            lines.append('   '*(depth[id]-1) + '|--' + detail)
+
+        return '\n'.join(lines)
+
+
+    def logSlow(self, stmt):
+        """
+        Write a slow statement to the slow-query log.
+        """
+        stmt['logged'] = True
+        with self.lock:
+            self.nslow += 1
+
+        if self.slowlog is None:
+            return
+
+        rows = f", {stmt['rows']} rows" if 'rows' in stmt else ''
+        plan = self.explain(stmt['connection'], stmt['statement'], stmt['parameters'])
+
+        text  = f"-- {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}  {stmt['action']['name']}  {stmt['elapsed']*1e3:.1f} ms{rows}\n"
+        text += f"-- {stmt['entry']['site']}\n"
+        text += f"{stmt['statement'].strip()}\n"
+        text += f"-- parameters: {stmt['parameters']}\n"
+        text += f"{plan}\n\n"
+
+        with self.lock:
+            with open(self.slowlog, 'a') as f:
+                f.write(text)
+
+
+    def summary(self, nstatements=10):
+        """
+        Returns a text summary of the recorded profiles, listing the
+        most expensive statements of each user action.
+        """
+        with self.lock:
+            actions = list(self.actions)
+            if self.unattributed['nstatements'] > 0:
+                actions.append(self.unattributed)
+
+            s = f"SQL query profile ({'enabled' if self.enabled else 'disabled'})\n"
+            if self.slowlog is not None:
+                s += f"{self.nslow} statements slower than {self.threshold*1e3:.0f} ms, logged to '{self.slowlog}'.\n"
+            else:
+                s += f"{self.nslow} statements slower than {self.threshold*1e3:.0f} ms.\n"
+
+            if not actions:
+                return s + '\nNo statements recorded.\n'
+
+            for action in actions:
+                if action is self.unattributed:
+                    s += f"\n{action['name']}: "
+                elif action['elapsed'] is None:
+                    s += f"\n{action['started'].strftime('%H:%M:%S')}  {action['name']}: running, "
+                else:
+                    s += f"\n{action['started'].strftime('%H:%M:%S')}  {action['name']}: {action['elapsed']*1e3:.1f} ms, "
+
+                s += f"{action['nstatements']} statements, {action['time']*1e3:.1f} ms in SQL\n"
+
+                entries = sorted(action['statements'].values(), key=lambda e : e['time'], reverse=True)
+                for e in entries[:nstatements]:
+                    rows = f"{e['rows']}" if e['rows'] is not None else '-'
+                    flag = '  (repeated, N+1?)' if e['n'] >= self.REPEATED else ''
+                    sql = ' '.join(e['sql'].split())
+                    if len(sql) > 100:
+                        sql = sql[:97] + '...'
+
+                    s += f"  {e['n']:5d}x {e['time']*1e3:9.1f} ms (max {e['max']*1e3:.1f} ms) {rows:>7s} rows  {e['site']}{flag}\n"
+                    s += f"         {sql}\n"
+
+                if len(entries) > nstatements:
+                    s += f"  ... and {len(entries)-nstatements} more distinct statements\n"
+
+        return s
+
+
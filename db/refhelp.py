@@ -1,44 +1,431 @@
 
-import feedparser
+from datetime import datetime
+import json
+import os
+import re
 import requests
+import time
 
 
-def fromArXiv(arxiv_id):
+# Base URLs of the DOI resolver and the arXiv API. These can be changed
+# with 'setBaseURLs()' or the environment variables below, for example
+# to run against a local stand-in server (see 'benchmarks/standin.py').
+DOI_URL = os.environ.get('PUBLICATIONMANAGER_DOI_URL', 'https://doi.org')
+ARXIV_URL = os.environ.get('PUBLICATIONMANAGER_ARXIV_URL', 'https://export.arxiv.org/api/query')
+
+# Default timeout (in seconds) for requests to external services
+TIMEOUT = 10
+
+# Persistent response cache (see 'setCache()')
+CACHE = None
+
+# Maximum number of ids per arXiv API query, and the delay (in seconds)
+# between consecutive queries requested by arXiv
+ARXIV_BATCH_SIZE = 100
+ARXIV_DELAY = 3
+
+
+def setBaseURLs(doi=None, arxiv=None):
     """
-    Fetch article details from its arXiv ID (or URL).
+    Set the base URLs of the DOI resolver and/or the arXiv API.
     """
-    if 'arxiv.org' in arxiv_id:
-        idx = arxiv_id.rfind('/')+1
-        arxiv_id = arxiv_id[idx:]
+    global DOI_URL, ARXIV_URL
+
+    if doi is not None:
+        DOI_URL = doi.rstrip('/')
+    if arxiv is not None:
+        ARXIV_URL = arxiv
+
+
+def setCache(cache):
+    """
+    Set the 'httpcache.HTTPCache' used for all requests (or None to
+    disable caching).
+    """
+    global CACHE
+    CACHE = cache
+
+
+def get(key, url, headers=None, timeout=TIMEOUT, session=None, error='Error when fetching'):
+    """
+    Fetch the given URL, through the response cache if enabled. The
+    response is cached with the given key. Returns the response body.
+    """
+    if CACHE is not None:
+        return CACHE.get(key, url, headers=headers, timeout=timeout, session=session, error=error)
 
-    r = requests.get(f'https://export.arxiv.org/api/query?id_list={arxiv_id}')
+    r = (session or requests).get(url, headers=headers, timeout=timeout)
 
     if r.status_code == 200:
-        feed = feedparser.parse(r.text)
-        return feed.entries[0]
+        return r.text
     else:
-        raise Exception(f"Error when fetching arXiv. The server returned HTTP status code '{r.status_code}: {r.reason}'.")
+        raise Exception(f"{error}. The server returned HTTP status code '{r.status_code}: {r.reason}'.")
+
+
+def createSession(maxconnections=10):
+    """
+    Create an HTTP session, which keeps connections to the servers alive
+    between requests. Up to 'maxconnections' connections are kept open
+    per server, so the session can be shared by that many threads.
+    """
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=maxconnections, pool_maxsize=maxconnections)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+
+    return session
 
 
-def fromDOI(doi):
+def normalizeArXiv(arxiv_id):
     """
-    Fetch article details from its DOI number (or URL).
+    Normalize an arXiv ID (or URL).
     """
-    if doi[8:] == 'https://':
-        idx = doi[8:].find('/')+8+1
-        doi = doi[idx:]
+    arxiv_id = arxiv_id.strip()
+
+    # Old-style ids contain a '/' (e.g. 'hep-th/9901001')
+    m = re.search(r'arxiv\.org/(?:abs|pdf)/(.+?)(?:\.pdf)?$', arxiv_id)
+    if m:
+        arxiv_id = m.group(1)
+    elif 'arxiv.org' in arxiv_id:
+        idx = arxiv_id.rfind('/')+1
+        arxiv_id = arxiv_id[idx:]
+
+    return re.sub(r'^arxiv:', '', arxiv_id, flags=re.IGNORECASE)
+
+
+def splitArXivVersion(arxiv_id):
+    """
+    Split an arXiv ID into the ID without version and the version (or
+    None, if the ID is not versioned).
+    """
+    m = re.match(r'(.+?)(v[0-9]+)?$', arxiv_id)
+    return m.group(1), m.group(2)
+
 
-    r = requests.get(
-        f'https://doi.org/{doi}',
+def normalizeDOI(doi):
+    """
+    Normalize a DOI number (or URL).
+    """
+    doi = doi.strip()
+    doi = re.sub(r'^(https?://)?(dx\.)?doi\.org/', '', doi, flags=re.IGNORECASE)
+    return re.sub(r'^doi:\s*', '', doi, flags=re.IGNORECASE)
+
+
+def normalizeId(s):
+    """
+    Normalize a DOI or arXiv id (or URL). Returns the DOI (for DOIs) or
+    the arXiv id prefixed with 'arXiv:' (for arXiv ids).
+    """
+    s = s.strip()
+
+    m = re.match(r'(?:https?://)?(?:dx\.)?doi\.org/(.+)$', s, re.IGNORECASE)
+    if m:
+        return m.group(1)
+
+    m = re.match(r'doi:\s*(.+)$', s, re.IGNORECASE)
+    if m:
+        return m.group(1)
+
+    if s.startswith('10.'):
+        return s
+
+    m = re.match(r'(?:https?://)?(?:export\.)?arxiv\.org/(?:abs|pdf)/(.+?)(?:\.pdf)?$', s, re.IGNORECASE)
+    if m:
+        return f'arXiv:{m.group(1)}'
+
+    m = re.match(r'arxiv:\s*(.+)$', s, re.IGNORECASE)
+    if m:
+        return f'arXiv:{m.group(1)}'
+
+    return f'arXiv:{s}'
+
+
+def parseIds(text):
+    """
+    Parse a list of DOIs and arXiv ids, separated by whitespace, commas
+    or semicolons. Everything following a '#' on a line is ignored.
+    Returns the normalized ids, without duplicates. DOIs are case
+    insensitive, so of DOIs differing only in case, the first spelling
+    is kept.
+    """
+    ids = {}
+    for line in text.splitlines():
+        line = line.split('#')[0]
+        for s in re.split(r'[\s,;]+', line):
+            if s:
+                id = normalizeId(s)
+                ids.setdefault(id if isArXiv(id) else id.lower(), id)
+
+    return list(ids.values())
+
+
+def isArXiv(id):
+    """
+    Check whether the given normalized id is an arXiv id.
+    """
+    return id.startswith('arXiv:')
+
+
+def parseFeed(text):
+    """
+    Parse an arXiv API response. The feed parser is only imported when
+    needed, as it takes a while to import.
+    """
+    import feedparser
+    return feedparser.parse(text)
+
+
+def fromArXiv(arxiv_id, timeout=TIMEOUT, session=None):
+    """
+    Fetch article details from its arXiv ID (or URL). Raises an exception
+    if the server does not respond within 'timeout' seconds. If given, the
+    request is made using the HTTP session 'session'.
+    """
+    arxiv_id = normalizeArXiv(arxiv_id)
+
+    text = get(
+        f'arxiv:{arxiv_id}',
+        f'{ARXIV_URL}?id_list={arxiv_id}',
+        timeout=timeout, session=session, error='Error when fetching arXiv'
+    )
+
+    feed = parseFeed(text)
+    return feed.entries[0]
+
+
+def splitFeed(text):
+    """
+    Split an arXiv API response into one response per entry, so that the
+    entries of a batched query can be cached as the responses to queries
+    for the individual IDs.
+    """
+    m = re.search(r'<entry[ >]', text)
+    if not m:
+        return []
+
+    header = text[:m.start()]
+    return [f'{header}{e}\n</feed>\n' for e in re.findall(r'<entry[ >].*?</entry>', text, re.DOTALL)]
+
+
+def fromArXivMany(arxiv_ids, timeout=TIMEOUT, session=None, batchsize=ARXIV_BATCH_SIZE):
+    """
+    Fetch the details of several articles from their arXiv IDs (or URLs).
+    The IDs are queried in batches of at most 'batchsize' IDs per request,
+    and the feed entries are generated as tuples '(arxiv_id, entry)', in
+    the order of 'arxiv_ids'. The entry is None for IDs which arXiv did
+    not return. Versioned IDs are mapped to the requested version, and
+    unversioned IDs to the latest version.
+
+    Entries which are available in the response cache are taken from the
+    cache, and the entries returned by the batched queries are stored in
+    the cache under the IDs they were requested with.
+    """
+    ids = [normalizeArXiv(i) for i in arxiv_ids]
+
+    # Entries by requested ID
+    entries = {}
+    if CACHE is not None:
+        for i in dict.fromkeys(ids):
+            text = CACHE.peek(f'arxiv:{i}')
+            if text is not None:
+                feed = parseFeed(text)
+                entries[i] = feed.entries[0] if feed.entries else None
+
+    missing = list(dict.fromkeys([i for i in ids if i not in entries]))
+    if missing and CACHE is not None and CACHE.offline:
+        raise Exception(f"Error when fetching arXiv: '{missing[0]}' is not available offline.")
+
+    # Generate the entries as soon as they are available
+    n = 0
+    def available():
+        nonlocal n
+        while n < len(ids) and ids[n] in entries:
+            yield ids[n], entries[ids[n]]
+            n += 1
+
+    yield from available()
+
+    for c in range(0, len(missing), batchsize):
+        if c > 0:
+            time.sleep(ARXIV_DELAY)
+
+        chunk = missing[c:c+batchsize]
+        r = (session or requests).get(
+            ARXIV_URL,
+            params={'id_list': ','.join(chunk), 'max_results': len(chunk)},
+            timeout=timeout
+        )
+
+        if r.status_code != 200:
+            raise Exception(f"Error when fetching arXiv. The server returned HTTP status code '{r.status_code}: {r.reason}'.")
+
+        feed = parseFeed(r.text)
+        texts = splitFeed(r.text)
+        if len(texts) != len(feed.entries):
+            texts = [None] * len(feed.entries)
+
+        # Returned entries (and their responses) by versioned ID. When both
+        # versioned and unversioned IDs of an article are requested, the
+        # response contains several versions, and the unversioned ID is
+        # mapped to the latest of them.
+        versions = {}
+        latest = {}
+        for entry, text in zip(feed.entries, texts):
+            m = re.search(r'arxiv\.org/abs/(.+)$', entry.get('id', ''))
+            if not m:
+                continue
+
+            versions[m.group(1)] = (entry, text)
+
+            base, v = splitArXivVersion(m.group(1))
+            if v is not None and int(v[1:]) > latest.get(base, (0, None))[0]:
+                latest[base] = (int(v[1:]), m.group(1))
+
+        for i in chunk:
+            base, v = splitArXivVersion(i)
+            returned = i if v is not None else latest.get(base, (0, None))[1]
+            entry, text = versions.get(returned, (None, None))
+            entries[i] = entry
+
+            if CACHE is not None and text is not None:
+                CACHE.store(f'arxiv:{i}', f'{ARXIV_URL}?id_list={i}', text)
+
+        yield from available()
+
+
+def fromDOI(doi, timeout=TIMEOUT, session=None):
+    """
+    Fetch article details from its DOI number (or URL). Raises an exception
+    if the server does not respond within 'timeout' seconds. If given, the
+    request is made using the HTTP session 'session'.
+    """
+    doi = normalizeDOI(doi)
+
+    # DOIs are case-insensitive
+    text = get(
+        f'doi:{doi.lower()}',
+        f'{DOI_URL}/{doi}',
         headers={
             'Accept': 'application/vnd.citationstyles.csl+json',
             'q': '1.0'
-        }
+        },
+        timeout=timeout, session=session, error='Error when fetching DOI'
     )
 
-    if r.status_code == 200:
-        return r.json()
+    return json.loads(text)
+
+
+def parseDate(js, keys=('published-print', 'published-online', 'created')):
+    """
+    Returns the first of the given dates in a DOI JSON object, or the
+    current date if none of them is given.
+    """
+    dt = None
+    for key in keys:
+        if key in js:
+            dt = js[key]['date-parts'][0]
+            break
+
+    if not dt:
+        return datetime.now()
+
+    dt = [f'{x:02d}' for x in dt]
+    ds = '-'.join(dt)
+    if re.match(r'[0-9]{4}-[0-9]{2}-[0-9]{2}$', ds):
+        return datetime.fromisoformat(ds)
+    elif re.match(r'[0-9]{4}-[0-9]{2}$', ds):
+        return datetime.fromisoformat(ds + '-01')
+    elif re.match(r'[0-9]{4}$', ds):
+        return datetime(int(ds), 1, 1)
     else:
-        raise Exception(f"Error when fetching DOI. The server returned HTTP status code '{r.status_code}: {r.reason}'.")
+        raise Exception(f"Unrecognized date format: '{ds}'.")
+
+
+def parseAuthors(js):
+    """
+    Returns the author list of a DOI JSON object, with given names
+    abbreviated to initials.
+    """
+    authors = []
+    for author in js.get('author', []):
+        if 'given' in author:
+            given = author['given'].split(' ')
+            gvn = ''
+            for g in given:
+                gvn += g[0] + '. '
+            gvn = gvn.strip()
+
+            authors.append(gvn + ' ' + author['family'])
+        # "Teams" do not have given names
+        elif 'name' in author:
+            authors.append(author['name'])
+        else:
+            # Sometimes ORCIDs are given as separate authors
+            pass
+
+    return ', '.join(authors)
+
+
+def parseDOI(js):
+    """
+    Extract the article details from a DOI JSON object (as returned by
+    'fromDOI()'). Returns a dict with the values of the article fields,
+    and the key 'published', which is True if the article has appeared
+    in print.
+    """
+    def ret(key, d=''):
+        if key in js:
+            return js[key]
+        else:
+            return d
+
+    doi = ret('DOI')
+    if 'page' in js:
+        pages = ret('page')
+    elif 'article-number' in js:
+        pages = ret('article-number')
+    else:
+        pages = None
+
+    return {
+        'doi': doi,
+        'title': ret('title'),
+        'url': f'https://doi.org/{doi}',
+        'journal': ret('container-title'),
+        'issue': ret('issue'),
+        'volume': ret('volume'),
+        'pages': pages,
+        'date': parseDate(js),
+        'authors': parseAuthors(js),
+        'published': 'published-print' in js
+    }
+
+
+def parseArXiv(entry):
+    """
+    Extract the article details from an arXiv API feed entry (as returned
+    by 'fromArXiv()'). Returns a dict with the values of the article
+    fields.
+    """
+    def ret(key, d=''):
+        if key in entry:
+            return entry[key]
+        else:
+            return d
+
+    aid = ret('id')
+    idx = aid.rfind('/')+1
+
+    return {
+        'doi': aid[idx:],
+        'title': ret('title'),
+        'url': ret('id'),
+        'journal': 'arXiv preprint',
+        'issue': '',
+        'volume': '',
+        'pages': '',
+        'date': datetime.fromisoformat(ret('published')),
+        'authors': ', '.join([auth['name'] for auth in entry.authors])
+    }
 
 
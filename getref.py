@@ -1,57 +1,154 @@
 #!/usr/bin/env python3
 #
-# Script for formatting a reference in BibTeX format, from a DOI.
+# Script for formatting references in BibTeX (or another bibliography
+# format), from DOIs and arXiv ids.
+#
+# Any number of ids can be given on the command line or in files (or on
+# stdin). They are resolved concurrently over a shared keep-alive HTTP
+# session, and the entries are written in the order of the ids as soon as
+# they are available. Ids which cannot be resolved are reported on stderr.
 #
 
 import argparse
-import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import sys
+import types
 
-from db import Article
+# Only the network helpers of 'db' are used here, so that the database
+# libraries need not be imported
+from db import formats, refhelp
+from db.httpcache import HTTPCache
 
 
 def parse_args():
-    parser = argparse.ArgumentParser('Get BibTeX reference from DOI')
+    parser = argparse.ArgumentParser('Get BibTeX references from DOIs and arXiv ids')
 
-    parser.add_argument('doi', help="DOI or URL to extract BibTeX reference from.")
+    parser.add_argument('ids', help="DOIs, arXiv ids or URLs to extract references from. If neither these nor input files are given, the ids are read from stdin.", nargs='*')
+    parser.add_argument('-i', '--input', help="File containing DOIs and arXiv ids (one per line, or separated by commas). May be given several times; '-' reads from stdin.", action='append', default=[])
+    parser.add_argument('-o', '--output', help="File to write the references to (default: stdout).", default=None)
+    parser.add_argument('-f', '--format', help="Output format.", choices=formats.FORMATS.keys(), default='bibtex')
+    parser.add_argument('-t', '--timeout', help="Timeout (in seconds) of each request.", type=float, default=refhelp.TIMEOUT)
+    parser.add_argument('-w', '--workers', help="Maximum number of concurrent requests.", type=int, default=8)
+    parser.add_argument('--offline', help="Only fetch publication details from the local cache.", action='store_true')
+    parser.add_argument('--no-cache', help="Do not cache fetched publication details.", action='store_true')
 
     return parser.parse_args()
 
 
 def formatBibTeX(article):
     """
-    Format a BibTeX reference, given a DOI JSON object.
+    Format a BibTeX reference for an article (or any object with the same
+    attributes, such as the fields returned by 'refhelp.parseDOI()').
     """
-    authors = article.authors.split(', ')
-    refname = authors[0].split(' ')[-1] + f'{article.date.year:d}'
-    for i in range(len(authors)):
-        if '.' not in authors[i]:
-            authors[i] = '{' + authors[i] + '}'
+    return formats.bibtex(article, formats.citeKey(article))
 
-    authorlist = ' and '.join(authors)
 
-    s  =f"@article {{{refname},\n"
-    s +=f"    title = {{{article.title}}},\n"
-    s +=f"    author = {{{authorlist}}},\n"
-    s +=f"    journal = {{{article.journal}}},\n"
-    s +=f"    volume = {{{article.volume}}},\n"
-    s +=f"    pages = {{{article.pages}}},\n"
-    s +=f"    issue = {{{article.issue}}},\n"
-    s +=f"    year = {{{article.date.year}}},\n"
-    s +=f"    doi = {{{article.doi}}},\n"
-    s +=f"    url = {{{article.url}}}\n"
-    s += "}"
+def fetchDOI(id, timeout, session):
+    """
+    Fetch the publication with the given DOI. Returns a list with a tuple
+    '(id, fields, error)'.
+    """
+    try:
+        js = refhelp.fromDOI(id, timeout=timeout, session=session)
+        return [(id, refhelp.parseDOI(js), None)]
+    except Exception as ex:
+        return [(id, None, str(ex))]
 
-    return s
 
+def fetchArXiv(ids, timeout, session):
+    """
+    Fetch the publications with the given arXiv ids, using batched arXiv
+    queries. Returns a list of tuples '(id, fields, error)'.
+    """
+    try:
+        entries = dict(refhelp.fromArXivMany([i[6:] for i in ids], timeout=timeout, session=session))
+    except Exception as ex:
+        return [(id, None, str(ex)) for id in ids]
 
-def main():
-    args = parse_args()
+    results = []
+    for id in ids:
+        entry = entries.get(refhelp.normalizeArXiv(id[6:]))
+        if entry is None:
+            results.append((id, None, 'Not found on arXiv.'))
+        else:
+            results.append((id, refhelp.parseArXiv(entry), None))
+
+    return results
+
+
+def resolve(ids, workers=8, timeout=refhelp.TIMEOUT):
+    """
+    Fetch the publications with the given (normalized) ids concurrently.
+    DOIs are resolved one per request, while arXiv ids are queried in
+    batches by a single worker. Generates tuples '(id, fields, error)' in
+    the order of 'ids'.
+    """
+    arxiv = [i for i in ids if refhelp.isArXiv(i)]
 
-    art = Article.fromDOI(args.doi)
-    print(formatBibTeX(art))
+    with refhelp.createSession(workers) as session:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(fetchDOI, i, timeout, session) for i in ids if not refhelp.isArXiv(i)]
+            if arxiv:
+                futures.append(executor.submit(fetchArXiv, arxiv, timeout, session))
 
-    return 0
+            # Results which arrive before those of earlier ids are kept
+            # until they can be generated
+            results = {}
+            n = 0
+            for future in as_completed(futures):
+                for id, fields, error in future.result():
+                    results[id] = (fields, error)
+
+                while n < len(ids) and ids[n] in results:
+                    yield (ids[n], *results.pop(ids[n]))
+                    n += 1
+
+
+def readIds(args):
+    """
+    Returns the normalized ids given on the command line, in files or on
+    stdin.
+    """
+    text = '\n'.join(args.ids)
+    for fname in args.input:
+        if fname == '-':
+            text += '\n' + sys.stdin.read()
+        else:
+            with open(fname, 'r') as f:
+                text += '\n' + f.read()
+
+    if not args.ids and not args.input:
+        text = sys.stdin.read()
+
+    return refhelp.parseIds(text)
+
+
+def main():
+    args = parse_args()
+    ids = readIds(args)
+
+    if not args.no_cache:
+        refhelp.setCache(HTTPCache(offline=args.offline))
+
+    f = open(args.output, 'w') if args.output is not None else sys.stdout
+    writer = formats.Writer(f, args.format)
+
+    nfailed = 0
+    try:
+        for id, fields, error in resolve(ids, workers=args.workers, timeout=args.timeout):
+            if error is None:
+                writer.write(types.SimpleNamespace(**fields))
+                f.flush()
+            else:
+                print(f'{id}: {error}', file=sys.stderr)
+                nfailed += 1
+
+        writer.close()
+    finally:
+        if f is not sys.stdout:
+            f.close()
+
+    return 1 if nfailed > 0 else 0
 
 
 if __name__ == '__main__':
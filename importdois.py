@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+#
+# Script for importing articles into a publication database, from a list
+# of DOIs and arXiv ids.
+#
+
+import argparse
+import signal
+import sys
+
+from db import config, Database, refhelp
+from db.bulkimport import BulkImport, parseIds
+from db.httpcache import HTTPCache
+
+
+def parse_args():
+    parser = argparse.ArgumentParser('Import articles from a list of DOIs and arXiv ids')
+
+    parser.add_argument('publications', help="File containing publication database.")
+    parser.add_argument('files', help="Files containing the DOIs and arXiv ids to import (one per line). If omitted, the ids are read from stdin.", nargs='*')
+    parser.add_argument('-r', '--resume', help="Resume an interrupted import, without reading any new ids.", action='store_true')
+    parser.add_argument('-p', '--profile', help="Database connection profile to use.", choices=Database.PROFILES.keys(), default='bulk')
+    parser.add_argument('-s', '--state', help="File in which to record the progress of the import, so that it can be resumed if interrupted (default: '<publications>.import').", default=None)
+    parser.add_argument('-t', '--timeout', help="Timeout (in seconds) of each request.", type=float, default=refhelp.TIMEOUT)
+    parser.add_argument('-w', '--workers', help="Maximum number of concurrent requests.", type=int, default=8)
+    parser.add_argument('--offline', help="Only fetch publication details from the local cache.", action='store_true')
+    parser.add_argument('--no-cache', help="Do not cache fetched publication details.", action='store_true')
+
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    if args.resume:
+        text = ''
+    elif args.files:
+        text = ''
+        for fname in args.files:
+            with open(fname, 'r') as f:
+                text += f.read() + '\n'
+    else:
+        text = sys.stdin.read()
+
+    ids = parseIds(text)
+    state = args.state if args.state is not None else f'{args.publications}.import'
+
+    db = Database(args.publications, profile=args.profile)
+    config.init(db)
+
+    if not args.no_cache:
+        refhelp.setCache(HTTPCache(offline=args.offline))
+
+    imp = BulkImport(ids, statefile=state, workers=args.workers, timeout=args.timeout)
+    nexisting = imp.skipExisting()
+    print(f'{len(imp.ids)} ids, {nexisting} already in the database, {len(imp.pending())} to fetch.', file=sys.stderr)
+
+    # Stop fetching on Ctrl+C, and keep the state for resuming later
+    cancelled = False
+    def interrupt(signum, frame):
+        nonlocal cancelled
+        cancelled = True
+    signal.signal(signal.SIGINT, interrupt)
+
+    def progress(ndone, ntotal, id, error):
+        if error is None:
+            print(f'[{ndone}/{ntotal}] {id}', file=sys.stderr)
+        else:
+            print(f'[{ndone}/{ntotal}] {id}: FAILED: {error}', file=sys.stderr)
+
+    imp.fetch(progress=progress, cancelled=lambda : cancelled)
+
+    if cancelled:
+        print("Import interrupted. Run the same command again (or with '--resume') to resume it.", file=sys.stderr)
+        return 1
+
+    inserted = imp.commit()
+    complete = imp.finish()
+
+    print(f'Imported {len(inserted)} articles.', file=sys.stderr)
+
+    if not complete:
+        for id, error in imp.errors.items():
+            print(f'  {id}: {error}', file=sys.stderr)
+
+        print(f"{len(imp.errors)} ids could not be imported. Run the same command again (or with '--resume') to retry them.", file=sys.stderr)
+        return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
+
+
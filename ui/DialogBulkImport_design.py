@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+# Form implementation generated from reading ui file 'ui/DialogBulkImport.ui'
+#
+# Created by: PyQt5 UI code generator 5.15.11
+#
+# WARNING: Any manual changes made to this file will be lost when pyuic5 is
+# run again.  Do not edit this file unless you know what you are doing.
+
+
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+
+class Ui_DialogBulkImport(object):
+    def setupUi(self, DialogBulkImport):
+        DialogBulkImport.setObjectName("DialogBulkImport")
+        DialogBulkImport.resize(600, 500)
+        self.verticalLayout = QtWidgets.QVBoxLayout(DialogBulkImport)
+        self.verticalLayout.setObjectName("verticalLayout")
+        self.label = QtWidgets.QLabel(DialogBulkImport)
+        self.label.setObjectName("label")
+        self.verticalLayout.addWidget(self.label)
+        self.tbIds = QtWidgets.QPlainTextEdit(DialogBulkImport)
+        self.tbIds.setObjectName("tbIds")
+        self.verticalLayout.addWidget(self.tbIds)
+        self.progressBar = QtWidgets.QProgressBar(DialogBulkImport)
+        self.progressBar.setProperty("value", 0)
+        self.progressBar.setObjectName("progressBar")
+        self.verticalLayout.addWidget(self.progressBar)
+        self.lblStatus = QtWidgets.QLabel(DialogBulkImport)
+        self.lblStatus.setText("")
+        self.lblStatus.setObjectName("lblStatus")
+        self.verticalLayout.addWidget(self.lblStatus)
+        self.tbLog = QtWidgets.QPlainTextEdit(DialogBulkImport)
+        self.tbLog.setReadOnly(True)
+        self.tbLog.setObjectName("tbLog")
+        self.verticalLayout.addWidget(self.tbLog)
+        self.horizontalLayout = QtWidgets.QHBoxLayout()
+        self.horizontalLayout.setObjectName("horizontalLayout")
+        self.btnImport = QtWidgets.QPushButton(DialogBulkImport)
+        self.btnImport.setObjectName("btnImport")
+        self.horizontalLayout.addWidget(self.btnImport)
+        self.btnCancel = QtWidgets.QPushButton(DialogBulkImport)
+        self.btnCancel.setEnabled(False)
+        self.btnCancel.setObjectName("btnCancel")
+        self.horizontalLayout.addWidget(self.btnCancel)
+        spacerItem = QtWidgets.QSpacerItem(40, 20, QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Minimum)
+        self.horizontalLayout.addItem(spacerItem)
+        self.buttonBox = QtWidgets.QDialogButtonBox(DialogBulkImport)
+        self.buttonBox.setStandardButtons(QtWidgets.QDialogButtonBox.Close)
+        self.buttonBox.setObjectName("buttonBox")
+        self.horizontalLayout.addWidget(self.buttonBox)
+        self.verticalLayout.addLayout(self.horizontalLayout)
+
+        self.retranslateUi(DialogBulkImport)
+        self.buttonBox.rejected.connect(DialogBulkImport.reject) # type: ignore
+        QtCore.QMetaObject.connectSlotsByName(DialogBulkImport)
+
+    def retranslateUi(self, DialogBulkImport):
+        _translate = QtCore.QCoreApplication.translate
+        DialogBulkImport.setWindowTitle(_translate("DialogBulkImport", "Import DOI list"))
+        self.label.setText(_translate("DialogBulkImport", "DOIs and arXiv ids (one per line):"))
+        self.btnImport.setText(_translate("DialogBulkImport", "Import"))
+        self.btnCancel.setText(_translate("DialogBulkImport", "Cancel"))
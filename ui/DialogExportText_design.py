@@ -2,7 +2,7 @@
 
 # Form implementation generated from reading ui file 'ui/DialogExportText.ui'
 #
-# Created by: PyQt5 UI code generator 5.15.10
+# Created by: PyQt5 UI code generator 5.15.11
 #
 # WARNING: Any manual changes made to this file will be lost when pyuic5 is
 # run again.  Do not edit this file unless you know what you are doing.
@@ -73,7 +73,7 @@ class Ui_DialogExportText(object):
         self.tbReferences.setObjectName("tbReferences")
         self.verticalLayout.addWidget(self.tbReferences)
         self.buttonBox = QtWidgets.QDialogButtonBox(DialogExportText)
-        self.buttonBox.setStandardButtons(QtWidgets.QDialogButtonBox.Close)
+        self.buttonBox.setStandardButtons(QtWidgets.QDialogButtonBox.Close|QtWidgets.QDialogButtonBox.Save)
         self.buttonBox.setObjectName("buttonBox")
         self.verticalLayout.addWidget(self.buttonBox)
         self.verticalLayout.setStretch(0, 3)
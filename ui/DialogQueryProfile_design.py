@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+
+# Form implementation generated from reading ui file 'ui/DialogQueryProfile.ui'
+#
+# Created by: PyQt5 UI code generator 5.15.11
+#
+# WARNING: Any manual changes made to this file will be lost when pyuic5 is
+# run again.  Do not edit this file unless you know what you are doing.
+
+
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+
+class Ui_DialogQueryProfile(object):
+    def setupUi(self, DialogQueryProfile):
+        DialogQueryProfile.setObjectName("DialogQueryProfile")
+        DialogQueryProfile.resize(900, 600)
+        self.verticalLayout = QtWidgets.QVBoxLayout(DialogQueryProfile)
+        self.verticalLayout.setObjectName("verticalLayout")
+        self.tbProfile = QtWidgets.QPlainTextEdit(DialogQueryProfile)
+        self.tbProfile.setLineWrapMode(QtWidgets.QPlainTextEdit.NoWrap)
+        self.tbProfile.setReadOnly(True)
+        self.tbProfile.setObjectName("tbProfile")
+        self.verticalLayout.addWidget(self.tbProfile)
+        self.horizontalLayout = QtWidgets.QHBoxLayout()
+        self.horizontalLayout.setObjectName("horizontalLayout")
+        self.btnRefresh = QtWidgets.QPushButton(DialogQueryProfile)
+        self.btnRefresh.setObjectName("btnRefresh")
+        self.horizontalLayout.addWidget(self.btnRefresh)
+        self.btnReset = QtWidgets.QPushButton(DialogQueryProfile)
+        self.btnReset.setObjectName("btnReset")
+        self.horizontalLayout.addWidget(self.btnReset)
+        spacerItem = QtWidgets.QSpacerItem(40, 20, QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Minimum)
+        self.horizontalLayout.addItem(spacerItem)
+        self.buttonBox = QtWidgets.QDialogButtonBox(DialogQueryProfile)
+        self.buttonBox.setStandardButtons(QtWidgets.QDialogButtonBox.Close)
+        self.buttonBox.setObjectName("buttonBox")
+        self.horizontalLayout.addWidget(self.buttonBox)
+        self.verticalLayout.addLayout(self.horizontalLayout)
+
+        self.retranslateUi(DialogQueryProfile)
+        self.buttonBox.rejected.connect(DialogQueryProfile.reject) # type: ignore
+        QtCore.QMetaObject.connectSlotsByName(DialogQueryProfile)
+
+    def retranslateUi(self, DialogQueryProfile):
+        _translate = QtCore.QCoreApplication.translate
+        DialogQueryProfile.setWindowTitle(_translate("DialogQueryProfile", "SQL query profile"))
+        self.btnRefresh.setText(_translate("DialogQueryProfile", "Refresh"))
+        self.btnReset.setText(_translate("DialogQueryProfile", "Reset"))
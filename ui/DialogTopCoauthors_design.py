@@ -26,12 +26,11 @@ class Ui_DialogTopCoauthors(object):
         self.tbFilter.setText("")
         self.tbFilter.setObjectName("tbFilter")
         self.verticalLayout.addWidget(self.tbFilter)
-        self.tblAuthors = QtWidgets.QTableWidget(DialogTopCoauthors)
+        self.tblAuthors = QtWidgets.QTableView(DialogTopCoauthors)
         self.tblAuthors.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
         self.tblAuthors.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
-        self.tblAuthors.setColumnCount(2)
+        self.tblAuthors.setVerticalScrollMode(QtWidgets.QAbstractItemView.ScrollPerPixel)
         self.tblAuthors.setObjectName("tblAuthors")
-        self.tblAuthors.setRowCount(0)
         self.verticalLayout.addWidget(self.tblAuthors)
         self.buttonBox = QtWidgets.QDialogButtonBox(DialogTopCoauthors)
         self.buttonBox.setOrientation(QtCore.Qt.Horizontal)
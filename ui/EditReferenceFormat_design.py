@@ -2,7 +2,7 @@
 
 # Form implementation generated from reading ui file 'ui/EditReferenceFormat.ui'
 #
-# Created by: PyQt5 UI code generator 5.15.10
+# Created by: PyQt5 UI code generator 5.15.11
 #
 # WARNING: Any manual changes made to this file will be lost when pyuic5 is
 # run again.  Do not edit this file unless you know what you are doing.
@@ -23,6 +23,12 @@ class Ui_EditReferenceFormat(object):
         self.tbName = QtWidgets.QLineEdit(EditReferenceFormat)
         self.tbName.setObjectName("tbName")
         self.verticalLayout.addWidget(self.tbName)
+        self.label_2 = QtWidgets.QLabel(EditReferenceFormat)
+        self.label_2.setObjectName("label_2")
+        self.verticalLayout.addWidget(self.label_2)
+        self.cbKind = QtWidgets.QComboBox(EditReferenceFormat)
+        self.cbKind.setObjectName("cbKind")
+        self.verticalLayout.addWidget(self.cbKind)
         self.tbCode = QtWidgets.QPlainTextEdit(EditReferenceFormat)
         font = QtGui.QFont()
         font.setFamily("Monospace")
@@ -44,3 +50,4 @@ class Ui_EditReferenceFormat(object):
         _translate = QtCore.QCoreApplication.translate
         EditReferenceFormat.setWindowTitle(_translate("EditReferenceFormat", "Edit reference format"))
         self.label.setText(_translate("EditReferenceFormat", "Name:"))
+        self.label_2.setText(_translate("EditReferenceFormat", "Kind:"))
@@ -299,6 +299,10 @@ class Ui_MainWindow(object):
         self.btnExport.setObjectName("btnExport")
         self.horizontalLayout_2.addWidget(self.btnExport)
         self.verticalLayout_2.addLayout(self.horizontalLayout_2)
+        self.tbSearch = QtWidgets.QLineEdit(self.centralwidget)
+        self.tbSearch.setClearButtonEnabled(True)
+        self.tbSearch.setObjectName("tbSearch")
+        self.verticalLayout_2.addWidget(self.tbSearch)
         self.tvPublications = QtWidgets.QTreeView(self.centralwidget)
         self.tvPublications.setMinimumSize(QtCore.QSize(400, 0))
         self.tvPublications.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
@@ -326,6 +330,8 @@ class Ui_MainWindow(object):
         self.menuPublication_list.setObjectName("menuPublication_list")
         self.menuStatistics = QtWidgets.QMenu(self.menubar)
         self.menuStatistics.setObjectName("menuStatistics")
+        self.menuDebug = QtWidgets.QMenu(self.menubar)
+        self.menuDebug.setObjectName("menuDebug")
         MainWindow.setMenuBar(self.menubar)
         self.statusbar = QtWidgets.QStatusBar(MainWindow)
         self.statusbar.setObjectName("statusbar")
@@ -334,27 +340,42 @@ class Ui_MainWindow(object):
         self.actionFromDOI.setObjectName("actionFromDOI")
         self.actionFromManual = QtWidgets.QAction(MainWindow)
         self.actionFromManual.setObjectName("actionFromManual")
+        self.actionFromDOIList = QtWidgets.QAction(MainWindow)
+        self.actionFromDOIList.setObjectName("actionFromDOIList")
         self.actionExit = QtWidgets.QAction(MainWindow)
         self.actionExit.setObjectName("actionExit")
         self.actionSettings = QtWidgets.QAction(MainWindow)
         self.actionSettings.setObjectName("actionSettings")
+        self.actionWorkOffline = QtWidgets.QAction(MainWindow)
+        self.actionWorkOffline.setCheckable(True)
+        self.actionWorkOffline.setObjectName("actionWorkOffline")
         self.actionAs_text = QtWidgets.QAction(MainWindow)
         self.actionAs_text.setObjectName("actionAs_text")
         self.actionTopCoauthors = QtWidgets.QAction(MainWindow)
         self.actionTopCoauthors.setObjectName("actionTopCoauthors")
+        self.actionProfileQueries = QtWidgets.QAction(MainWindow)
+        self.actionProfileQueries.setCheckable(True)
+        self.actionProfileQueries.setObjectName("actionProfileQueries")
+        self.actionQueryProfile = QtWidgets.QAction(MainWindow)
+        self.actionQueryProfile.setObjectName("actionQueryProfile")
         self.menuNew_publication.addAction(self.actionFromDOI)
         self.menuNew_publication.addAction(self.actionFromManual)
+        self.menuNew_publication.addAction(self.actionFromDOIList)
         self.menuFile.addAction(self.menuNew_publication.menuAction())
         self.menuFile.addSeparator()
         self.menuFile.addAction(self.actionSettings)
+        self.menuFile.addAction(self.actionWorkOffline)
         self.menuFile.addSeparator()
         self.menuFile.addAction(self.actionExit)
         self.menuPublication_list.addAction(self.actionAs_text)
         self.menuGenerate.addAction(self.menuPublication_list.menuAction())
         self.menuStatistics.addAction(self.actionTopCoauthors)
+        self.menuDebug.addAction(self.actionProfileQueries)
+        self.menuDebug.addAction(self.actionQueryProfile)
         self.menubar.addAction(self.menuFile.menuAction())
         self.menubar.addAction(self.menuGenerate.menuAction())
         self.menubar.addAction(self.menuStatistics.menuAction())
+        self.menubar.addAction(self.menuDebug.menuAction())
 
         self.retranslateUi(MainWindow)
         QtCore.QMetaObject.connectSlotsByName(MainWindow)
@@ -399,14 +420,20 @@ class Ui_MainWindow(object):
         self.btnAddArticle.setText(_translate("MainWindow", "New"))
         self.btnAddPresentation.setText(_translate("MainWindow", "New presentation"))
         self.btnExport.setText(_translate("MainWindow", "Export"))
+        self.tbSearch.setPlaceholderText(_translate("MainWindow", "Search titles, authors, journals, keywords and DOIs"))
         self.menuFile.setTitle(_translate("MainWindow", "File"))
         self.menuNew_publication.setTitle(_translate("MainWindow", "New publication..."))
         self.menuGenerate.setTitle(_translate("MainWindow", "Generate"))
         self.menuPublication_list.setTitle(_translate("MainWindow", "Publication list"))
         self.menuStatistics.setTitle(_translate("MainWindow", "Statistics"))
+        self.menuDebug.setTitle(_translate("MainWindow", "Debug"))
         self.actionFromDOI.setText(_translate("MainWindow", "From DOI"))
         self.actionFromManual.setText(_translate("MainWindow", "From manual"))
+        self.actionFromDOIList.setText(_translate("MainWindow", "From DOI list..."))
         self.actionExit.setText(_translate("MainWindow", "Exit"))
         self.actionSettings.setText(_translate("MainWindow", "User settings"))
+        self.actionWorkOffline.setText(_translate("MainWindow", "Work offline"))
         self.actionAs_text.setText(_translate("MainWindow", "As text..."))
         self.actionTopCoauthors.setText(_translate("MainWindow", "Top co-authors"))
+        self.actionProfileQueries.setText(_translate("MainWindow", "Profile SQL queries"))
+        self.actionQueryProfile.setText(_translate("MainWindow", "SQL query profile..."))
@@ -2,7 +2,7 @@
 
 # Form implementation generated from reading ui file 'ui/Settings.ui'
 #
-# Created by: PyQt5 UI code generator 5.15.10
+# Created by: PyQt5 UI code generator 5.15.11
 #
 # WARNING: Any manual changes made to this file will be lost when pyuic5 is
 # run again.  Do not edit this file unless you know what you are doing.
@@ -29,6 +29,12 @@ class Ui_DialogSettings(object):
         self.tbScholar = QtWidgets.QLineEdit(DialogSettings)
         self.tbScholar.setObjectName("tbScholar")
         self.verticalLayout.addWidget(self.tbScholar)
+        self.label_3 = QtWidgets.QLabel(DialogSettings)
+        self.label_3.setObjectName("label_3")
+        self.verticalLayout.addWidget(self.label_3)
+        self.tbTimeout = QtWidgets.QLineEdit(DialogSettings)
+        self.tbTimeout.setObjectName("tbTimeout")
+        self.verticalLayout.addWidget(self.tbTimeout)
         spacerItem = QtWidgets.QSpacerItem(20, 40, QtWidgets.QSizePolicy.Minimum, QtWidgets.QSizePolicy.Expanding)
         self.verticalLayout.addItem(spacerItem)
         self.buttonBox = QtWidgets.QDialogButtonBox(DialogSettings)
@@ -47,3 +53,5 @@ class Ui_DialogSettings(object):
         DialogSettings.setWindowTitle(_translate("DialogSettings", "User settings"))
         self.label.setText(_translate("DialogSettings", "Full name:"))
         self.label_2.setText(_translate("DialogSettings", "Google Scholar profile:"))
+        self.label_3.setText(_translate("DialogSettings", "Network timeout (seconds):"))
+        self.tbTimeout.setPlaceholderText(_translate("DialogSettings", "10"))